@@ -1,111 +1,196 @@
-import ccxt.async_support as ccxt
-import pandas as pd
+from typing import TYPE_CHECKING
+import cachetools
 from core.indicators import calculate_indicators
 from model.predictor import SignalPredictor
-from utils.support_resistance import detect_breakout
+from model.feature_matrix import FEATURE_WINDOW
+from model import zoo
+from core.market_context import REGIME_GATE
+from core.multi_timeframe import multi_timeframe_boost
+from core.scheduler import last_closed_candle
+from core.signal import Signal, now_ms
+from utils.support_resistance import update_levels
 from utils.logger import log
+from data.candle_store import BUFFER_MAX_AGE_SECONDS, OHLCV_COLUMNS, candle_store, fetch_buffered_ohlcv
+from utils.cpu_pool import cpu_pool
+from utils.memory import buffer_pool
+from utils import clock
 import numpy as np
 import asyncio
-import gc
+
+if TYPE_CHECKING:
+    import ccxt.async_support as ccxt
 
 # Global predictor instance
 predictor = None
 
+ANALYSIS_CACHE_SIZE = 4096
+ANALYSIS_CACHE_TTL_SECONDS = 900  # Entries are keyed by candle anyway; this just bounds stale ones
+BREAKOUT_CONFIDENCE = 90.0  # Floor for a signal a breakout confirms
+MAX_CONFIDENCE = 95.0  # Same cap as the predictor's, after the multi-timeframe boost
+
+
+# "No signal" outcomes per symbol, timeframe, last closed candle and model. Analysis
+# only looks at closed candles, so until the next one closes the same inputs give the
+# same outcome and repeat calls skip the fetch, indicators and prediction. Signals are
+# rare and not cached: they go through the predictor again, which keeps its duplicate
+# check. Expiry follows the pipeline clock.
+class AnalysisCache:
+    def __init__(self, maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL_SECONDS):
+        self.results = cachetools.TTLCache(maxsize=maxsize, ttl=ttl, timer=clock.now)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def key(self, symbol, timeframe):
+        return symbol, timeframe, last_closed_candle(timeframe), getattr(predictor, "model_version", None)
+
+    def no_signal(self, key):
+        hit = key in self.results
+        self.stats["hits" if hit else "misses"] += 1
+        return hit
+
+    def put(self, key):
+        self.results[key] = None
+
+    def clear(self):
+        self.results.clear()
+
+    def snapshot(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {**self.stats, "size": len(self.results), "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0}
+
+
+analysis_cache = AnalysisCache()
+
 async def initialize_predictor():
     global predictor
     if predictor is None:
         try:
-            predictor = SignalPredictor()
-            log("Random Forest model loaded successfully")
+            # Unpickling the model (and importing scikit-learn) happens off the event loop
+            predictor = await cpu_pool.run(SignalPredictor, model_path=zoo.select_model())
+            log("Signal model loaded successfully")
         except Exception as e:
-            log(f"Error loading Random Forest model: {e}", level="ERROR")
+            log("Error loading signal model: %s", e, level="ERROR")
             raise
 
-async def analyze_symbol(exchange: ccxt.binance, symbol: str, timeframe: str = "15m"):
-    global predictor
+# Features and model probabilities for all of a cycle's symbols in one pass, from the
+# candles the prefilter just buffered; analyze_symbol falls back to one symbol at a time
+async def prepare_cycle_features(symbols, timeframe="15m"):
+    if predictor is None or not symbols:
+        return
+    # prepare_cycle keeps only copies, so the stacked candles go back to the pool
+    with buffer_pool.borrow((len(symbols), FEATURE_WINDOW, len(OHLCV_COLUMNS))) as candles:
+        # Closed candles only, as analyze_symbol uses
+        candle_store.stack(symbols, timeframe, FEATURE_WINDOW, out=candles, until=last_closed_candle(timeframe))
+        await cpu_pool.run(predictor.prepare_cycle, symbols, candles, timeframe)
+
+# CPU side of the analysis, run on the CPU pool: S/R levels and indicators
+def compute_indicators(symbol, timeframe, ohlcv):
+    import pandas as pd  # Deferred: not needed to boot
+
+    sr_tracker = update_levels(symbol, timeframe, ohlcv)
+    df = pd.DataFrame(
+        ohlcv,
+        columns=["timestamp", "open", "high", "low", "close", "volume"],
+        dtype="float32"
+    )
+    return sr_tracker, calculate_indicators(df)
+
+# `context` is the cycle's MarketContext, shared read-only by every symbol
+async def analyze_symbol(exchange: "ccxt.binance", symbol: str, timeframe: str = "15m", context=None):
+    if predictor is None:
+        log("[%s] Predictor not initialized", symbol, level="ERROR", symbol=symbol, stage="analysis")
+        return None
+    key = analysis_cache.key(symbol, timeframe)
+    if analysis_cache.no_signal(key):
+        log("[%s] No signal on candle %d (cached)", symbol, key[2], level="DEBUG", symbol=symbol, stage="analysis")
+        return None
     try:
-        log(f"[{symbol}] Starting analysis on {timeframe}")
-        
-        if predictor is None:
-            log(f"[{symbol}] Predictor not initialized", level="ERROR")
+        result = await _analyze_symbol(exchange, symbol, timeframe, key[2])
+    except Exception as e:
+        # Not cached: the next call retries
+        log("[%s] Error in analysis: %s", symbol, e, level="ERROR", symbol=symbol, stage="analysis")
+        return None
+    if result is None:
+        analysis_cache.put(key)
+    # Applied after the cache: the result itself does not depend on the market
+    if result is not None and REGIME_GATE and context is not None:
+        reason = context.against(result.direction)
+        if reason:
+            log("[%s] %s against the market: %s", symbol, result.direction, reason, level="DEBUG", symbol=symbol, stage="analysis")
             return None
+    # Signals only, so the 4h/1d fetches are rare; the result is not cached and not shared yet
+    if result is not None:
+        boost = await multi_timeframe_boost(symbol, exchange, result.direction, context)
+        if boost:
+            result.confidence = min(result.confidence + boost, MAX_CONFIDENCE)
+            log("[%s] Multi-timeframe boost +%d, confidence %.2f%%", symbol, boost, result.confidence, level="DEBUG", symbol=symbol, stage="analysis")
+    return result
 
-        # Fetch OHLCV data
-        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=50)
-        log(f"[{symbol}] Fetched {len(ohlcv)} OHLCV rows")
-        
-        df = pd.DataFrame(
-            ohlcv,
-            columns=["timestamp", "open", "high", "low", "close", "volume"],
-            dtype="float32"
-        )
-        
-        # Calculate indicators
-        df = calculate_indicators(df)
-        if df is None:
-            log(f"[{symbol}] Failed to calculate indicators", level="WARNING")
-            return None
-        
-        # Set default TP hit rates (backtest removed)
-        tp1_possibility, tp2_possibility, tp3_possibility = 0.75, 0.50, 0.25
-        log(f"[{symbol}] Default TP hit rates - TP1: {tp1_possibility:.2%}, TP2: {tp2_possibility:.2%}, TP3: {tp3_possibility:.2%}")
-
-        # Detect breakout
-        breakout = detect_breakout(symbol, df)
-        if breakout["is_breakout"]:
-            direction = "LONG" if breakout["direction"] == "up" else "SHORT"
-            confidence = 0.9
-        else:
-            # Predict signal
-            try:
-                signal = await predictor.predict_signal(symbol, df, timeframe)
-                if signal is None:
-                    log(f"[{symbol}] No valid signal from predictor", level="INFO")
-                    return None
-                direction = signal["direction"]
-                confidence = signal["confidence"]
-            except Exception as e:
-                log(f"[{symbol}] Error predicting signal: {e}", level="ERROR")
-                return None
-
-        current_price = df["close"].iloc[-1]
-        atr = df["atr"].iloc[-1]
-        
-        # Calculate TP and SL levels
-        if direction == "LONG":
-            tp1 = current_price + (0.15 * atr)
-            tp2 = current_price + (0.3 * atr)
-            tp3 = current_price + (0.45 * atr)
-            sl = current_price - (1.2 * atr)
-        else:  # SHORT
-            tp1 = current_price - (0.15 * atr)
-            tp2 = current_price - (0.3 * atr)
-            tp3 = current_price - (0.45 * atr)
-            sl = current_price + (1.2 * atr)
-
-        # Prepare result
-        result = {
-            "symbol": symbol,
-            "timeframe": timeframe,
-            "direction": direction,
-            "entry": current_price,
-            "tp1": round(tp1, 4),
-            "tp2": round(tp2, 4),
-            "tp3": round(tp3, 4),
-            "sl": round(sl, 4),
-            "confidence": confidence,
-            "tp1_possibility": tp1_possibility,
-            "tp2_possibility": tp2_possibility,
-            "tp3_possibility": tp3_possibility
-        }
-
-        log(f"[{symbol}] Signal generated - Direction: {direction}, Confidence: {confidence:.2%}")
-        return result
+# Analysis of the candles up to and including the one opened at `last_closed`
+async def _analyze_symbol(exchange, symbol, timeframe, last_closed):
+    log("[%s] Starting analysis on %s", symbol, timeframe, level="DEBUG", symbol=symbol, stage="analysis")
 
-    except Exception as e:
-        log(f"[{symbol}] Error in analysis: {e}", level="ERROR")
+    # Fetch OHLCV data, reusing the buffer if the prefilter refreshed it this cycle; the
+    # still-forming candle is left out so the result holds until the next close
+    ohlcv = await fetch_buffered_ohlcv(exchange, symbol, timeframe, limit=FEATURE_WINDOW + 1, max_age=BUFFER_MAX_AGE_SECONDS)
+    ohlcv = np.asarray(ohlcv, dtype="float64").reshape(-1, len(OHLCV_COLUMNS))
+    ohlcv = ohlcv[ohlcv[:, 0] <= last_closed][-FEATURE_WINDOW:]
+    log("[%s] Fetched %d OHLCV rows", symbol, len(ohlcv), level="DEBUG", symbol=symbol, stage="fetch")
+
+    # Calculate levels and indicators off the event loop
+    sr_tracker, df = await cpu_pool.run(compute_indicators, symbol, timeframe, ohlcv)
+    if df is None:
+        log("[%s] Failed to calculate indicators", symbol, level="WARNING", symbol=symbol, stage="indicators")
+        return None
+    candle_store.set_indicators(symbol, timeframe, df[["rsi", "macd", "macd_signal", "atr"]].iloc[-1].to_dict())
+    
+    # Set default TP hit rates (backtest removed)
+    tp1_possibility, tp2_possibility, tp3_possibility = 0.75, 0.50, 0.25
+    log("[%s] Default TP hit rates - TP1: %.2f%%, TP2: %.2f%%, TP3: %.2f%%", symbol, tp1_possibility * 100, tp2_possibility * 100, tp3_possibility * 100, level="DEBUG", symbol=symbol)
+
+    # Predict signal; errors propagate so the result is not cached
+    signal = await predictor.predict_signal(symbol, df, timeframe, candle=np.asarray(ohlcv[-1], dtype="float64"))
+    if signal is None:
+        log("[%s] No valid signal from predictor", symbol, level="DEBUG", symbol=symbol, stage="predict")
         return None
-    finally:
-        if 'df' in locals():
-            del df
-        gc.collect()
+    direction = signal.direction
+    confidence = signal.confidence
+
+    # A close through the incrementally tracked support/resistance the same way confirms it
+    breakout = sr_tracker.breakout() if sr_tracker else {"is_breakout": False, "direction": "none"}
+    if breakout["is_breakout"] and direction == ("LONG" if breakout["direction"] == "up" else "SHORT"):
+        confidence = max(confidence, BREAKOUT_CONFIDENCE)
+        log("[%s] %s confirmed by a %s breakout", symbol, direction, breakout["direction"], level="DEBUG", symbol=symbol, stage="analysis")
+
+    current_price = df["close"].iloc[-1]
+    atr = df["atr"].iloc[-1]
+    
+    # Calculate TP and SL levels
+    if direction == "LONG":
+        tp1 = current_price + (0.15 * atr)
+        tp2 = current_price + (0.3 * atr)
+        tp3 = current_price + (0.45 * atr)
+        sl = current_price - (1.2 * atr)
+    else:  # SHORT
+        tp1 = current_price - (0.15 * atr)
+        tp2 = current_price - (0.3 * atr)
+        tp3 = current_price - (0.45 * atr)
+        sl = current_price + (1.2 * atr)
+
+    result = Signal(
+        symbol=symbol,
+        timeframe=timeframe,
+        direction=direction,
+        entry=float(current_price),
+        tp1=round(float(tp1), 4),
+        tp2=round(float(tp2), 4),
+        tp3=round(float(tp3), 4),
+        sl=round(float(sl), 4),
+        confidence=float(confidence),
+        tp1_possibility=tp1_possibility,
+        tp2_possibility=tp2_possibility,
+        tp3_possibility=tp3_possibility,
+        timestamp=now_ms()
+    )
+
+    log("[%s] Signal generated - Direction: %s, Confidence: %.2f%%", symbol, direction, confidence, symbol=symbol, stage="analysis")
+    return result
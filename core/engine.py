@@ -1,9 +1,10 @@
 import asyncio
-import ccxt.async_support as ccxt
+from data.exchange_factory import exchange_pool
 from core.analysis import analyze_symbol
-from core.whale_detector import detect_whale_activity
-from utils.logger import log
-import pandas as pd
+from core.pipeline import Pipeline, Stage
+from data import market_data
+from core.prefilter import prefilter_symbols, WHALE_STAGES
+from utils.logger import log, log_signal_to_csv
 import psutil
 from telegram import Bot
 import os
@@ -13,7 +14,61 @@ log("[Engine] File loaded: core/engine.py")  # Confirm file loading
 
 load_dotenv()
 
-async def run_engine():
+ENGINE_CONCURRENCY = 4
+CONFIDENCE_THRESHOLD = 75
+TP1_POSSIBILITY_THRESHOLD = 0.75
+
+# The same stage executor as the main scanner, with the engine's thresholds and notifier
+def engine_pipeline(exchange, bot):
+    async def analyze(symbol):
+        memory_before = psutil.Process().memory_info().rss / 1024 / 1024
+        log("[Engine] [%s] Analyzing symbol - Memory: %.2f MB, CPU: %.1f%%", symbol, memory_before, psutil.cpu_percent())
+        signal = await analyze_symbol(exchange, symbol)
+        memory_after = psutil.Process().memory_info().rss / 1024 / 1024
+        log("[Engine] [%s] After analysis - Memory: %.2f MB (Change: %.2f MB)", symbol, memory_after, memory_after - memory_before)
+        if not signal:
+            log("[Engine] [%s] No valid signal", symbol)
+        return signal
+
+    async def threshold(signal):
+        if signal.confidence >= CONFIDENCE_THRESHOLD and signal.tp1_possibility >= TP1_POSSIBILITY_THRESHOLD:
+            return signal
+        log("[Engine] [%s] No valid signal", signal.symbol)
+        return None
+
+    async def notify(signal):
+        message = (
+            f"🚨 {signal.symbol} Signal\n"
+            f"Timeframe: {signal.timeframe}\n"
+            f"Direction: {signal.direction}\n"
+            f"Price: {signal.entry:.4f}\n"
+            f"Confidence: {signal.confidence:.2f}%\n"
+            f"TP1: {signal.tp1:.4f} ({signal.tp1_possibility*100:.2f}%)\n"
+            f"TP2: {signal.tp2:.4f} ({signal.tp2_possibility*100:.2f}%)\n"
+            f"TP3: {signal.tp3:.4f} ({signal.tp3_possibility*100:.2f}%)\n"
+            f"SL: {signal.sl:.4f}"
+        )
+        log("[Engine] [%s] Signal generated, sending to Telegram", signal.symbol)
+        try:
+            await bot.send_message(chat_id=os.getenv("TELEGRAM_CHAT_ID"), text=message)
+            log("[Engine] [%s] Signal sent: %s, Confidence: %.2f%%", signal.symbol, signal.direction, signal.confidence)
+        except Exception as e:
+            log("[Engine] [%s] Error sending Telegram message: %s", signal.symbol, e, level='ERROR')
+        return signal
+
+    async def record(signal):
+        log("[Engine] [%s] Saving signal to CSV", signal.symbol)
+        log_signal_to_csv(signal)
+        return signal
+
+    return Pipeline("engine", [
+        Stage("analyze", analyze, concurrency=ENGINE_CONCURRENCY, timeout=120),
+        Stage("threshold", threshold),
+        Stage("notify", notify, timeout=30),
+        Stage("log", record)
+    ])
+
+async def run_engine(exchange=None):
     log("[Engine] Starting run_engine")
 
     try:
@@ -21,19 +76,19 @@ async def run_engine():
         required_vars = ["TELEGRAM_BOT_TOKEN", "TELEGRAM_CHAT_ID", "BINANCE_API_KEY", "BINANCE_API_SECRET"]
         for var in required_vars:
             if not os.getenv(var):
-                log(f"[Engine] Missing environment variable: {var}", level='ERROR')
+                log("[Engine] Missing environment variable: %s", var, level='ERROR')
                 return
 
         log("[Engine] Checking model file")
         model_path = "models/rf_model.joblib"
         if not os.path.exists(model_path):
-            log(f"[Engine] Model file not found at {model_path}", level='ERROR')
+            log("[Engine] Model file not found at %s", model_path, level='ERROR')
             return
 
         log("[Engine] Checking logs directory")
         logs_dir = "logs"
         if not os.path.exists(logs_dir):
-            log(f"[Engine] Creating logs directory: {logs_dir}")
+            log("[Engine] Creating logs directory: %s", logs_dir)
             os.makedirs(logs_dir)
 
         log("[Engine] Initializing Telegram bot")
@@ -41,91 +96,33 @@ async def run_engine():
             bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN"))
             log("[Engine] Telegram bot initialized")
         except Exception as e:
-            log(f"[Engine] Error initializing Telegram bot: {str(e)}", level='ERROR')
+            log("[Engine] Error initializing Telegram bot: %s", e, level='ERROR')
             return
 
         log("[Engine] Initializing Binance exchange")
         try:
-            exchange = ccxt.binance({
-                "enableRateLimit": True,
-                "apiKey": os.getenv("BINANCE_API_KEY"),
-                "secret": os.getenv("BINANCE_API_SECRET")
-            })
+            exchange = exchange or exchange_pool.get()
             log("[Engine] Binance exchange initialized")
         except Exception as e:
-            log(f"[Engine] Error initializing Binance exchange: {str(e)}", level='ERROR')
+            log("[Engine] Error initializing Binance exchange: %s", e, level='ERROR')
             return
 
         log("[Engine] Loading markets")
         try:
-            markets = await exchange.load_markets()
+            markets = await market_data.load_markets(exchange)
             symbols = [s for s in markets.keys() if s.endswith("/USDT")]
-            log(f"[Engine] Found {len(symbols)} USDT pairs")
+            log("[Engine] Found %d USDT pairs", len(symbols))
         except Exception as e:
-            log(f"[Engine] Error loading markets: {str(e)}", level='ERROR')
+            log("[Engine] Error loading markets: %s", e, level='ERROR')
             return
 
-        for symbol in symbols[:5]:  # Limit to 5 symbols for testing
-            memory_before = psutil.Process().memory_info().rss / 1024 / 1024
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            log(f"[Engine] [{symbol}] Before analysis - Memory: {memory_before:.2f} MB, CPU: {cpu_percent:.1f}%")
-
-            log(f"[Engine] [{symbol}] Checking whale activity")
-            try:
-                ohlcv = await exchange.fetch_ohlcv(symbol, "1h", limit=100)
-                df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"], dtype="float32")
-                log(f"[Engine] [{symbol}] OHLCV fetched")
-            except Exception as e:
-                log(f"[Engine] [{symbol}] Error fetching OHLCV: {str(e)}", level='ERROR')
-                continue
-
-            if not detect_whale_activity(symbol, df):
-                log(f"[Engine] [{symbol}] No whale activity detected")
-                continue
-
-            log(f"[Engine] [{symbol}] Analyzing symbol")
-            try:
-                signal = await analyze_symbol(exchange, symbol)
-                if signal and signal["confidence"] >= 75 and signal["tp1_possibility"] >= 0.75:
-                    message = (
-                        f"🚨 {signal['symbol']} Signal\n"
-                        f"Timeframe: {signal['timeframe']}\n"
-                        f"Direction: {signal['direction']}\n"
-                        f"Price: {signal['price']:.4f}\n"
-                        f"Confidence: {signal['confidence']:.2f}%\n"
-                        f"TP1: {signal['tp1']:.4f} ({signal['tp1_possibility']*100:.2f}%)\n"
-                        f"TP2: {signal['tp2']:.4f} ({signal['tp2_possibility']*100:.2f}%)\n"
-                        f"TP3: {signal['tp3']:.4f} ({signal['tp3_possibility']*100:.2f}%)\n"
-                        f"SL: {signal['sl']:.4f}"
-                    )
-                    log(f"[Engine] [{symbol}] Signal generated, sending to Telegram")
-                    try:
-                        await bot.send_message(chat_id=os.getenv("TELEGRAM_CHAT_ID"), text=message)
-                        log(f"[Engine] [{symbol}] Signal sent: {signal['direction']}, Confidence: {signal['confidence']:.2f}%")
-                    except Exception as e:
-                        log(f"[Engine] [{symbol}] Error sending Telegram message: {str(e)}", level='ERROR')
-
-                    signal_df = pd.DataFrame([signal])
-                    log(f"[Engine] [{symbol}] Saving signal to CSV")
-                    signal_df.to_csv(f"{logs_dir}/signals_log.csv", mode="a", header=not os.path.exists(f"{logs_dir}/signals_log.csv"), index=False)
-                    log(f"[Engine] [{symbol}] Signal saved to CSV")
-                else:
-                    log(f"[Engine] [{symbol}] No valid signal")
-            except Exception as e:
-                log(f"[Engine] [{symbol}] Error analyzing symbol: {str(e)}", level='ERROR')
-                continue
-
-            memory_after = psutil.Process().memory_info().rss / 1024 / 1024
-            cpu_percent_after = psutil.cpu_percent(interval=0.1)
-            memory_diff = memory_after - memory_before
-            log(f"[Engine] [{symbol}] After analysis - Memory: {memory_after:.2f} MB (Change: {memory_diff:.2f} MB), CPU: {cpu_percent_after:.1f}%")
-
-        log("[Engine] Closing exchange")
-        try:
-            await exchange.close()
-            log("[Engine] Exchange closed")
-        except Exception as e:
-            log(f"[Engine] Error closing exchange: {str(e)}", level='ERROR')
+        # Whale volume, ATR% and momentum screens for the whole batch at once
+        log("[Engine] Running prefilter cascade")
+        survivors, report = await prefilter_symbols(exchange, symbols[:5], "1h", stages=WHALE_STAGES, limit=100)  # Limit to 5 symbols for testing
+        log("[Engine] Prefilter report: %s", report)
+
+        stats = await engine_pipeline(exchange, bot).run(survivors)
+        log("[Engine] Pipeline stats: %s", stats)
 
     except Exception as e:
-        log(f"[Engine] Unexpected error in run_engine: {str(e)}", level='ERROR')
+        log("[Engine] Unexpected error in run_engine: %s", e, level='ERROR')
@@ -1,7 +1,10 @@
-import pandas as pd
+from typing import TYPE_CHECKING
 import numpy as np
 from utils.logger import log
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 def calculate_rsi(data, periods=14):
     delta = data.diff()
     gain = delta.where(delta > 0, 0)
@@ -21,7 +24,7 @@ def calculate_macd(prices, fast=12, slow=26, signal=9):
     signal_line = macd.ewm(span=signal, adjust=False).mean()
     return macd, signal_line
 
-def calculate_indicators(df: pd.DataFrame):
+def calculate_indicators(df: "pd.DataFrame"):
     try:
         if len(df) < 26:  # Minimum for MACD
             log("Insufficient data for indicators", level="WARNING")
@@ -58,5 +61,5 @@ def calculate_indicators(df: pd.DataFrame):
         return df[['timestamp', 'open', 'high', 'low', 'close', 'volume', 'rsi', 'macd', 'macd_signal', 'atr']].astype('float32')
     
     except Exception as e:
-        log(f"Error calculating indicators: {e}", level="ERROR")
+        log("Error calculating indicators: %s", e, level="ERROR")
         return None
@@ -0,0 +1,112 @@
+import os
+import warnings
+from dataclasses import asdict, dataclass
+import numpy as np
+from core.prefilter import PREFILTER_LOOKBACK, refresh_candles
+from core.scheduler import last_closed_candle
+from data.candle_store import BUFFER_MAX_AGE_SECONDS, OHLCV_COLUMNS, candle_store
+from utils.cpu_pool import cpu_pool
+from utils.memory import buffer_pool
+from utils.logger import log
+
+BENCHMARKS = ("BTC/USDT", "ETH/USDT")
+TREND_FAST_EMA = 20
+TREND_SLOW_EMA = 50
+BREADTH_EMA = 20  # Breadth: share of the universe closing above this EMA
+VOLATILITY_WINDOW = 14  # Candles in the current cross-sectional range, against the rest of the lookback
+HIGH_VOLATILITY_RATIO = 1.5
+LOW_VOLATILITY_RATIO = 0.67
+
+# Regime gate in analyze_symbol; off unless enabled, the context is only reported
+REGIME_GATE = os.getenv("REGIME_GATE", "0") == "1"
+RISK_OFF_BREADTH_PCT = 30.0  # Longs blocked when BTC trends down and breadth is below this
+RISK_ON_BREADTH_PCT = 70.0  # Shorts blocked when BTC trends up and breadth is above this
+
+
+# Market-wide conditions for one cycle, computed once and shared by every symbol's analysis
+@dataclass(frozen=True, slots=True)
+class MarketContext:
+    candle_time: int  # Open time (ms) of the last candle in the stack
+    symbols: int
+    btc_trend: str  # "up", "down" or "flat"
+    eth_trend: str
+    breadth_pct: float  # % of symbols closing above their EMA
+    volatility_pct: float  # Median candle range as % of close over the recent window
+    volatility_ratio: float  # Against the median over the rest of the lookback
+    volatility_regime: str  # "low", "normal" or "high"
+
+    # Reason a trade in `direction` goes against the market, or None
+    def against(self, direction):
+        if direction == "LONG" and self.btc_trend == "down" and self.breadth_pct < RISK_OFF_BREADTH_PCT:
+            return f"BTC trending down, breadth {self.breadth_pct:.0f}%"
+        if direction == "SHORT" and self.btc_trend == "up" and self.breadth_pct > RISK_ON_BREADTH_PCT:
+            return f"BTC trending up, breadth {self.breadth_pct:.0f}%"
+        return None
+
+    def to_dict(self):
+        return asdict(self)
+
+
+# EMA along the time axis of a (symbols x time) array for all symbols at once.
+# Leading NaN padding is skipped: each row starts at its first candle.
+def ema(values, span):
+    alpha = 2.0 / (span + 1)
+    out = values[:, 0].copy()
+    for t in range(1, values.shape[1]):
+        x = values[:, t]
+        out = np.where(np.isnan(out), x, np.where(np.isnan(x), out, out + alpha * (x - out)))
+    return out
+
+
+def trend(close):
+    fast = ema(close, TREND_FAST_EMA)
+    slow = ema(close, TREND_SLOW_EMA)
+    last = close[:, -1]
+    return np.where((last > fast) & (fast > slow), "up", np.where((last < fast) & (fast < slow), "down", "flat"))
+
+
+# Context from the stacked (symbols x time x ohlcv) universe; benchmarks are the rows
+# named in BENCHMARKS, "flat" when missing
+def compute_market_context(symbols, candles):
+    close = candles[:, :, 4]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # All-NaN rows and columns
+        trends = trend(close)
+        above = close[:, -1] > ema(close, BREADTH_EMA)
+        valid = ~np.isnan(close[:, -1])
+        breadth_pct = float(above[valid].mean() * 100) if valid.any() else 0.0
+        range_pct = (candles[:, :, 2] - candles[:, :, 3]) / close * 100
+        cross_section = np.nanmedian(range_pct, axis=0)  # Per candle, across symbols
+        current = float(np.nanmean(cross_section[-VOLATILITY_WINDOW:]))
+        baseline = float(np.nanmedian(cross_section[:-VOLATILITY_WINDOW]))
+    ratio = current / baseline if baseline > 0 else 1.0
+    regime = "high" if ratio >= HIGH_VOLATILITY_RATIO else "low" if ratio <= LOW_VOLATILITY_RATIO else "normal"
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    btc, eth = (str(trends[index[symbol]]) if symbol in index else "flat" for symbol in BENCHMARKS)
+    candle_times = candles[:, -1, 0]
+    return MarketContext(
+        candle_time=int(np.nanmax(candle_times)) if valid.any() else 0,
+        symbols=int(valid.sum()),
+        btc_trend=btc,
+        eth_trend=eth,
+        breadth_pct=round(breadth_pct, 1),
+        volatility_pct=round(current, 4) if np.isfinite(current) else 0.0,
+        volatility_ratio=round(ratio, 3) if np.isfinite(ratio) else 1.0,
+        volatility_regime=regime
+    )
+
+
+# One context per cycle from the closed candles the prefilter just buffered. The benchmarks
+# are brought up to date every cycle; a request only if this cycle has not merged them yet.
+async def build_market_context(exchange, symbols, timeframe="15m", limit=PREFILTER_LOOKBACK):
+    symbols = list(dict.fromkeys([*symbols, *BENCHMARKS]))
+    await refresh_candles(exchange, BENCHMARKS, timeframe, limit=limit + 1, max_age=BUFFER_MAX_AGE_SECONDS)
+    with buffer_pool.borrow((len(symbols), limit, len(OHLCV_COLUMNS))) as candles:
+        candle_store.stack(symbols, timeframe, limit, out=candles, until=last_closed_candle(timeframe))
+        context = await cpu_pool.run(compute_market_context, symbols, candles, portable=True)
+    log(
+        "[Market] BTC %s, ETH %s, breadth %.0f%% of %d, volatility %s (x%.2f)",
+        context.btc_trend, context.eth_trend, context.breadth_pct, context.symbols,
+        context.volatility_regime, context.volatility_ratio, stage="market"
+    )
+    return context
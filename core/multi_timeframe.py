@@ -1,24 +1,36 @@
-import pandas as pd
-import ccxt.async_support as ccxt
+from core.scheduler import last_closed_candle
+from data import market_data
 from utils.logger import log
-import asyncio
-import ta
+from utils.support_resistance import get_level_index
 
+# Closed candles only; the forming one would fail the volume filter on most checks
 async def fetch_ohlcv(exchange, symbol, timeframe, limit=100):
+    import pandas as pd  # Deferred, like ta below: only signals get this far
+
     try:
-        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-        if not ohlcv or len(ohlcv) < 50:
-            log(f"[{symbol}] Insufficient OHLCV data for {timeframe}", level='ERROR')
+        ohlcv = await market_data.fetch_ohlcv(exchange, symbol, timeframe, limit=limit + 1)
+        last_closed = last_closed_candle(timeframe)
+        ohlcv = [row for row in ohlcv or [] if row[0] <= last_closed][-limit:]
+        get_level_index(symbol).set_candles(timeframe, ohlcv)  # Higher-timeframe pivots at no extra fetch
+        if len(ohlcv) < 50:
+            log("[%s] Insufficient OHLCV data for %s", symbol, timeframe, level='DEBUG', symbol=symbol, stage="multi_timeframe")
             return None
         df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'], dtype='float32')
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
         return df
     except Exception as e:
-        log(f"[{symbol}] Failed to fetch OHLCV for {timeframe}: {e}", level='ERROR')
+        log("[%s] Failed to fetch OHLCV for %s: %s", symbol, timeframe, e, level='ERROR', symbol=symbol, stage="multi_timeframe")
         return None
 
-async def multi_timeframe_boost(symbol, exchange, direction):
+# `context` is the cycle's MarketContext; no boost for a trade against the BTC trend
+async def multi_timeframe_boost(symbol, exchange, direction, context=None):
+    import ta
+
     try:
+        if context is not None and context.btc_trend == {"LONG": "down", "SHORT": "up"}.get(direction):
+            log("[%s] %s against BTC trend (%s)", symbol, direction, context.btc_trend, level='DEBUG', symbol=symbol, stage="multi_timeframe")
+            return 0
+
         boost = 0
         for timeframe in ['4h', '1d']:
             df = await fetch_ohlcv(exchange, symbol, timeframe)
@@ -41,24 +53,24 @@ async def multi_timeframe_boost(symbol, exchange, direction):
             elif direction == "SHORT" and latest["ema_20"] < latest["ema_50"]:
                 boost += 5
             else:
-                log(f"[{symbol}] {timeframe} EMA misalignment", level='WARNING')
+                log("[%s] %s EMA misalignment", symbol, timeframe, level='DEBUG', symbol=symbol, stage="multi_timeframe")
                 return 0
 
             # Volume filter
             if latest["volume"] < 1.5 * latest["volume_sma_20"]:
-                log(f"[{symbol}] Low volume on {timeframe}", level='WARNING')
+                log("[%s] Low volume on %s", symbol, timeframe, level='DEBUG', symbol=symbol, stage="multi_timeframe")
                 return 0
 
             # Fake breakout check
             if direction == "LONG" and prev["high"] > latest["high"] and next_candle["close"] <= prev["high"]:
-                log(f"[{symbol}] Fake breakout detected on {timeframe}", level='WARNING')
+                log("[%s] Fake breakout detected on %s", symbol, timeframe, level='DEBUG', symbol=symbol, stage="multi_timeframe")
                 return 0
             if direction == "SHORT" and prev["low"] < latest["low"] and next_candle["close"] >= prev["low"]:
-                log(f"[{symbol}] Fake breakout detected on {timeframe}", level='WARNING')
+                log("[%s] Fake breakout detected on %s", symbol, timeframe, level='DEBUG', symbol=symbol, stage="multi_timeframe")
                 return 0
 
         return boost
 
     except Exception as e:
-        log(f"[{symbol}] Error in multi_timeframe_boost: {e}", level='ERROR')
+        log("[%s] Error in multi_timeframe_boost: %s", symbol, e, level='ERROR', symbol=symbol, stage="multi_timeframe")
         return 0
@@ -1,22 +1,187 @@
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from data.news_sources import asset_terms
 from utils.logger import log
 
+# News sentiment per base asset, fetched in bulk on a schedule and kept in memory.
+# fetch_sentiment / adjust_confidence only read the in-memory index; the only I/O
+# is SentimentService.refresh, which packs many assets into each source request.
+
+SENTIMENT_HALF_LIFE_SECONDS = 6 * 3600  # An article's weight halves every 6 hours
+SENTIMENT_TTL_SECONDS = 24 * 3600  # Assets with no news for this long have no sentiment
+NEWS_API_DAILY_QUOTA = int(os.getenv("NEWS_API_DAILY_QUOTA", "100"))  # NewsAPI developer plan
+SENTIMENT_MIN_REFRESH_SECONDS = 900
+SEEN_ARTICLES = 5000  # Remembered so overlapping fetches do not count an article twice
+
+POSITIVE_WORDS = {
+    "surge", "surges", "rally", "rallies", "soar", "soars", "gain", "gains", "jump", "jumps",
+    "bullish", "breakout", "record", "high", "approval", "approved", "adoption", "partnership",
+    "upgrade", "launch", "launches", "inflows", "buy", "buying", "recover", "recovers", "rebound"
+}
+NEGATIVE_WORDS = {
+    "plunge", "plunges", "crash", "crashes", "drop", "drops", "fall", "falls", "slump", "bearish",
+    "hack", "hacked", "exploit", "lawsuit", "sued", "ban", "banned", "selloff", "sell-off", "dump",
+    "delist", "delisted", "fraud", "outage", "liquidations", "outflows", "charges", "scam", "warning"
+}
+WORD_PATTERN = re.compile(r"[a-z][a-z\-]+")
+
+
+# (score in [-1, 1], number of sentiment words) for one article
+def score_text(text):
+    words = WORD_PATTERN.findall(text.lower())
+    positive = sum(word in POSITIVE_WORDS for word in words)
+    negative = sum(word in NEGATIVE_WORDS for word in words)
+    total = positive + negative
+    return ((positive - negative) / total if total else 0.0), total
+
+
+# Tickers match case-sensitively as whole words ("SOL", not "solution"); names match in any case
+_asset_patterns = {}
+
+
+def asset_pattern(asset):
+    pattern = _asset_patterns.get(asset)
+    if pattern is None:
+        ticker, *names = asset_terms(asset)
+        parts = [rf"\b{re.escape(ticker)}\b"] + [rf"(?i:\b{re.escape(name)}\b)" for name in names]
+        pattern = _asset_patterns[asset] = re.compile("|".join(parts))
+    return pattern
+
+
+# Recency-weighted mean article score per asset. Sums are decayed to the time of the
+# last update; uniform decay leaves the mean unchanged, so reads need no arithmetic
+# beyond the division.
+class SentimentIndex:
+    def __init__(self, half_life=SENTIMENT_HALF_LIFE_SECONDS, ttl=SENTIMENT_TTL_SECONDS):
+        self.half_life = half_life
+        self.ttl = ttl
+        self.entries = {}  # asset -> {"weighted", "weight", "magnitude", "articles", "updated", "last_article"}
+
+    def add(self, asset, score, magnitude, published_at, now=None):
+        now = time.time() if now is None else now
+        entry = self.entries.get(asset)
+        if entry is None:
+            entry = self.entries[asset] = {"weighted": 0.0, "weight": 0.0, "magnitude": 0.0, "articles": 0, "updated": now, "last_article": 0.0}
+        decay = 0.5 ** ((now - entry["updated"]) / self.half_life)
+        weight = 0.5 ** (max(now - published_at, 0.0) / self.half_life)
+        entry["weighted"] = entry["weighted"] * decay + weight * score
+        entry["weight"] = entry["weight"] * decay + weight
+        entry["magnitude"] = entry["magnitude"] * decay + weight * magnitude
+        entry["articles"] += 1
+        entry["updated"] = now
+        entry["last_article"] = max(entry["last_article"], published_at)
+
+    def get(self, asset, now=None):
+        entry = self.entries.get(asset)
+        now = time.time() if now is None else now
+        if entry is None or not entry["weight"] or now - entry["last_article"] > self.ttl:
+            return None
+        decay = 0.5 ** ((now - entry["updated"]) / self.half_life)
+        return {"score": entry["weighted"] / entry["weight"], "magnitude": entry["magnitude"] * decay, "articles": entry["articles"]}
+
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        for asset in [a for a, entry in self.entries.items() if now - entry["last_article"] > self.ttl]:
+            del self.entries[asset]
+
+
+sentiment_index = SentimentIndex()
+
+
+# Keeps sentiment_index fresh for the scanned universe within the source's daily quota
+class SentimentService:
+    def __init__(self, source, index=sentiment_index, daily_quota=NEWS_API_DAILY_QUOTA):
+        self.source = source
+        self.index = index
+        self.daily_quota = daily_quota
+        self.last_fetch = None
+        self.seen = set()
+        self.seen_order = deque()
+        self.stats = {"refreshes": 0, "requests": 0, "articles": 0, "matched": 0, "errors": 0}
+
+    # Spread the quota evenly over the day: one refresh costs one request per batch
+    def refresh_interval(self, assets):
+        batches = sum(1 for _ in self.source.batches(assets)) or 1
+        return max(SENTIMENT_MIN_REFRESH_SECONDS, 86400 * batches / self.daily_quota)
+
+    def ingest(self, articles, assets, now=None):
+        matched = 0
+        for article in articles:
+            # Stable across refreshes: a source may have to stand in for a missing date
+            key = article.get("url") or article["title"]
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            self.seen_order.append(key)
+            if len(self.seen_order) > SEEN_ARTICLES:
+                self.seen.discard(self.seen_order.popleft())
+            text = f"{article['title']} {article['description']}"
+            score, magnitude = score_text(text)
+            for asset in assets:
+                if asset_pattern(asset).search(text):
+                    self.index.add(asset, score, magnitude, article["published_at"], now)
+                    matched += 1
+        return matched
+
+    async def refresh(self, symbols):
+        assets = sorted({symbol.split("/")[0] for symbol in symbols})
+        started = time.time()
+        since = self.last_fetch or started - self.index.ttl
+        articles = matched = 0
+        for batch in self.source.batches(assets):
+            try:
+                fetched = await self.source.fetch(batch, since)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log("[Sentiment] Error fetching news for %d assets: %s", len(batch), e, level='WARNING', stage="sentiment")
+                continue
+            self.stats["requests"] += 1
+            articles += len(fetched)
+            matched += self.ingest(fetched, batch)
+        self.last_fetch = started
+        self.index.prune()
+        self.stats["refreshes"] += 1
+        self.stats["articles"] += articles
+        self.stats["matched"] += matched
+        log(
+            "[Sentiment] %d articles, %d asset matches, %d assets with sentiment",
+            articles, matched, len(self.index.entries), stage="sentiment"
+        )
+
+    # symbols_fn returns the current universe, e.g. lambda: universe["symbols"]
+    async def run(self, symbols_fn):
+        log("[Sentiment] Using %s source, %s requests/day", self.source.name, self.daily_quota)
+        while True:
+            symbols = symbols_fn()
+            interval = SENTIMENT_MIN_REFRESH_SECONDS
+            if symbols:
+                try:
+                    await self.refresh(symbols)
+                except Exception as e:
+                    log("[Sentiment] Error refreshing: %s", e, level='ERROR')
+                interval = self.refresh_interval(sorted({symbol.split("/")[0] for symbol in symbols}))
+            await asyncio.sleep(interval)
+
+
 def fetch_sentiment(symbol):
     try:
-        # Temporary dummy sentiment data due to News API rate limit
-        log(f"Fetching dummy sentiment for {symbol} (News API rate limit exceeded)", level='INFO')
-        return {'score': 0.0, 'magnitude': 0.0}
+        sentiment = sentiment_index.get(symbol.split("/")[0])
+        return sentiment if sentiment is not None else {'score': 0.0, 'magnitude': 0.0}
     except Exception as e:
-        log(f"Unexpected error in fetch_sentiment for {symbol}: {e}", level='ERROR')
+        log("Unexpected error in fetch_sentiment for %s: %s", symbol, e, level='ERROR')
         return None
 
 def adjust_confidence(confidence, sentiment, *args):
     try:
         # Handle extra arguments gracefully
         if args:
-            log(f"Extra arguments {args} ignored in adjust_confidence", level='WARNING')
-        
+            log("Extra arguments %s ignored in adjust_confidence", args, level='WARNING')
+
         if sentiment is None or 'score' not in sentiment:
-            log("No valid sentiment data for confidence adjustment", level='WARNING')
+            log("No valid sentiment data for confidence adjustment", level='DEBUG')
             return confidence
 
         sentiment_score = sentiment['score']
@@ -27,5 +192,5 @@ def adjust_confidence(confidence, sentiment, *args):
 
         return max(0.0, min(confidence, 100.0))
     except Exception as e:
-        log(f"Error adjusting confidence: {e}", level='ERROR')
+        log("Error adjusting confidence: %s", e, level='ERROR')
         return confidence
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from utils.logger import log
+
+# Per-symbol work as a chain of stages joined by bounded queues. Each stage runs its own
+# workers, so one symbol's notification, the next one's analysis and the one after's
+# fetch are in flight at the same time. A stage function takes an item and returns the
+# item for the next stage, or None to drop it; errors and timeouts drop the item too.
+#
+#   pipeline = Pipeline("scan", [
+#       Stage("analyze", analyze, concurrency=8, timeout=60),
+#       Stage("dispatch", dispatch, concurrency=1),
+#   ])
+#   stats = await pipeline.run(symbols)
+
+_DONE = object()
+
+
+class Stage:
+    def __init__(self, name, fn, concurrency=1, queue_size=None, timeout=None):
+        self.name = name
+        self.fn = fn
+        self.concurrency = concurrency
+        self.queue_size = queue_size or 2 * concurrency  # Input queue; a full queue holds up the stage before
+        self.timeout = timeout
+
+
+class Pipeline:
+    def __init__(self, name, stages):
+        self.name = name
+        self.stages = stages
+        self.last_stats = {}
+
+    async def _worker(self, stage, inbox, outbox, stats):
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            stats["in"] += 1
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(stage.fn(item), stage.timeout)
+            except asyncio.TimeoutError:
+                stats["timeouts"] += 1
+                log("[Pipeline] %s/%s timed out after %ss on %s", self.name, stage.name, stage.timeout, item, level='WARNING', stage=stage.name)
+                result = None
+            except Exception as e:
+                stats["errors"] += 1
+                log("[Pipeline] %s/%s failed on %s: %s", self.name, stage.name, item, e, level='ERROR', stage=stage.name)
+                result = None
+            finally:
+                stats["busy_seconds"] += time.perf_counter() - started
+            if result is None:
+                stats["dropped"] += 1
+                continue
+            stats["out"] += 1
+            if outbox is not None:
+                await outbox.put(result)
+                stats["max_queue_next"] = max(stats["max_queue_next"], outbox.qsize())
+
+    async def _run_stage(self, stage, inbox, outbox, next_workers, stats):
+        started = time.perf_counter()
+        await asyncio.gather(*(self._worker(stage, inbox, outbox, stats) for _ in range(stage.concurrency)))
+        stats["seconds"] = time.perf_counter() - started
+        # The next stage stops once every one of its workers has seen the end marker
+        if outbox is not None:
+            for _ in range(next_workers):
+                await outbox.put(_DONE)
+
+    async def _feed(self, items, inbox, workers, stats):
+        try:
+            # Pulled lazily, so a generator that sheds work on a deadline is asked only as room frees up
+            for item in items:
+                await inbox.put(item)
+                stats["fed"] += 1
+        finally:
+            for _ in range(workers):
+                await inbox.put(_DONE)
+
+    async def run(self, items):
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        stats = {
+            stage.name: {"in": 0, "out": 0, "dropped": 0, "errors": 0, "timeouts": 0, "busy_seconds": 0.0, "max_queue_next": 0}
+            for stage in self.stages
+        }
+        feed_stats = {"fed": 0}
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(self._feed(items, queues[0], self.stages[0].concurrency, feed_stats))]
+        for i, stage in enumerate(self.stages):
+            last = i == len(self.stages) - 1
+            tasks.append(asyncio.create_task(self._run_stage(
+                stage, queues[i], None if last else queues[i + 1], 0 if last else self.stages[i + 1].concurrency, stats[stage.name]
+            )))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        elapsed = time.perf_counter() - started
+        for stage in self.stages:
+            entry = stats[stage.name]
+            entry["busy_seconds"] = round(entry["busy_seconds"], 3)
+            entry["seconds"] = round(entry.get("seconds", elapsed), 3)
+            entry["per_second"] = round(entry["in"] / entry["seconds"], 2) if entry["seconds"] else 0.0
+            # Average workers busy: near concurrency means the stage is the bottleneck
+            entry["utilization"] = round(entry["busy_seconds"] / (entry["seconds"] * stage.concurrency), 2) if entry["seconds"] else 0.0
+        self.last_stats = {"items": feed_stats["fed"], "seconds": round(elapsed, 3), "stages": stats}
+        log(
+            "[Pipeline] %s: %d items in %.1fs; %s", self.name, feed_stats["fed"], elapsed,
+            ", ".join(f"{name} {s['in']}->{s['out']} ({s['utilization']:.0%} busy)" for name, s in stats.items()),
+            stage="pipeline"
+        )
+        return self.last_stats
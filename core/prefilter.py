@@ -0,0 +1,109 @@
+import asyncio
+import warnings
+import numpy as np
+from core.scheduler import last_closed_candle
+from data.candle_store import OHLCV_COLUMNS, candle_store, fetch_buffered_ohlcv
+from utils.cpu_pool import cpu_pool
+from utils.memory import buffer_pool
+from utils.logger import log
+
+PREFILTER_LOOKBACK = 50  # Closed candles stacked per symbol
+MIN_CANDLES = 20
+FETCH_CONCURRENCY = 10
+
+# Screen thresholds
+WHALE_MIN_QUOTE_VOLUME = 1_000_000  # USDT (volume x close) traded in the last closed candle
+WHALE_VOLUME_MULTIPLIER = 1.5  # Last candle vs 5-candle average
+MIN_ATR_PCT = 0.15  # TP1 sits at 0.15 ATR, below this it is inside the spread
+MAX_ATR_PCT = 8.0
+MOMENTUM_CANDLES = 4
+MIN_MOMENTUM_PCT = 0.25
+
+
+# Every screen takes the stacked (symbols x time x ohlcv) array and returns a boolean keep-mask
+
+def whale_volume_screen(candles):
+    close = candles[:, :, 4]
+    volume = candles[:, :, 5]
+    volume_sma_5 = np.nanmean(volume[:, -5:], axis=1)
+    current_volume = volume[:, -1]
+    return (current_volume * close[:, -1] > WHALE_MIN_QUOTE_VOLUME) & (current_volume > WHALE_VOLUME_MULTIPLIER * volume_sma_5)
+
+
+def atr_pct_screen(candles, periods=14):
+    high = candles[:, 1:, 2]
+    low = candles[:, 1:, 3]
+    prev_close = candles[:, :-1, 4]
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    atr_pct = np.nanmean(tr[:, -periods:], axis=1) / candles[:, -1, 4] * 100
+    return (atr_pct >= MIN_ATR_PCT) & (atr_pct <= MAX_ATR_PCT)
+
+
+def momentum_screen(candles):
+    close = candles[:, :, 4]
+    change_pct = (close[:, -1] / close[:, -1 - MOMENTUM_CANDLES] - 1) * 100
+    return np.abs(change_pct) >= MIN_MOMENTUM_PCT
+
+
+DEFAULT_STAGES = [
+    ("atr_pct", atr_pct_screen),
+    ("momentum", momentum_screen)
+]
+
+WHALE_STAGES = [
+    ("whale_volume", whale_volume_screen),
+    ("atr_pct", atr_pct_screen),
+    ("momentum", momentum_screen)
+]
+
+
+# Run the screens in order on the survivors of the previous one and count rejections per stage
+def run_cascade(symbols, candles, stages=DEFAULT_STAGES):
+    report = {"input": len(symbols)}
+    try:
+        keep = np.count_nonzero(np.isfinite(candles[:, :, 4]), axis=1) >= MIN_CANDLES
+        # Short buffers are NaN-padded at the start; screens only look at the tail
+        keep &= np.isfinite(candles[:, -MIN_CANDLES:, :]).all(axis=(1, 2))
+        report["insufficient_data"] = int(len(symbols) - keep.sum())
+        with warnings.catch_warnings(), np.errstate(divide="ignore", invalid="ignore"):
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for name, screen in stages:
+                index = np.flatnonzero(keep)
+                if not len(index):
+                    report[name] = 0
+                    continue
+                passed = screen(candles[index])
+                keep[index[~passed]] = False
+                report[name] = int((~passed).sum())
+        survivors = [symbol for symbol, kept in zip(symbols, keep) if kept]
+        report["survivors"] = len(survivors)
+        rejected = ", ".join(f"{name} -{count}" for name, count in report.items() if name not in ("input", "survivors"))
+        log("[Prefilter] %d symbols, rejected: %s, %d survivors", report['input'], rejected, len(survivors))
+        return survivors, report
+    except Exception as e:
+        log("[Prefilter] Error running cascade, passing all symbols through: %s", e, level='ERROR')
+        report["survivors"] = len(symbols)
+        return list(symbols), report
+
+
+# Bring the candle buffers of the whole batch up to date, a few requests at a time
+async def refresh_candles(exchange, symbols, timeframe, limit=PREFILTER_LOOKBACK, max_age=None):
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def refresh(symbol):
+        async with semaphore:
+            try:
+                await fetch_buffered_ohlcv(exchange, symbol, timeframe, limit=limit, max_age=max_age)
+            except Exception as e:
+                log("[%s] Prefilter fetch failed: %s", symbol, e, level='WARNING', symbol=symbol, stage="prefilter")
+
+    await asyncio.gather(*(refresh(symbol) for symbol in symbols))
+
+
+# Screens see closed candles only, like analyze_symbol: early in a cycle the forming
+# candle has almost no volume or range yet
+async def prefilter_symbols(exchange, symbols, timeframe="15m", stages=DEFAULT_STAGES, limit=PREFILTER_LOOKBACK):
+    await refresh_candles(exchange, symbols, timeframe, limit=limit + 1)
+    with buffer_pool.borrow((len(symbols), limit, len(OHLCV_COLUMNS))) as candles:
+        candle_store.stack(symbols, timeframe, limit, out=candles, until=last_closed_candle(timeframe))
+        return await cpu_pool.run(run_cascade, symbols, candles, stages, portable=True)
@@ -0,0 +1,57 @@
+import numpy as np
+from core.analysis import analyze_symbol
+from core.scheduler import candle_activity, last_closed_candle
+from data import market_data
+from data.candle_store import candle_store
+from utils.support_resistance import get_level_index, get_sr_tracker, update_levels
+from utils.logger import log
+
+
+# Fetch and compute side of a scan: analysis plus the levels the notifier needs.
+# Cooldowns, thresholds and notifications stay with the caller so they can be
+# applied in one place when several processes evaluate symbols.
+async def evaluate_symbol(exchange, symbol, scheduler=None, context=None):
+    result = await analyze_symbol(exchange, symbol, context=context)
+    if scheduler is not None:
+        # Volatility and volume for the next cycle's priority, signal or not, from the buffer analysis used
+        timeframe = result.timeframe if result else scheduler.timeframe
+        buffered = candle_store.get(symbol, timeframe)
+        atr_pct, volume_change = candle_activity(buffered) if buffered is not None else (None, None)
+        scheduler.record_analysis(symbol, atr_pct=atr_pct, volume_change=volume_change)
+    if not result:
+        log("⚠️ %s - No valid signal", symbol, level="DEBUG", symbol=symbol, stage="evaluate")
+        return None
+
+    log(
+        "🔍 %s | Confidence: %.2f | Direction: %s | TP1 Chance: %.2f",
+        symbol, result.confidence, result.direction, result.tp1_possibility,
+        symbol=symbol, stage="evaluate"
+    )
+
+    # Support/resistance from the candles analysis just buffered; refetch only if missing
+    ohlcv = candle_store.get(symbol, result.timeframe)
+    if ohlcv is None:
+        ohlcv = await market_data.fetch_ohlcv(exchange, symbol, result.timeframe, limit=50)
+        update_levels(symbol, result.timeframe, [row for row in ohlcv if row[0] <= last_closed_candle(result.timeframe)])
+    candles = np.asarray(ohlcv[-50:], dtype="float64")
+    sr_tracker = get_sr_tracker(symbol, result.timeframe)
+    support = sr_tracker.support or 0.0
+    resistance = sr_tracker.resistance or 0.0
+    nearest = get_level_index(symbol).nearest(result.entry)
+    if nearest["support"] and nearest["resistance"]:
+        log(
+            "[%s] Nearest pivot support %.4f (-%.2f%%), resistance %.4f (+%.2f%%)",
+            symbol, nearest["support"], nearest["support_distance_pct"], nearest["resistance"], nearest["resistance_distance_pct"],
+            level="DEBUG", symbol=symbol, stage="evaluate"
+        )
+    # Straight from the candle buffer; no per-symbol DataFrame
+    atr = (candles[-14:, 2] - candles[-14:, 3]).mean() if len(candles) >= 14 else np.nan
+
+    return {
+        "symbol": symbol,
+        "result": result,
+        "atr": float(atr),
+        "support": float(support),
+        "resistance": float(resistance),
+        "candle_time": int(ohlcv[-1][0])
+    }
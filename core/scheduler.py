@@ -0,0 +1,141 @@
+import heapq
+import numpy as np
+from utils import clock
+from utils.logger import log
+
+TIMEFRAME_SECONDS = {
+    "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
+    "1h": 3600, "2h": 7200, "4h": 14400, "1d": 86400
+}
+
+CANDLE_CLOSE_GRACE_SECONDS = 3  # Give the exchange a moment to publish the closed candle
+CYCLE_SAFETY_MARGIN_SECONDS = 20  # Stop a cycle this long before the next close
+
+# Priority weights
+ATR_WEIGHT = 1.0  # Per 1% ATR of price
+VOLUME_WEIGHT = 2.0  # Per 100% volume increase
+STALENESS_WEIGHT = 1.5  # Per candle period since last analysis
+STALENESS_CAP = 4.0  # Candle periods; never-analysed symbols get the cap
+
+
+def timeframe_to_seconds(timeframe):
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return TIMEFRAME_SECONDS[timeframe]
+
+
+def seconds_until_next_close(timeframe="15m", now=None, grace=CANDLE_CLOSE_GRACE_SECONDS):
+    period = timeframe_to_seconds(timeframe)
+    now = clock.now() if now is None else now
+    return period - (now % period) + grace
+
+
+# Open time (ms) of the latest candle that has closed and had time to be published
+def last_closed_candle(timeframe="15m", now=None, grace=CANDLE_CLOSE_GRACE_SECONDS):
+    period = timeframe_to_seconds(timeframe)
+    now = clock.now() if now is None else now
+    return int(((now - grace) // period - 1) * period * 1000)
+
+
+# ATR% and last-candle volume change from a (n, 6) candle buffer, as record_analysis takes them
+def candle_activity(candles, periods=14):
+    candles = np.asarray(candles, dtype="float64")
+    if len(candles) < 2:
+        return None, None
+    close = candles[-1, 4]
+    atr = (candles[-periods:, 2] - candles[-periods:, 3]).mean()
+    volume_sma = candles[-21:-1, 5].mean()
+    return (atr / close * 100 if close else None), (candles[-1, 5] / volume_sma - 1 if volume_sma else None)
+
+
+class ScanScheduler:
+    def __init__(self, timeframe="15m", max_symbols=150):
+        self.timeframe = timeframe
+        self.period = timeframe_to_seconds(timeframe)
+        self.max_symbols = max_symbols
+        self.stats = {}  # symbol -> {"atr_pct", "volume_change", "last_analyzed"}
+        self.last_cycle = {}
+
+    def _entry(self, symbol):
+        return self.stats.setdefault(symbol, {"atr_pct": 0.0, "volume_change": 0.0, "last_analyzed": None})
+
+    # Cheap first guess from the 24h ticker that get_valid_symbols already fetches
+    def update_from_ticker(self, symbol, ticker):
+        try:
+            last = ticker.get("last") or ticker.get("close")
+            high, low = ticker.get("high"), ticker.get("low")
+            if last and high and low:
+                entry = self._entry(symbol)
+                # Only seed ATR% until a real candle-based value is recorded
+                if entry["last_analyzed"] is None:
+                    entry["atr_pct"] = (high - low) / last * 100 / (86400 / self.period) ** 0.5
+        except Exception as e:
+            log("[%s] Error updating scheduler from ticker: %s", symbol, e, level='WARNING', symbol=symbol)
+
+    def record_analysis(self, symbol, atr_pct=None, volume_change=None, now=None):
+        entry = self._entry(symbol)
+        if atr_pct is not None and atr_pct == atr_pct:  # Skip NaN
+            entry["atr_pct"] = float(atr_pct)
+        if volume_change is not None and volume_change == volume_change:
+            entry["volume_change"] = float(volume_change)
+        entry["last_analyzed"] = clock.now() if now is None else now
+
+    def priority(self, symbol, now=None):
+        now = clock.now() if now is None else now
+        entry = self.stats.get(symbol)
+        if entry is None:
+            return STALENESS_WEIGHT * STALENESS_CAP
+        if entry["last_analyzed"] is None:
+            staleness = STALENESS_CAP
+        else:
+            staleness = min((now - entry["last_analyzed"]) / self.period, STALENESS_CAP)
+        return (
+            ATR_WEIGHT * entry["atr_pct"] +
+            VOLUME_WEIGHT * max(entry["volume_change"], 0.0) +
+            STALENESS_WEIGHT * staleness
+        )
+
+    def build_queue(self, symbols, now=None):
+        now = clock.now() if now is None else now
+        # Ties keep the input order so the queue is deterministic
+        queue = [(-self.priority(symbol, now), i, symbol) for i, symbol in enumerate(symbols)]
+        heapq.heapify(queue)
+        return queue
+
+    def order(self, symbols, now=None):
+        queue = self.build_queue(symbols, now)
+        limit = min(len(queue), self.max_symbols)
+        return [heapq.heappop(queue)[2] for _ in range(limit)]
+
+    def to_state(self):
+        return {"stats": {symbol: dict(entry) for symbol, entry in self.stats.items()}}
+
+    def load_state(self, state):
+        self.stats.update(state.get("stats", {}))
+
+    def cycle_deadline(self, now=None):
+        now = clock.now() if now is None else now
+        return now + seconds_until_next_close(self.timeframe, now) - CYCLE_SAFETY_MARGIN_SECONDS
+
+    # Yield symbols highest priority first; whatever is left at the deadline is shed
+    def iter_cycle(self, symbols, deadline=None, timer=None):
+        timer = timer or clock.now
+        start = timer()
+        deadline = self.cycle_deadline(start) if deadline is None else deadline
+        selected = self.order(symbols, start)
+        shed = len(symbols) - len(selected)
+        processed = 0
+        for i, symbol in enumerate(selected):
+            if timer() >= deadline:
+                shed += len(selected) - i
+                log("[Scheduler] Cycle overran, shedding %d lowest-priority symbols", len(selected) - i, level='WARNING')
+                break
+            processed += 1
+            yield symbol
+        self.last_cycle = {
+            "started": start,
+            "duration": timer() - start,
+            "processed": processed,
+            "shed": shed
+        }
+        log("[Scheduler] Cycle processed %d symbols, shed %d, took %.1fs", processed, shed, self.last_cycle["duration"])
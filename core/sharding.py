@@ -0,0 +1,248 @@
+import asyncio
+import bisect
+import hashlib
+import multiprocessing as mp
+import os
+import queue
+from utils import clock
+from utils.logger import forward_logs, log, receive_logs
+
+RING_REPLICAS = 100  # Virtual nodes per shard
+WORKER_POLL_SECONDS = 0.5
+WORKER_RESTART_LIMIT = 5  # Restarts per shard before it is left out of the ring
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+# Consistent hashing keeps each symbol on the same shard across cycles (so its candle
+# buffers stay warm) and only moves a dead shard's symbols when the ring changes
+class HashRing:
+    def __init__(self, shards, replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self.ring = []
+        for shard in shards:
+            self.add(shard)
+
+    def add(self, shard):
+        for i in range(self.replicas):
+            bisect.insort(self.ring, (_hash(f"{shard}:{i}"), shard))
+
+    def remove(self, shard):
+        self.ring = [node for node in self.ring if node[1] != shard]
+
+    @property
+    def shards(self):
+        return sorted({shard for _, shard in self.ring})
+
+    def shard_for(self, key):
+        if not self.ring:
+            raise ValueError("Hash ring has no shards")
+        i = bisect.bisect(self.ring, (_hash(key), -1)) % len(self.ring)
+        return self.ring[i][1]
+
+    def assign(self, keys):
+        assignment = {shard: [] for shard in self.shards}
+        for key in keys:
+            assignment[self.shard_for(key)].append(key)
+        return assignment
+
+
+# Entry point of a shard process: runs prefilter + evaluation for the symbols it is sent.
+# Its log records go to the coordinator, the only process that writes bot.log.
+def shard_worker(shard_id, num_shards, task_queue, result_queue, timeframe, log_queue=None):
+    if log_queue is not None:
+        forward_logs(log_queue)
+    asyncio.run(_shard_worker_loop(shard_id, num_shards, task_queue, result_queue, timeframe))
+
+
+async def _shard_worker_loop(shard_id, num_shards, task_queue, result_queue, timeframe):
+    # Imported here so the coordinator process never loads the model twice
+    from core.analysis import initialize_predictor, prepare_cycle_features
+    from core.market_context import build_market_context
+    from core.prefilter import prefilter_symbols
+    from core.scanner import evaluate_symbol
+    from core.scheduler import ScanScheduler
+    from data.exchange_factory import exchange_pool
+    from data.order_books import depth_cache
+    from utils.rate_limiter import rate_limiter
+
+    # All shards share one IP, so each gets its slice of the request weight budget
+    rate_limiter.set_share(1 / num_shards)
+    await initialize_predictor()
+    scheduler = ScanScheduler(timeframe=timeframe, max_symbols=10_000)
+    loop = asyncio.get_running_loop()
+    log("[Shard %s] Worker started (pid %s)", shard_id, os.getpid())
+
+    while True:
+        task = await loop.run_in_executor(None, task_queue.get)
+        if task is None:
+            break
+        cycle, symbols, deadline = task["cycle"], task["symbols"], task["deadline"]
+        processed = 0
+        analyzed = {}  # symbol -> (atr_pct, volume_change, last_analyzed) for the coordinator's scheduler
+        context = None
+        exchange = exchange_pool.get()
+        depth_cache.begin_cycle()
+        try:
+            # As in the single-process scan. The market context covers this shard's symbols:
+            # the benchmarks are the same everywhere, breadth and volatility are a sample
+            survivors, _ = await prefilter_symbols(exchange, symbols, timeframe)
+            _, _, context = await asyncio.gather(
+                prepare_cycle_features(survivors, timeframe),
+                depth_cache.refresh(exchange, survivors),
+                build_market_context(exchange, symbols, timeframe)
+            )
+            for symbol in scheduler.iter_cycle(survivors, deadline=deadline):
+                try:
+                    candidate = await evaluate_symbol(exchange, symbol, scheduler, context)
+                    processed += 1
+                    entry = scheduler.stats[symbol]
+                    analyzed[symbol] = (entry["atr_pct"], entry["volume_change"], entry["last_analyzed"])
+                    if candidate:
+                        # Dispatch's liquidity gate then needs no second order book fetch
+                        candidate["depth"] = depth_cache.get(symbol)
+                        result_queue.put({"type": "candidate", "shard": shard_id, "cycle": cycle, "candidate": candidate})
+                except Exception as e:
+                    log("[Shard %s] Error processing %s: %s", shard_id, symbol, e, level='ERROR', symbol=symbol)
+        except Exception as e:
+            log("[Shard %s] Error in cycle %s: %s", shard_id, cycle, e, level='ERROR')
+        finally:
+            result_queue.put({
+                "type": "done", "shard": shard_id, "cycle": cycle, "processed": processed, "analyzed": analyzed,
+                "context": context.to_dict() if context is not None else None
+            })
+
+    await exchange_pool.close()
+    log("[Shard %s] Worker stopped", shard_id)
+
+
+class ShardCoordinator:
+    def __init__(self, num_shards, dispatch, timeframe="15m", scheduler=None, depth_cache=None):
+        self.num_shards = num_shards
+        self.dispatch = dispatch  # async callable applied to every candidate, in this process
+        self.scheduler = scheduler  # Orders the next cycle; gets what the shards measured
+        self.depth_cache = depth_cache  # Gets the order book features shards fetched, before dispatch
+        self.timeframe = timeframe
+        self.ctx = mp.get_context("spawn")
+        self.result_queue = self.ctx.Queue()
+        self.log_queue = self.ctx.Queue()
+        self.log_listener = None
+        self.workers = {}  # shard -> (process, task_queue)
+        self.restarts = {shard: 0 for shard in range(num_shards)}
+        self.ring = HashRing(range(num_shards))
+        self.cycle = 0
+
+    def _spawn(self, shard):
+        task_queue = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=shard_worker,
+            args=(shard, self.num_shards, task_queue, self.result_queue, self.timeframe, self.log_queue),
+            name=f"scanner-shard-{shard}",
+            daemon=True
+        )
+        process.start()
+        self.workers[shard] = (process, task_queue)
+
+    def start(self):
+        self.log_listener = receive_logs(self.log_queue)
+        for shard in range(self.num_shards):
+            self._spawn(shard)
+        log("[Coordinator] Started %d scanner shards", self.num_shards)
+
+    # Restart dead shards; a shard that keeps dying is taken out of the ring
+    def check_workers(self):
+        dead = [shard for shard, (process, _) in self.workers.items() if not process.is_alive()]
+        for shard in dead:
+            del self.workers[shard]
+            self.restarts[shard] += 1
+            if self.restarts[shard] > WORKER_RESTART_LIMIT:
+                self.ring.remove(shard)
+                log("[Coordinator] Shard %s keeps failing, removed from ring", shard, level='ERROR')
+            else:
+                log("[Coordinator] Shard %s died, restarting", shard, level='WARNING')
+                self._spawn(shard)
+        return dead
+
+    # Hand a dead shard's symbols to the rest of the ring; dispatch de-duplicates
+    def reassign_dead(self, pending, cycle, deadline):
+        for shard in self.check_workers():
+            lost = [symbol for task in pending.pop(shard, []) for symbol in task]
+            if not lost or not self.ring.shards:
+                continue
+            log("[Coordinator] Reassigning %d symbols from shard %s", len(lost), shard, level='WARNING')
+            survivors = HashRing([s for s in self.ring.shards if s != shard and s in self.workers])
+            if not survivors.ring:
+                continue
+            for other, moved in survivors.assign(lost).items():
+                self.workers[other][1].put({"cycle": cycle, "symbols": moved, "deadline": deadline})
+                pending.setdefault(other, []).append(moved)
+
+    async def run_cycle(self, symbols, deadline):
+        self.cycle += 1
+        cycle = self.cycle
+        self.check_workers()
+        assignment = self.ring.assign(symbols)
+        pending = {}  # shard -> symbol lists of its unfinished tasks, in order
+        for shard, shard_symbols in assignment.items():
+            if shard in self.workers:
+                self.workers[shard][1].put({"cycle": cycle, "symbols": shard_symbols, "deadline": deadline})
+                pending[shard] = [shard_symbols]
+
+        loop = asyncio.get_running_loop()
+        candidates = processed = 0
+        contexts = {}  # shard -> its market context for this cycle
+        while pending and clock.now() < deadline:
+            # Checked every pass, not only when the queue is quiet: busy shards can hide a dead one
+            self.reassign_dead(pending, cycle, deadline)
+            if not pending:
+                break
+            try:
+                message = await loop.run_in_executor(None, self.result_queue.get, True, WORKER_POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if message["cycle"] != cycle:
+                continue
+            if message["type"] == "candidate":
+                candidates += 1
+                candidate = message["candidate"]
+                if self.depth_cache is not None and "depth" in candidate:
+                    self.depth_cache.put(candidate["symbol"], candidate.pop("depth"))
+                try:
+                    await self.dispatch(message["candidate"])
+                except Exception as e:
+                    log("[Coordinator] Error dispatching %s: %s", message['candidate'].get('symbol'), e, level='ERROR')
+            elif message["type"] == "done":
+                processed += message["processed"]
+                if message.get("context"):
+                    contexts[message["shard"]] = message["context"]
+                if self.scheduler is not None:
+                    for symbol, (atr_pct, volume_change, analyzed_at) in message.get("analyzed", {}).items():
+                        self.scheduler.record_analysis(symbol, atr_pct=atr_pct, volume_change=volume_change, now=analyzed_at)
+                tasks = pending.get(message["shard"])
+                if tasks:
+                    tasks.pop(0)
+                if not tasks:
+                    pending.pop(message["shard"], None)
+
+        if pending:
+            log("[Coordinator] Cycle %s hit its deadline with shards %s unfinished", cycle, sorted(pending), level='WARNING')
+        log(
+            "[Coordinator] Cycle %d: %d symbols over %d shards, %d evaluated, %d candidates",
+            cycle, len(symbols), len(assignment), processed, candidates
+        )
+        return {"cycle": cycle, "processed": processed, "candidates": candidates, "contexts": contexts}
+
+    def stop(self):
+        for shard, (process, task_queue) in self.workers.items():
+            task_queue.put(None)
+        for shard, (process, _) in self.workers.items():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self.workers = {}
+        if self.log_listener is not None:
+            self.log_listener.stop()
+            self.log_listener = None
+        log("[Coordinator] Scanner shards stopped")
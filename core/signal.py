@@ -0,0 +1,189 @@
+import csv
+import os
+import struct
+from dataclasses import dataclass, fields
+from datetime import datetime
+import numpy as np
+import pytz
+from utils import clock
+
+# One trade signal, from the predictor through dispatch, tracking and the signal logs.
+# Fields are fixed; timestamp is epoch milliseconds (the candle clock's time when the
+# signal was generated) and is only formatted as a date string when written to a CSV.
+
+SIGNAL_TIMEZONE = pytz.timezone("Asia/Karachi")
+
+# Older code and the CSV logs name two fields differently
+LEGACY_KEYS = {"price": "entry", "prediction": "direction"}
+
+
+@dataclass(slots=True)
+class Signal:
+    symbol: str
+    timeframe: str
+    direction: str
+    entry: float
+    tp1: float
+    tp2: float
+    tp3: float
+    sl: float
+    confidence: float
+    tp1_possibility: float = 0.0
+    tp2_possibility: float = 0.0
+    tp3_possibility: float = 0.0
+    timestamp: int = 0
+    # Filled in at dispatch
+    trade_type: str = ""
+    leverage: int = 0
+    atr: float = 0.0
+    support: float = 0.0
+    resistance: float = 0.0
+    status: str = "open"
+
+    # Read access by key, so code written against the old signal dicts keeps working
+    def __getitem__(self, key):
+        try:
+            return getattr(self, LEGACY_KEYS.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __reduce__(self):
+        return decode_signal, (encode_signal(self),)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELD_NAMES}
+
+    # Tolerates the old dict shapes: "price" for entry, "prediction" for direction, and
+    # ISO strings or epoch seconds for the timestamp
+    @classmethod
+    def from_dict(cls, data):
+        values = {}
+        for name in FIELD_NAMES:
+            for key in (name, LEGACY_NAMES.get(name)):
+                if key is not None and data.get(key) is not None:
+                    values[name] = data[key]
+                    break
+        for name in REQUIRED_FIELDS:
+            values.setdefault(name, FIELD_TYPES[name]())
+        values["timestamp"] = epoch_ms(values.get("timestamp", 0))
+        return cls(**values)
+
+    def time(self, tz=SIGNAL_TIMEZONE):
+        return datetime.fromtimestamp(self.timestamp / 1000, tz)
+
+    # Row for main.SIGNAL_LOG_FILE, the file replays resolve outcomes from
+    def log_row(self):
+        return {
+            "symbol": self.symbol,
+            "price": self.entry,
+            "confidence": self.confidence,
+            "trade_type": self.trade_type,
+            "timestamp": self.time().isoformat(),
+            "tp1": self.tp1,
+            "tp2": self.tp2,
+            "tp3": self.tp3,
+            "sl": self.sl,
+            "atr": self.atr,
+            "leverage": self.leverage,
+            "support": self.support,
+            "resistance": self.resistance,
+            "midpoint": (self.support + self.resistance) / 2 if self.support and self.resistance else 0.0,
+            "prediction": self.direction,
+            "tp1_possibility": self.tp1_possibility,
+            "tp2_possibility": self.tp2_possibility,
+            "tp3_possibility": self.tp3_possibility,
+            "status": self.status
+        }
+
+
+FIELD_NAMES = tuple(f.name for f in fields(Signal))
+FIELD_TYPES = {f.name: f.type for f in fields(Signal)}
+REQUIRED_FIELDS = ("symbol", "timeframe", "direction", "entry", "tp1", "tp2", "tp3", "sl", "confidence")
+LEGACY_NAMES = {name: key for key, name in LEGACY_KEYS.items()}
+LOG_COLUMNS = tuple(Signal("", "", "", 0, 0, 0, 0, 0, 0).log_row())
+
+
+def as_signal(signal):
+    return signal if isinstance(signal, Signal) else Signal.from_dict(signal)
+
+
+def epoch_ms(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = SIGNAL_TIMEZONE.localize(value)
+        return int(value.timestamp() * 1000)
+    value = float(value or 0)
+    return int(value * 1000 if value < 1e11 else value)  # Seconds or milliseconds
+
+
+def now_ms():
+    return int(clock.now() * 1000)
+
+
+# Binary row: a fixed block of numbers, then the strings with one-byte length prefixes.
+# About 130 bytes a signal against ~350 for the same fields pickled as a dict; used for pickling, so shard
+# results on the multiprocessing queue and open trades in state snapshots go through it.
+ROW_VERSION = 1
+NUMERIC_FIELDS = (
+    "entry", "tp1", "tp2", "tp3", "sl", "confidence", "tp1_possibility", "tp2_possibility",
+    "tp3_possibility", "atr", "support", "resistance"
+)
+STRING_FIELDS = ("symbol", "timeframe", "direction", "trade_type", "status")
+ROW_HEADER = struct.Struct(f"<Bqi{len(NUMERIC_FIELDS)}d")
+
+
+def encode_signal(signal):
+    parts = [ROW_HEADER.pack(ROW_VERSION, signal.timestamp, signal.leverage, *(getattr(signal, name) for name in NUMERIC_FIELDS))]
+    for name in STRING_FIELDS:
+        value = getattr(signal, name).encode()
+        parts.append(len(value).to_bytes(1, "little"))
+        parts.append(value)
+    return b"".join(parts)
+
+
+def decode_signal(data):
+    version, timestamp, leverage, *numbers = ROW_HEADER.unpack_from(data)
+    if version != ROW_VERSION:
+        raise ValueError(f"Unknown signal row version {version}")
+    values = dict(zip(NUMERIC_FIELDS, numbers), timestamp=timestamp, leverage=leverage)
+    offset = ROW_HEADER.size
+    for name in STRING_FIELDS:
+        length = data[offset]
+        values[name] = bytes(data[offset + 1:offset + 1 + length]).decode()
+        offset += 1 + length
+    return Signal(**values)
+
+
+# A batch of signals as one array per field
+def to_columns(signals):
+    columns = {}
+    for name in FIELD_NAMES:
+        values = [getattr(signal, name) for signal in signals]
+        kind = FIELD_TYPES[name]
+        columns[name] = np.array(values, dtype=np.float64 if kind is float else np.int64) if kind is not str else values
+    return columns
+
+
+def to_frame(signals):
+    import polars as pl  # Deferred: not needed to boot
+
+    return pl.DataFrame(to_columns(signals))
+
+
+# Append rows to a CSV, writing the header when the file is new. Callers that share a
+# file hold its lock around this.
+def append_rows(path, columns, rows):
+    new_file = not os.path.exists(path)
+    with open(path, "a", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
@@ -4,7 +4,7 @@ from utils.logger import log
 def detect_whale_activity(symbol, df):
     try:
         if len(df) < 20:
-            log(f"[{symbol}] Insufficient data for whale detection", level='WARNING')
+            log("[%s] Insufficient data for whale detection", symbol, level='WARNING')
             return False
 
         volume_sma_5 = df["volume"].rolling(window=5).mean().iloc[-1]
@@ -12,11 +12,11 @@ def detect_whale_activity(symbol, df):
         volume_threshold = 1_000_000  # Reduced from 2M USDT
 
         if current_volume > volume_threshold and current_volume > 1.5 * volume_sma_5:
-            log(f"[{symbol}] Whale activity detected: Volume {current_volume:.2f} > {volume_threshold:.2f}")
+            log("[%s] Whale activity detected: Volume %.2f > %.2f", symbol, current_volume, volume_threshold)
             return True
         else:
-            log(f"[{symbol}] Insufficient whale volume: {current_volume:.2f}", level='WARNING')
+            log("[%s] Insufficient whale volume: %.2f", symbol, current_volume, level='WARNING')
             return False
     except Exception as e:
-        log(f"[{symbol}] Error in whale detection: {e}", level='ERROR')
+        log("[%s] Error in whale detection: %s", symbol, e, level='ERROR')
         return False
@@ -0,0 +1,111 @@
+import numpy as np
+from core.scheduler import timeframe_to_seconds
+from data import market_data
+from utils import clock
+from utils.logger import log
+
+OHLCV_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+DEFAULT_CAPACITY = 200  # Candles kept per (symbol, timeframe)
+BUFFER_MAX_AGE_SECONDS = 60  # Candles merged this recently are treated as current
+
+
+class CandleStore:
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.buffers = {}  # (symbol, timeframe) -> float64 array of shape (n, 6)
+        self.indicators = {}  # (symbol, timeframe) -> latest indicator values
+        self.updated = {}  # (symbol, timeframe) -> clock time of the last merge
+
+    def get(self, symbol, timeframe):
+        return self.buffers.get((symbol, timeframe))
+
+    def last_timestamp(self, symbol, timeframe):
+        buffer = self.buffers.get((symbol, timeframe))
+        if buffer is None or len(buffer) == 0:
+            return None
+        return int(buffer[-1, 0])
+
+    # Seconds since the buffer was last merged from the exchange
+    def age(self, symbol, timeframe):
+        updated = self.updated.get((symbol, timeframe))
+        return None if updated is None else clock.now() - updated
+
+    # Merge fresh candles by open time; overlapping candles (e.g. the still-open one) are replaced
+    def update(self, symbol, timeframe, ohlcv):
+        try:
+            rows = np.asarray(ohlcv, dtype="float64").reshape(-1, len(OHLCV_COLUMNS))
+            key = (symbol, timeframe)
+            existing = self.buffers.get(key)
+            if existing is not None and len(existing) and len(rows):
+                existing = existing[existing[:, 0] < rows[0, 0]]
+                rows = np.concatenate([existing, rows])
+            elif existing is not None and not len(rows):
+                rows = existing
+            rows = rows[-self.capacity:]
+            self.buffers[key] = rows
+            self.updated[key] = clock.now()
+            return rows
+        except Exception as e:
+            log("[%s] Error updating candle buffer: %s", symbol, e, level='ERROR', symbol=symbol, stage="fetch")
+            return None
+
+    def set_indicators(self, symbol, timeframe, values):
+        self.indicators[(symbol, timeframe)] = dict(values)
+
+    def get_indicators(self, symbol, timeframe):
+        return self.indicators.get((symbol, timeframe))
+
+    def drop(self, symbol):
+        for key in [k for k in self.buffers if k[0] == symbol]:
+            del self.buffers[key]
+        for key in [k for k in self.indicators if k[0] == symbol]:
+            del self.indicators[key]
+        for key in [k for k in self.updated if k[0] == symbol]:
+            del self.updated[key]
+
+    # Copies of the maps; buffers are replaced on merge, never written in place, so
+    # the state can be pickled off the event loop while scanning continues
+    def to_state(self):
+        return {"capacity": self.capacity, "buffers": dict(self.buffers), "indicators": dict(self.indicators), "updated": dict(self.updated)}
+
+    def load_state(self, state):
+        self.capacity = state.get("capacity", self.capacity)
+        self.buffers = dict(state.get("buffers", {}))
+        self.indicators = dict(state.get("indicators", {}))
+        self.updated = dict(state.get("updated", {}))
+
+    # Stack the last `length` candles of many symbols into one (symbols x time x 6)
+    # array; symbols with a shorter buffer are NaN-padded at the start. Fills `out`
+    # (e.g. a pooled buffer) when given. `until` leaves out candles opened after it.
+    def stack(self, symbols, timeframe, length, out=None, until=None):
+        stacked = np.empty((len(symbols), length, len(OHLCV_COLUMNS))) if out is None else out
+        stacked.fill(np.nan)
+        for i, symbol in enumerate(symbols):
+            buffer = self.buffers.get((symbol, timeframe))
+            if buffer is not None and until is not None:
+                buffer = buffer[:np.searchsorted(buffer[:, 0], until, side="right")]
+            if buffer is not None and len(buffer):
+                tail = buffer[-length:]
+                stacked[i, length - len(tail):] = tail
+        return stacked
+
+
+# Process-wide store shared by analysis and snapshots
+candle_store = CandleStore()
+
+
+# Return the latest `limit` candles, fetching only what is new when the buffer is warm
+# and nothing at all when it was merged less than `max_age` seconds ago
+async def fetch_buffered_ohlcv(exchange, symbol, timeframe, limit=50, max_age=None, store=candle_store):
+    buffered = store.get(symbol, timeframe)
+    age = store.age(symbol, timeframe)
+    if max_age is not None and age is not None and age < max_age and len(buffered) >= limit:
+        return buffered[-limit:]
+    since = store.last_timestamp(symbol, timeframe)
+    period_ms = timeframe_to_seconds(timeframe) * 1000
+    if since is not None and len(buffered) >= limit and clock.now() * 1000 - since < limit * period_ms:
+        ohlcv = await market_data.fetch_ohlcv(exchange, symbol, timeframe, since=since, limit=limit)
+    else:
+        ohlcv = await market_data.fetch_ohlcv(exchange, symbol, timeframe, limit=limit)
+    merged = store.update(symbol, timeframe, ohlcv)
+    return ohlcv if merged is None else merged[-limit:]
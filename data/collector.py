@@ -1,38 +1,36 @@
 import asyncio
-import ccxt.async_support as ccxt
+from data import market_data
+from data.exchange_factory import exchange_pool
 import pandas as pd
 from utils.logger import log
 import cachetools
 
 data_cache = cachetools.TTLCache(maxsize=100, ttl=300)  # 5-minute cache
 
-async def fetch_realtime_data(symbol, timeframe="15m"):
+async def fetch_realtime_data(symbol, timeframe="15m", exchange=None):
     try:
         if symbol in data_cache:
             log(f"[{symbol}] Using cached OHLCV data")
             return data_cache[symbol]
 
-        exchange = ccxt.binance({"enableRateLimit": True})
-        ohlcv = await exchange.fetch_ohlcv(symbol, timeframe, limit=100)
+        exchange = exchange or exchange_pool.get(authenticated=False)
+        ohlcv = await market_data.fetch_ohlcv(exchange, symbol, timeframe, limit=100)
         if not ohlcv or len(ohlcv) < 50:
             log(f"[{symbol}] Insufficient OHLCV data", level='WARNING')
-            await exchange.close()
             return None
 
         df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"], dtype="float32")
         df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
         data_cache[symbol] = df
         log(f"[{symbol}] Fetched OHLCV data")
-        await exchange.close()
         return df
     except Exception as e:
         log(f"[{symbol}] Error fetching OHLCV: {e}", level='ERROR')
-        await exchange.close()
         return None
 
-async def websocket_collector(symbol, timeframe="15m"):
+async def websocket_collector(symbol, timeframe="15m", exchange=None):
     try:
-        exchange = ccxt.binance({"enableRateLimit": True})
+        exchange = exchange or exchange_pool.get(authenticated=False, streaming=True)
         while True:
             ohlcv = await exchange.watch_ohlcv(symbol, timeframe, limit=100)
             if not ohlcv or len(ohlcv) < 50:
@@ -46,5 +44,3 @@ async def websocket_collector(symbol, timeframe="15m"):
             await asyncio.sleep(60)  # Update every minute
     except Exception as e:
         log(f"[{symbol}] Error in WebSocket collector: {e}", level='ERROR')
-    finally:
-        await exchange.close()
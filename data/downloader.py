@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import ccxt.async_support as ccxt
+import numpy as np
+import polars as pl
+from core.scheduler import last_closed_candle, timeframe_to_seconds
+from data import market_data
+from data.candle_store import OHLCV_COLUMNS
+from data.exchange_factory import exchange_pool
+from data.history import find_history_file, history_stem, read_candles
+from utils.logger import log
+
+# Bulk candle history for backtests and training, in the data/history layout. Each
+# (symbol, timeframe) is paged backwards from the last closed candle, many of them at
+# once; every request goes through the shared rate limiter. Candles are written to the
+# Parquet file every few pages, so an interrupted run picks up from what is on disk.
+#   python -m data.downloader --top 50 --timeframes 15m,1h --days 180
+#   EXCHANGE_API_URL=http://127.0.0.1:8900 python -m data.downloader --symbols BTC/USDT --days 30
+
+DEFAULT_HISTORY_DIR = "data/history"
+STATE_FILE = "download_state.json"  # Per-job ranges the exchange had no candles for, ranges filled, and progress
+PAGE_LIMIT = 1000  # Candles per request; the Binance maximum
+DOWNLOAD_CONCURRENCY = 8  # Requests in flight across all jobs
+FLUSH_PAGES = 10  # Pages fetched between writes of a job's file
+PAGE_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 2.0
+
+
+# Cleaned (n, 6) candles: sorted, one row per aligned open time (the later copy wins),
+# finite positive prices with high/low enclosing open and close. Returns (candles, dropped).
+def validate_candles(rows, period_ms):
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+    if not len(rows):
+        return rows, 0
+    timestamps, o, h, l, c, v = rows.T
+    valid = (
+        np.isfinite(rows).all(axis=1) & (timestamps % period_ms == 0)
+        & (np.minimum(o, c) > 0) & (l > 0) & (h >= np.maximum(o, c)) & (l <= np.minimum(o, c)) & (v >= 0)
+    )
+    kept = rows[valid]
+    # Last occurrence of each open time, in time order
+    _, last = np.unique(kept[::-1, 0], return_index=True)
+    kept = kept[::-1][last]
+    return kept, len(rows) - len(kept)
+
+
+# Half-open [start, end) ranges of open times in [start, end) with no candle
+def missing_ranges(timestamps, start, end, period_ms):
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    timestamps = timestamps[(timestamps >= start) & (timestamps < end)]
+    edges = np.concatenate([[start - period_ms], timestamps, [end]])
+    holes = np.flatnonzero(np.diff(edges) > period_ms)
+    return [(int(edges[i] + period_ms), int(edges[i + 1])) for i in holes]
+
+
+def subtract_ranges(ranges, removed):
+    result = []
+    for start, end in ranges:
+        pieces = [(start, end)]
+        for r_start, r_end in removed:
+            pieces = [
+                piece for a, b in pieces
+                for piece in ((a, min(b, r_start)), (max(a, r_end), b)) if piece[0] < piece[1]
+            ]
+        result.extend(pieces)
+    return result
+
+
+# Interior holes filled with flat candles at the previous close and zero volume.
+# Returns (candles, holes): the [start, end) ranges that are now synthetic.
+def fill_gaps(candles, period_ms):
+    if len(candles) < 2:
+        return candles, []
+    holes = missing_ranges(candles[:, 0], int(candles[0, 0]), int(candles[-1, 0]), period_ms)
+    if not holes:
+        return candles, []
+    fills = []
+    for start, end in holes:
+        close = candles[np.searchsorted(candles[:, 0], start) - 1, 4]
+        times = np.arange(start, end, period_ms, dtype=np.float64)
+        fills.append(np.column_stack([times, np.full((len(times), 4), close), np.zeros(len(times))]))
+    filled = np.concatenate([candles, *fills])
+    filled = filled[np.argsort(filled[:, 0], kind="stable")]
+    return filled, holes
+
+
+def write_candles(path, candles):
+    frame = pl.DataFrame(candles, schema=OHLCV_COLUMNS, orient="row").with_columns(pl.col("timestamp").cast(pl.Int64))
+    tmp_path = f"{path}.tmp"
+    frame.write_parquet(tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+
+class HistoryDownloader:
+    def __init__(self, exchange, data_dir=DEFAULT_HISTORY_DIR, concurrency=DOWNLOAD_CONCURRENCY, fill=False, restart=False):
+        self.exchange = exchange
+        self.data_dir = data_dir
+        self.fill = fill
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.state_path = os.path.join(data_dir, STATE_FILE)
+        self.state = {"jobs": {}}
+        if not restart and os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.state = json.load(f)
+        self.stats = {"jobs": 0, "complete": 0, "requests": 0, "candles": 0, "retries": 0, "errors": 0, "dropped": 0, "filled": 0}
+
+    def save_state(self):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def load(self, symbol, timeframe):
+        path = find_history_file(self.data_dir, symbol, timeframe)
+        if path is None:
+            return np.empty((0, len(OHLCV_COLUMNS)))
+        return read_candles(path)
+
+    # Merge fetched rows into the job's file
+    def flush(self, symbol, timeframe, candles, rows, period_ms):
+        if rows:
+            candles, dropped = validate_candles(np.concatenate([candles, np.asarray(rows, dtype=np.float64)]), period_ms)
+            self.stats["dropped"] += dropped
+            write_candles(os.path.join(self.data_dir, f"{history_stem(symbol, timeframe)}.parquet"), candles)
+            rows.clear()
+        return candles
+
+    async def fetch_page(self, symbol, timeframe, since, limit):
+        for attempt in range(PAGE_RETRIES + 1):
+            try:
+                async with self.semaphore:
+                    self.stats["requests"] += 1
+                    return await market_data.fetch_ohlcv(self.exchange, symbol, timeframe, since=since, limit=limit)
+            except ccxt.NetworkError as e:  # Timeouts, 5xx and rate limits; the limiter has already backed off
+                if attempt == PAGE_RETRIES:
+                    raise
+                self.stats["retries"] += 1
+                log("[%s] %s page at %d failed, retrying: %s", symbol, timeframe, since, e, level='WARNING', symbol=symbol, stage="download")
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2 ** attempt)
+
+    # One (symbol, timeframe) over [start, end): missing ranges newest first, each paged backwards
+    async def download(self, symbol, timeframe, start, end):
+        key = f"{symbol} {timeframe}"
+        period_ms = timeframe_to_seconds(timeframe) * 1000
+        job = self.state["jobs"].setdefault(key, {"unavailable": []})
+        candles = self.load(symbol, timeframe)
+        todo = subtract_ranges(missing_ranges(candles[:, 0], start, end, period_ms), job["unavailable"])
+        rows, pages = [], 0
+        try:
+            for range_start, range_end in reversed(todo):
+                cursor = range_end
+                while cursor > range_start:
+                    since = max(range_start, cursor - PAGE_LIMIT * period_ms)
+                    page = await self.fetch_page(symbol, timeframe, since, (cursor - since) // period_ms)
+                    page = [row for row in page or [] if since <= row[0] < cursor]
+                    if not page:
+                        break  # Nothing older: before the listing, or a long outage
+                    rows.extend(page)
+                    self.stats["candles"] += len(page)
+                    cursor = since
+                    pages += 1
+                    if pages % FLUSH_PAGES == 0:
+                        candles = self.flush(symbol, timeframe, candles, rows, period_ms)
+                        job["candles"] = len(candles)
+                        self.save_state()
+        except Exception as e:
+            self.stats["errors"] += 1
+            log("[%s] %s download stopped, resumable: %s", symbol, timeframe, e, level='ERROR', symbol=symbol, stage="download")
+            job["complete"] = False
+            return
+        finally:
+            candles = self.flush(symbol, timeframe, candles, rows, period_ms)
+            job["candles"] = len(candles)
+            self.save_state()
+
+        # Every remaining hole was asked for and came back empty: the exchange has no candles there.
+        # Filling is opt-in; the filled ranges are kept in the state so training can leave them out.
+        if self.fill:
+            count = len(candles)
+            candles, holes = fill_gaps(candles, period_ms)
+            if holes:
+                filled = len(candles) - count
+                self.stats["filled"] += filled
+                job["filled"] = sorted(map(list, {*map(tuple, job.get("filled", [])), *holes}))
+                write_candles(os.path.join(self.data_dir, f"{history_stem(symbol, timeframe)}.parquet"), candles)
+                log("[%s] %s filled %d missing candles", symbol, timeframe, filled, level='WARNING', symbol=symbol, stage="download")
+        job["unavailable"] = missing_ranges(candles[:, 0], start, end, period_ms)
+        job["complete"] = True
+        job["candles"] = len(candles)
+        job["range"] = [int(candles[0, 0]), int(candles[-1, 0])] if len(candles) else None
+        self.stats["complete"] += 1
+        self.save_state()
+        log("[%s] %s: %d candles", symbol, timeframe, len(candles), symbol=symbol, stage="download")
+
+    async def run(self, symbols, timeframes, days, now=None):
+        os.makedirs(self.data_dir, exist_ok=True)
+        jobs = []
+        for timeframe in timeframes:
+            period_ms = timeframe_to_seconds(timeframe) * 1000
+            end = last_closed_candle(timeframe, now) + period_ms  # Exclusive; the forming candle is left out
+            start = end - int(days * 86_400_000) // period_ms * period_ms
+            jobs.extend(self.download(symbol, timeframe, start, end) for symbol in symbols)
+        self.stats["jobs"] = len(jobs)
+        started = time.perf_counter()
+        await asyncio.gather(*jobs)
+        return {**self.stats, "seconds": round(time.perf_counter() - started, 1), "data_dir": self.data_dir}
+
+
+# Highest 24h quote volume USDT pairs
+async def top_symbols(exchange, count):
+    markets = await market_data.load_markets(exchange)
+    tickers = await market_data.fetch_tickers(exchange)
+    usdt = [s for s in markets if s.endswith("/USDT") and markets[s].get("active") and s in tickers]
+    return sorted(usdt, key=lambda s: tickers[s].get("quoteVolume") or 0, reverse=True)[:count]
+
+
+async def download(args):
+    exchange = exchange_pool.get(authenticated=False)
+    try:
+        symbols = args.symbols.split(",") if args.symbols else await top_symbols(exchange, args.top)
+        downloader = HistoryDownloader(exchange, args.data_dir, args.concurrency, fill=args.fill, restart=args.restart)
+        return await downloader.run(symbols, args.timeframes.split(","), args.days)
+    finally:
+        await exchange_pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download candle history into the data/history layout")
+    parser.add_argument("--symbols", help="Comma-separated, e.g. BTC/USDT,ETH/USDT; the top --top by volume if omitted")
+    parser.add_argument("--top", type=int, default=50)
+    parser.add_argument("--timeframes", default="15m")
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--data-dir", default=DEFAULT_HISTORY_DIR)
+    parser.add_argument("--concurrency", type=int, default=DOWNLOAD_CONCURRENCY)
+    parser.add_argument("--fill", action="store_true", help="Fill gaps the exchange has no candles for with flat zero-volume candles; recorded under \"filled\" in the state file")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved state and ask again for ranges known to be empty")
+    args = parser.parse_args()
+    report = asyncio.run(download(args))
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
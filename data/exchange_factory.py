@@ -0,0 +1,132 @@
+import os
+import ssl
+import time
+import aiohttp
+import certifi
+from dotenv import load_dotenv
+from data import market_data
+
+load_dotenv()
+
+# Point every client at a stand-in exchange (e.g. sim/fake_exchange.py) instead of Binance
+EXCHANGE_API_URL = os.getenv("EXCHANGE_API_URL")
+
+# Called instead of building a ccxt client when set, e.g. by the replay mode in sim/replay.py
+exchange_override = None
+
+
+POOL_CONNECTIONS = int(os.getenv("EXCHANGE_POOL_CONNECTIONS", "32"))  # Open sockets shared by the pooled clients
+KEEPALIVE_SECONDS = 60
+DNS_CACHE_SECONDS = 300
+MARKETS_MAX_AGE_SECONDS = 6 * 3600
+
+
+# A fresh client that the caller owns and closes. Long-running code uses exchange_pool.
+def create_exchange(authenticated=True, api_url=None, session=None, streaming=False):
+    if exchange_override is not None:
+        return exchange_override(authenticated)
+    config = {
+        'enableRateLimit': False,  # Throttled by the shared limiter
+    }
+    if session is not None:
+        config['session'] = session  # Not closed by the client
+    if authenticated:
+        config['apiKey'] = os.getenv("BINANCE_API_KEY")
+        config['secret'] = os.getenv("BINANCE_API_SECRET")
+    if streaming:
+        from ccxt import pro  # Websocket clients; most processes never need them
+        exchange = pro.binance(config)
+    else:
+        import ccxt.async_support as ccxt  # Deferred until the first client: ~0.5s of imports
+        exchange = ccxt.binance(config)
+    api_url = api_url or EXCHANGE_API_URL
+    if api_url:
+        point_exchange_at(exchange, api_url)
+    return exchange
+
+
+# Only the spot REST endpoints we use are served by the stand-in
+def point_exchange_at(exchange, api_url):
+    base = api_url.rstrip("/")
+    for key in ("public", "private"):
+        exchange.urls['api'][key] = f"{base}/api/v3"
+    exchange.urls['api']['v1'] = f"{base}/api/v1"
+    exchange.options['fetchMarkets'] = ['spot']
+    exchange.options['fetchCurrencies'] = False
+    return exchange
+
+
+# Process-wide ccxt clients: one public and one authenticated, created on first use and
+# sharing one keep-alive HTTP session, so connections, DNS lookups and TLS sessions are
+# reused across the scan, tracker and collectors. Markets are loaded once and shared.
+# Callers borrow clients with get() and never close them; close() runs at shutdown.
+class ExchangePool:
+    def __init__(self, api_url=None):
+        self.api_url = api_url
+        self.session = None
+        self.clients = {}  # (authenticated, streaming) -> client
+        self.markets_loaded = None  # clock of the last load_markets
+        self.stats = {"clients": 0, "borrows": 0, "market_loads": 0}
+
+    def _session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=POOL_CONNECTIONS,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                enable_cleanup_closed=True,
+                ssl=ssl.create_default_context(cafile=certifi.where())
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    # streaming=True gives the ccxt.pro client, whose watch_* methods share one websocket
+    def get(self, authenticated=True, streaming=False):
+        # Replays substitute their own exchange; it has no connections to pool
+        if exchange_override is not None:
+            return exchange_override(authenticated)
+        self.stats["borrows"] += 1
+        key = (authenticated, streaming)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = create_exchange(authenticated, self.api_url, session=self._session(), streaming=streaming)
+            self.stats["clients"] += 1
+            # Another client already has the markets; copying them saves a weight-20 request
+            loaded = next((other for other in self.clients.values() if other.markets), None)
+            if loaded is not None:
+                client.set_markets(loaded.markets, loaded.currencies)
+        return client
+
+    # Load markets on one client and hand them to the others; reloaded when older than
+    # MARKETS_MAX_AGE_SECONDS so listings and delistings are picked up
+    async def load_markets(self, reload=False):
+        client = self.get(authenticated=False)
+        if self.markets_loaded is not None and time.monotonic() - self.markets_loaded > MARKETS_MAX_AGE_SECONDS:
+            reload = True
+        markets = await market_data.load_markets(client, reload)
+        if exchange_override is None and (reload or self.markets_loaded is None):
+            self.markets_loaded = time.monotonic()
+            self.stats["market_loads"] += 1
+            for other in self.clients.values():
+                if other is not client:
+                    other.set_markets(client.markets, client.currencies)
+        return markets
+
+    async def start(self):
+        await self.load_markets()
+        self.get(authenticated=True)
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+        self.clients.clear()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.markets_loaded = None
+
+    def snapshot(self):
+        return dict(self.stats, open=len(self.clients))
+
+
+exchange_pool = ExchangePool()
@@ -0,0 +1,40 @@
+import os
+import polars as pl
+from data.candle_store import OHLCV_COLUMNS
+
+# Stored candles, one file per market and timeframe: {BASE}{QUOTE}_{timeframe}.parquet
+# (or .csv) with the OHLCV_COLUMNS. Read by the fake exchange, the replay mode and
+# the trainer.
+
+HISTORY_EXTENSIONS = ("parquet", "csv")
+
+
+def history_stem(symbol, timeframe):
+    return f"{symbol.replace('/', '')}_{timeframe}"
+
+
+def find_history_file(data_dir, symbol, timeframe):
+    for ext in HISTORY_EXTENSIONS:
+        path = os.path.join(data_dir, f"{history_stem(symbol, timeframe)}.{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# float64 array of shape (n, 6), sorted by open time
+def read_candles(path):
+    frame = pl.read_parquet(path) if path.endswith(".parquet") else pl.read_csv(path)
+    return frame.select(OHLCV_COLUMNS).sort("timestamp").to_numpy().astype("float64")
+
+
+# Symbols with stored candles for a timeframe, e.g. ["BTC/USDT", ...]
+def list_history(data_dir, timeframe, quote="USDT"):
+    suffix = f"{quote}_{timeframe}"
+    symbols = []
+    for name in sorted(os.listdir(data_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lstrip(".") in HISTORY_EXTENSIONS and stem.endswith(suffix):
+            symbol = f"{stem[:-len(suffix)]}/{quote}"
+            if symbol not in symbols:
+                symbols.append(symbol)
+    return symbols
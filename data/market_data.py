@@ -0,0 +1,61 @@
+from utils.rate_limiter import rate_limiter, request_weight
+from utils.single_flight import SingleFlight
+from utils.logger import log
+
+# Identical OHLCV/ticker/order book requests from any caller share one exchange call
+request_flight = SingleFlight()
+
+
+# Every exchange request goes through here so the shared limiter sees its weight
+async def limited_call(exchange, method, *args, **kwargs):
+    weight = request_weight(method, args, kwargs)
+    # ccxt loads markets implicitly on the first call of a fresh client
+    if method != "load_markets" and not exchange.markets:
+        weight += request_weight("load_markets")
+    await rate_limiter.acquire(weight)
+    try:
+        return await getattr(exchange, method)(*args, **kwargs)
+    except Exception as e:
+        import ccxt.async_support as ccxt  # Loaded with the client that raised
+        if isinstance(e, (ccxt.DDoSProtection, ccxt.RateLimitExceeded)):
+            rate_limiter.penalize(exchange.last_response_headers)
+        raise
+    finally:
+        rate_limiter.update_from_headers(exchange.last_response_headers)
+
+
+async def fetch_ohlcv(exchange, symbol, timeframe="15m", since=None, limit=None):
+    return await request_flight.do(
+        ("ohlcv", symbol, timeframe, since, limit),
+        lambda: limited_call(exchange, "fetch_ohlcv", symbol, timeframe, since=since, limit=limit)
+    )
+
+
+async def fetch_ticker(exchange, symbol):
+    return await request_flight.do(("ticker", symbol), lambda: limited_call(exchange, "fetch_ticker", symbol))
+
+
+async def fetch_tickers(exchange, symbols=None):
+    key = ("tickers", tuple(sorted(symbols)) if symbols else None)
+    return await request_flight.do(key, lambda: limited_call(exchange, "fetch_tickers", symbols))
+
+
+async def fetch_order_book(exchange, symbol, limit=None):
+    return await request_flight.do(
+        ("order_book", symbol, limit),
+        lambda: limited_call(exchange, "fetch_order_book", symbol, limit=limit)
+    )
+
+
+async def load_markets(exchange, reload=False):
+    if exchange.markets and not reload:
+        return exchange.markets
+    log("Loading exchange markets")
+    return await limited_call(exchange, "load_markets", reload)
+
+
+def request_stats():
+    return {
+        "single_flight": dict(request_flight.stats, hit_rate=round(request_flight.hit_rate(), 3)),
+        "rate_limiter": dict(rate_limiter.stats)
+    }
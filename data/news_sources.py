@@ -0,0 +1,127 @@
+import json
+import os
+import time
+from datetime import datetime, timezone
+from utils.logger import log
+
+# Where news articles come from. A source answers one bulk query for many assets:
+#   await source.fetch(assets, since) -> [{"url", "title", "description", "published_at"}, ...]
+# with published_at in epoch seconds and url possibly empty. Matching articles to symbols and scoring them
+# happens in core/news_sentiment.py, the same way for every source.
+
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+NEWS_API_KEY = os.getenv("NEWS_API_KEY")
+NEWS_API_QUERY_CHARS = 500  # NewsAPI's limit on q
+NEWS_API_PAGE_SIZE = 100
+NEWS_API_TIMEOUT_SECONDS = 15
+
+# Names that appear in headlines more often than the ticker
+ASSET_NAMES = {
+    "BTC": "Bitcoin", "ETH": "Ethereum", "BNB": "BNB", "SOL": "Solana", "XRP": "Ripple",
+    "ADA": "Cardano", "DOGE": "Dogecoin", "DOT": "Polkadot", "AVAX": "Avalanche", "LINK": "Chainlink",
+    "LTC": "Litecoin", "TRX": "Tron", "MATIC": "Polygon", "SHIB": "Shiba Inu", "TON": "Toncoin",
+    "ATOM": "Cosmos", "NEAR": "NEAR Protocol", "APT": "Aptos", "ARB": "Arbitrum", "OP": "Optimism",
+    "UNI": "Uniswap", "FIL": "Filecoin", "PEPE": "Pepe", "SUI": "Sui", "XLM": "Stellar"
+}
+
+
+def asset_terms(asset):
+    name = ASSET_NAMES.get(asset)
+    return [asset, name] if name and name != asset else [asset]
+
+
+def _epoch(value, default):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return default
+
+
+class NewsApiSource:
+    name = "newsapi"
+
+    def __init__(self, api_key=NEWS_API_KEY, url=NEWS_API_URL):
+        self.api_key = api_key
+        self.url = url
+        self.requests = 0
+
+    # Pack as many assets into one OR query as the length limit allows
+    def batches(self, assets, max_chars=NEWS_API_QUERY_CHARS):
+        batch, length = [], 0
+        for asset in assets:
+            terms = " OR ".join(f'"{term}"' for term in asset_terms(asset))
+            extra = len(terms) + (4 if batch else 0)
+            if batch and length + extra > max_chars:
+                yield batch
+                batch, length = [], 0
+                extra = len(terms)
+            batch.append(asset)
+            length += extra
+        if batch:
+            yield batch
+
+    async def fetch(self, assets, since=None):
+        query = " OR ".join(f'"{term}"' for asset in assets for term in asset_terms(asset))
+        params = {"q": query, "language": "en", "sortBy": "publishedAt", "pageSize": NEWS_API_PAGE_SIZE, "apiKey": self.api_key}
+        if since:
+            params["from"] = datetime.fromtimestamp(since, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        import httpx  # Only needed once a refresh runs
+        async with httpx.AsyncClient(timeout=NEWS_API_TIMEOUT_SECONDS) as client:
+            response = await client.get(self.url, params=params)
+        self.requests += 1
+        response.raise_for_status()
+        fetched_at = time.time()
+        return [
+            {
+                "url": a.get("url") or "",
+                "title": a.get("title") or "",
+                "description": a.get("description") or "",
+                "published_at": _epoch(a.get("publishedAt"), fetched_at)
+            }
+            for a in response.json().get("articles", [])
+        ]
+
+
+# Articles from a JSON file, for offline runs and replays:
+#   {"articles": [{"url": ..., "title": ..., "description": ..., "publishedAt": "2024-05-01T12:00:00Z"}, ...]}
+# Articles without a date count as published when the file was last written.
+class FileSource:
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self.requests = 0
+
+    def batches(self, assets):
+        yield list(assets)
+
+    async def fetch(self, assets, since=None):
+        self.requests += 1
+        written_at = os.path.getmtime(self.path)
+        with open(self.path) as f:
+            articles = json.load(f).get("articles", [])
+        fetched = [
+            {
+                "url": a.get("url") or "",
+                "title": a.get("title") or "",
+                "description": a.get("description") or "",
+                "published_at": _epoch(a.get("publishedAt"), written_at)
+            }
+            for a in articles
+        ]
+        return [a for a in fetched if since is None or a["published_at"] > since]
+
+
+# SENTIMENT_SOURCE: "newsapi", "file:<path>" or "none"; NewsAPI by default when a key is set
+def create_news_source(spec=None):
+    spec = spec or os.getenv("SENTIMENT_SOURCE") or ("newsapi" if NEWS_API_KEY else "none")
+    if spec == "none":
+        return None
+    if spec == "newsapi":
+        if not NEWS_API_KEY:
+            log("SENTIMENT_SOURCE=newsapi but NEWS_API_KEY is missing; sentiment disabled", level='WARNING')
+            return None
+        return NewsApiSource()
+    if spec.startswith("file:"):
+        return FileSource(spec[len("file:"):])
+    raise ValueError(f"Unknown SENTIMENT_SOURCE {spec}")
@@ -0,0 +1,144 @@
+import asyncio
+import numpy as np
+from data import market_data
+from data.exchange_factory import exchange_pool
+from utils.logger import log
+
+DEPTH_LEVELS = 100  # Per side; Binance charges the minimum weight (5) up to 100
+DEPTH_CONCURRENCY = 10
+IMBALANCE_LEVELS = 10  # Top-of-book levels in the bid/ask imbalance
+DEPTH_BANDS_PCT = (0.5, 1.0, 2.0)  # Resting quote volume within this distance of the mid
+
+# Liquidity gate applied before a signal goes out
+MAX_SPREAD_PCT = 0.15
+MIN_DEPTH_QUOTE = 25_000  # USDT within LIQUIDITY_BAND_PCT on the thinner side
+LIQUIDITY_BAND_PCT = 1.0
+
+
+# Book features for a batch of ladders at once. bids/asks are (symbols, levels, 2)
+# arrays of [price, size], best level first, NaN-padded past the end of the book.
+def depth_features(bids, asks):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        best_bid = bids[:, 0, 0]
+        best_ask = asks[:, 0, 0]
+        mid = (best_bid + best_ask) / 2
+        bid_notional = bids[:, :, 0] * bids[:, :, 1]
+        ask_notional = asks[:, :, 0] * asks[:, :, 1]
+        top_bid = np.nansum(bids[:, :IMBALANCE_LEVELS, 1], axis=1)
+        top_ask = np.nansum(asks[:, :IMBALANCE_LEVELS, 1], axis=1)
+        notional = np.concatenate([bid_notional, ask_notional], axis=1)
+        features = {
+            "mid": mid,
+            "spread_pct": (best_ask - best_bid) / mid * 100,
+            "imbalance": (top_bid - top_ask) / (top_bid + top_ask),  # +1 all bids, -1 all asks
+            # Largest single level against the median level: resting whale orders
+            "wall_ratio": np.nanmax(notional, axis=1) / np.nanmedian(notional, axis=1)
+        }
+        for pct in DEPTH_BANDS_PCT:
+            features[f"bid_depth_{pct:g}pct"] = np.nansum(np.where(bids[:, :, 0] >= (mid * (1 - pct / 100))[:, None], bid_notional, 0.0), axis=1)
+            features[f"ask_depth_{pct:g}pct"] = np.nansum(np.where(asks[:, :, 0] <= (mid * (1 + pct / 100))[:, None], ask_notional, 0.0), axis=1)
+    return features
+
+
+# (ok, reason) for one symbol's features
+def check_liquidity(features):
+    if not np.isfinite(features["spread_pct"]):
+        return False, "Empty order book"
+    if features["spread_pct"] > MAX_SPREAD_PCT:
+        return False, f"Spread {features['spread_pct']:.3f}% over {MAX_SPREAD_PCT}%"
+    depth = min(features[f"bid_depth_{LIQUIDITY_BAND_PCT:g}pct"], features[f"ask_depth_{LIQUIDITY_BAND_PCT:g}pct"])
+    if depth < MIN_DEPTH_QUOTE:
+        return False, f"Depth within {LIQUIDITY_BAND_PCT:g}% {depth:,.0f} under {MIN_DEPTH_QUOTE:,}"
+    return True, None
+
+
+# Order book snapshots for the cycle's shortlist, kept as fixed-size price/size ladders
+# in preallocated arrays (one row per symbol) so features for the whole batch are a few
+# array operations. Everything is dropped at the start of the next cycle.
+class DepthCache:
+    def __init__(self, levels=DEPTH_LEVELS, capacity=64):
+        self.levels = levels
+        self.bids = np.full((capacity, levels, 2), np.nan)
+        self.asks = np.full((capacity, levels, 2), np.nan)
+        self.rows = {}  # symbol -> row in bids/asks, for symbols fetched this cycle
+        self.features = {}  # symbol -> feature dict, None when the book could not be fetched
+        self.stats = {"cycles": 0, "fetched": 0, "errors": 0, "unsupported": 0, "rejected": 0}
+
+    def begin_cycle(self):
+        self.rows.clear()
+        self.features.clear()
+        self.stats["cycles"] += 1
+
+    def _row(self, symbol):
+        row = self.rows.get(symbol)
+        if row is None:
+            row = self.rows[symbol] = len(self.rows)
+            if row >= len(self.bids):
+                grow = np.full((len(self.bids), self.levels, 2), np.nan)
+                self.bids = np.concatenate([self.bids, grow])
+                self.asks = np.concatenate([self.asks, grow])
+        return row
+
+    def store(self, symbol, book):
+        row = self._row(symbol)
+        for ladder, side in ((self.bids, book["bids"]), (self.asks, book["asks"])):
+            levels = np.asarray([level[:2] for level in side[:self.levels]], dtype=np.float64).reshape(-1, 2)
+            ladder[row, :len(levels)] = levels
+            ladder[row, len(levels):] = np.nan
+        return row
+
+    async def _fetch(self, exchange, symbol, semaphore):
+        async with semaphore:
+            try:
+                book = await market_data.fetch_order_book(exchange, symbol, limit=self.levels)
+            except Exception as e:
+                import ccxt.async_support as ccxt  # Loaded with the client that raised
+                if isinstance(e, ccxt.NotSupported):
+                    self.stats["unsupported"] += 1
+                    return None
+                self.stats["errors"] += 1
+                log("[%s] Order book fetch failed: %s", symbol, e, level='WARNING', symbol=symbol, stage="depth")
+                return None
+        self.stats["fetched"] += 1
+        return self.store(symbol, book)
+
+    # Fetch the books not yet loaded this cycle and compute their features in one pass
+    async def refresh(self, exchange, symbols):
+        missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in self.features]
+        if not missing:
+            return
+        semaphore = asyncio.Semaphore(DEPTH_CONCURRENCY)
+        rows = await asyncio.gather(*(self._fetch(exchange, symbol, semaphore) for symbol in missing))
+        fetched = [(symbol, row) for symbol, row in zip(missing, rows) if row is not None]
+        for symbol, row in zip(missing, rows):
+            if row is None:
+                self.features[symbol] = None
+        if not fetched:
+            return
+        index = np.array([row for _, row in fetched])
+        batch = depth_features(self.bids[index], self.asks[index])
+        for i, (symbol, _) in enumerate(fetched):
+            self.features[symbol] = {name: float(values[i]) for name, values in batch.items()}
+
+    def get(self, symbol):
+        return self.features.get(symbol)
+
+    # Features computed elsewhere this cycle (a scanner shard); None when it had no book
+    def put(self, symbol, features):
+        self.features[symbol] = features
+
+    # Liquidity gate for one symbol, fetching its book if the cycle has not yet.
+    # Passes when no book is available (e.g. replays), like the prefilter does on errors.
+    async def check(self, symbol, exchange=None):
+        if symbol not in self.features:
+            await self.refresh(exchange or exchange_pool.get(authenticated=False), [symbol])
+        features = self.features.get(symbol)
+        if features is None:
+            return True, None
+        ok, reason = check_liquidity(features)
+        if not ok:
+            self.stats["rejected"] += 1
+        return ok, reason
+
+
+depth_cache = DepthCache()
@@ -0,0 +1,55 @@
+import os
+import pickle
+import tempfile
+import time
+from utils.logger import log
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "state/bot_snapshot.pkl")
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAX_AGE_SECONDS = 6 * 3600  # Older snapshots are ignored on startup
+
+
+# Write to a temp file in the same directory and rename over the old snapshot,
+# so a crash mid-write never leaves a truncated file behind
+def save_snapshot(state, path=SNAPSHOT_PATH):
+    tmp_path = None
+    try:
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        payload = {"version": SNAPSHOT_VERSION, "saved_at": time.time(), "state": state}
+        fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        tmp_path = None
+        log("State snapshot saved to %s", path)
+        return True
+    except Exception as e:
+        log("Error saving state snapshot: %s", e, level='ERROR')
+        return False
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_snapshot(path=SNAPSHOT_PATH, max_age=SNAPSHOT_MAX_AGE_SECONDS):
+    try:
+        if not os.path.exists(path):
+            log("No state snapshot at %s, starting cold", path)
+            return None
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        if payload.get("version") != SNAPSHOT_VERSION:
+            log("Ignoring state snapshot with version %s", payload.get('version'), level='WARNING')
+            return None
+        age = time.time() - payload.get("saved_at", 0)
+        if age > max_age:
+            log("Ignoring stale state snapshot (%.0f minutes old)", age / 60, level='WARNING')
+            return None
+        log("Loaded state snapshot from %s (%.0fs old)", path, age)
+        return payload["state"]
+    except Exception as e:
+        log("Error loading state snapshot: %s", e, level='ERROR')
+        return None
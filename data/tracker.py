@@ -1,69 +1,89 @@
-import polars as pl
+import threading
+from utils.cpu_pool import cpu_pool
 from utils.logger import log
-import ccxt.async_support as ccxt
+from core.signal import as_signal
+from data.exchange_factory import exchange_pool
+from data import market_data
 import asyncio
 
-async def track_trade(symbol, signal):
-    try:
-        exchange = ccxt.binance({"enableRateLimit": True})
-        direction = signal["direction"]
-        price = signal["price"]
-        tp1 = signal["tp1"]
-        tp2 = signal["tp2"]
-        tp3 = signal["tp3"]
-        sl = signal["sl"]
+TRACK_CHECKS = 720  # ~3 hours at the poll interval below
+TRACK_POLL_SECONDS = 15
 
-        status = "pending"
-        for _ in range(720):  # Check for ~3 hours (720 * 15s)
-            ticker = await exchange.fetch_ticker(symbol)
-            current_price = ticker["last"]
+# Trades currently being tracked, keyed by symbol; persisted in state snapshots
+open_trades = {}
 
-            if direction == "LONG":
-                if current_price >= tp3:
-                    status = "tp3"
-                    break
-                elif current_price >= tp2:
-                    status = "tp2"
-                elif current_price >= tp1:
-                    status = "tp1"
-                elif current_price <= sl:
-                    status = "sl"
-                    break
-            else:  # SHORT
-                if current_price <= tp3:
-                    status = "tp3"
-                    break
-                elif current_price <= tp2:
-                    status = "tp2"
-                elif current_price <= tp1:
-                    status = "tp1"
-                elif current_price >= sl:
-                    status = "sl"
-                    break
+# update_signal_log rewrites the whole file; finished trades take turns
+signal_log_lock = threading.Lock()
 
-            await asyncio.sleep(15)  # Check every 15 seconds
+async def track_trade(symbol, signal, exchange=None):
+    signal = as_signal(signal)  # Snapshots from older versions hold plain dicts
+    open_trades[symbol] = signal
+    exchange = exchange or exchange_pool.get(authenticated=False)
+    try:
+        status = "pending"
+        for _ in range(TRACK_CHECKS):
+            ticker = await market_data.fetch_ticker(exchange, symbol)
+            status, finished = update_trade_status(signal, ticker["last"], status)
+            if finished:
+                break
+            await asyncio.sleep(TRACK_POLL_SECONDS)
 
-        log(f"[{symbol}] Trade status: {status}")
-        update_signal_log(symbol, signal, status)
-        await exchange.close()
+        log("[%s] Trade status: %s", symbol, status)
+        await cpu_pool.run(update_signal_log, symbol, signal, status)
+        open_trades.pop(symbol, None)
         return status
     except Exception as e:
-        log(f"[{symbol}] Error tracking trade: {e}", level='ERROR')
-        await exchange.close()
+        log("[%s] Error tracking trade: %s", symbol, e, level='ERROR')
+        open_trades.pop(symbol, None)
         return "error"
 
+# Apply one observed price to a trade; returns the new status and whether the trade is closed
+def update_trade_status(signal, current_price, status="pending"):
+    if signal["direction"] == "LONG":
+        if current_price >= signal["tp3"]:
+            return "tp3", True
+        elif current_price >= signal["tp2"]:
+            return "tp2", False
+        elif current_price >= signal["tp1"]:
+            return "tp1", False
+        elif current_price <= signal["sl"]:
+            return "sl", True
+    else:  # SHORT
+        if current_price <= signal["tp3"]:
+            return "tp3", True
+        elif current_price <= signal["tp2"]:
+            return "tp2", False
+        elif current_price <= signal["tp1"]:
+            return "tp1", False
+        elif current_price >= signal["sl"]:
+            return "sl", True
+    return status, False
+
+# Outcome of a trade over a sequence of prices, as track_trade would have seen them
+def resolve_trade(signal, prices):
+    status = "pending"
+    for price in prices:
+        status, finished = update_trade_status(signal, price, status)
+        if finished:
+            break
+    return status
+
 def update_signal_log(symbol, signal, status):
+    import polars as pl  # Deferred: not needed to boot
+
     try:
         csv_path = "logs/signals_log.csv"
-        df = pl.read_csv(csv_path)
-        df = df.with_columns(pl.col("status").cast(pl.Utf8))
-        df = df.with_columns(
-            pl.when((pl.col("symbol") == symbol) & (pl.col("timestamp") == signal["timestamp"]))
-            .then(status)
-            .otherwise(pl.col("status"))
-            .alias("status")
-        )
-        df.write_csv(csv_path)
-        log(f"[{symbol}] Signal log updated with status: {status}")
+        logged_at = as_signal(signal).time().strftime('%Y-%m-%d %H:%M:%S')  # As log_signal_to_csv wrote it
+        with signal_log_lock:
+            df = pl.read_csv(csv_path)
+            df = df.with_columns(pl.col("status").cast(pl.Utf8))
+            df = df.with_columns(
+                pl.when((pl.col("symbol") == symbol) & (pl.col("timestamp") == logged_at))
+                .then(pl.lit(status))
+                .otherwise(pl.col("status"))
+                .alias("status")
+            )
+            df.write_csv(csv_path)
+        log("[%s] Signal log updated with status: %s", symbol, status)
     except Exception as e:
-        log(f"[{symbol}] Error updating signal log: {e}", level='ERROR')
+        log("[%s] Error updating signal log: %s", symbol, e, level='ERROR')
@@ -1,25 +1,40 @@
 import asyncio
+import dataclasses
 import uvicorn
 from fastapi import FastAPI
-from core.analysis import analyze_symbol, initialize_predictor
-import ccxt.async_support as ccxt
+from fastapi.responses import JSONResponse
+from core import analysis
+from core.analysis import analysis_cache, initialize_predictor, prepare_cycle_features
+from core.scheduler import ScanScheduler, seconds_until_next_close
+from core.pipeline import Pipeline, Stage
+from core.market_context import build_market_context
+from core.prefilter import prefilter_symbols
+from core.scanner import evaluate_symbol
+from core.sharding import ShardCoordinator
+from core.signal import LOG_COLUMNS, append_rows
+from core.news_sentiment import SentimentService, adjust_confidence, fetch_sentiment
+from data import market_data
+from data.candle_store import candle_store
+from data.order_books import depth_cache
+from data.snapshot import save_snapshot, load_snapshot
+from data.tracker import track_trade, open_trades
+from data.exchange_factory import exchange_pool
+from data.news_sources import create_news_source
+from utils.cpu_pool import cpu_pool
+from utils.memory import memory_monitor
+from utils.startup import readiness
 import os
-import logging
-import pandas as pd
 from dotenv import load_dotenv
-import telegram
-from utils.support_resistance import find_support_resistance
-from utils.logger import log
-from datetime import datetime, timedelta
+from utils.logger import get_logger, timed
+from utils import clock
+from datetime import timedelta
 import pytz
-import gc
+import threading
 
-# Logging setup
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger("scanner")
+readiness.mark("imports")
+
+# Logging setup; handlers and levels live in utils/logger.py
+logger = get_logger("scanner")
 
 # Load environment variables
 load_dotenv()
@@ -33,7 +48,15 @@ TP1_POSSIBILITY_THRESHOLD = 0.65  # Adjusted to 65%
 SCALPING_CONFIDENCE_THRESHOLD = 80
 MIN_VOLUME_USD = 1000000  # Increased to filter low liquidity coins
 COOLDOWN_MINUTES = 30
-SCAN_INTERVAL_SECONDS = 1800
+SCAN_TIMEFRAME = "15m"  # Cycles start right after each candle of this timeframe closes
+MAX_SYMBOLS_PER_CYCLE = 150  # Per shard; limit to 150 symbols to reduce CPU load
+SCANNER_SHARDS = int(os.getenv("SCANNER_SHARDS", "1"))  # >1 runs the scan in that many worker processes
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "8"))  # Symbols analysed at once while earlier ones are dispatched
+ANALYSIS_TIMEOUT_SECONDS = 60
+UNIVERSE_REFRESH_SECONDS = 3600  # Re-run the volume filter at most hourly
+SNAPSHOT_INTERVAL_SECONDS = 300
+CONNECTION_TEST_SYMBOL = "BTC/USDT"
+SIGNAL_LOG_FILE = "logs/signals_log_new.csv"  # New file to avoid old data
 
 # Blacklist delisted or low liquidity coins
 BLACKLISTED_SYMBOLS = [
@@ -44,6 +67,25 @@ BLACKLISTED_SYMBOLS = [
 # Track last signal time for each symbol
 last_signal_time = {}
 
+# Open time of the last candle a signal was sent for, per symbol
+dispatched_candles = {}
+
+# Symbols that passed the volume filter and when
+universe = {"symbols": [], "updated": 0.0}
+
+# Orders each cycle by priority and sheds the tail when a cycle overruns
+scheduler = ScanScheduler(timeframe=SCAN_TIMEFRAME, max_symbols=MAX_SYMBOLS_PER_CYCLE * max(SCANNER_SHARDS, 1))
+
+# Worker processes in sharded mode; signals are still dispatched from this process
+coordinator = None
+
+# Stage stats and market context of the last scan cycle, for /health
+pipeline_stats = {}
+market_context = {}
+
+# Signal rows are appended from CPU pool threads
+signal_log_lock = threading.Lock()
+
 # Send Telegram message
 async def send_telegram_message(message):
     try:
@@ -52,45 +94,122 @@ async def send_telegram_message(message):
         if not bot_token or not chat_id:
             logger.error("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID missing!")
             return
+        import telegram  # Deferred: not needed until the first signal
         bot = telegram.Bot(token=bot_token)
         await bot.send_message(chat_id=chat_id, text=message)
         logger.info("Telegram message sent successfully.")
     except Exception as e:
-        logger.error(f"Error sending Telegram message: {e}")
+        logger.error("Error sending Telegram message: %s", e)
 
 # Log signal to CSV
-def log_signal_to_csv(signal, trade_type, atr, leverage, support, resistance, midpoint, prediction):
+def log_signal_to_csv(signal):
     try:
-        signal_data = {
-            "symbol": signal["symbol"],
-            "price": signal["entry"],
-            "confidence": signal["confidence"],
-            "trade_type": trade_type,
-            "timestamp": pd.Timestamp.now(tz=pytz.timezone("Asia/Karachi")).isoformat(),
-            "tp1": signal["tp1"],
-            "tp2": signal["tp2"],
-            "tp3": signal["tp3"],
-            "sl": signal["sl"],
-            "atr": atr,
-            "leverage": leverage,
-            "support": support,
-            "resistance": resistance,
-            "midpoint": (support + resistance) / 2 if support and resistance else 0.0,
-            "prediction": signal["direction"],
-            "tp1_possibility": signal["tp1_possibility"],
-            "tp2_possibility": signal["tp2_possibility"],
-            "tp3_possibility": signal["tp3_possibility"],
-            "status": "open"
-        }
-        df = pd.DataFrame([signal_data])
-        BACKTEST_FILE = "logs/signals_log_new.csv"  # New file to avoid old data
-        if not os.path.exists(BACKTEST_FILE):
-            df.to_csv(BACKTEST_FILE, index=False)
-        else:
-            df.to_csv(BACKTEST_FILE, mode='a', header=False, index=False)
-        logger.info(f"Signal logged to {BACKTEST_FILE}")
+        with signal_log_lock:
+            append_rows(SIGNAL_LOG_FILE, LOG_COLUMNS, [signal.log_row()])
+        logger.info("Signal logged to %s", SIGNAL_LOG_FILE)
+    except Exception as e:
+        logger.error("Error logging signal to CSV: %s", e)
+
+def in_cooldown(symbol):
+    last_time = last_signal_time.get(symbol)
+    return last_time is not None and clock.now_datetime(pytz.timezone("Asia/Karachi")) < last_time + timedelta(minutes=COOLDOWN_MINUTES)
+
+# Thresholds, cooldowns and notifications for an evaluated symbol. Every signal
+# goes through here, in this process, whichever worker evaluated it. True when sent.
+async def dispatch_candidate(candidate):
+    symbol = candidate["symbol"]
+    # The candidate's signal can be shared (analysis cache, coordinator); adjust a copy
+    result = dataclasses.replace(candidate["result"])
+    support = candidate["support"]
+    resistance = candidate["resistance"]
+    atr = candidate["atr"]
+
+    # The same candle can be evaluated twice when a shard's symbols are reassigned
+    if dispatched_candles.get(symbol) == candidate["candle_time"]:
+        logger.info("[%s] Skipped - Candle already dispatched", symbol, extra={"symbol": symbol, "stage": "dispatch"})
+        return
+    if in_cooldown(symbol):
+        logger.debug("[%s] Skipped - In cooldown period", symbol, extra={"symbol": symbol, "stage": "dispatch"})
+        return
+
+    # News sentiment from the in-memory index; unchanged when there is none
+    confidence = result.confidence = adjust_confidence(result.confidence, fetch_sentiment(symbol))
+    tp1_possibility = result.tp1_possibility
+    direction = result.direction
+    trade_type = "Scalp" if confidence < SCALPING_CONFIDENCE_THRESHOLD else "Normal"
+    leverage = 10 if trade_type == "Scalp" else 5
+
+    if confidence >= CONFIDENCE_THRESHOLD and tp1_possibility >= TP1_POSSIBILITY_THRESHOLD:
+        # Last gate: spread and resting depth near the entry, from this cycle's order book
+        liquid, reason = await depth_cache.check(symbol)
+        if not liquid:
+            logger.info("⚠️ Skipped - %s", reason, extra={"symbol": symbol, "stage": "dispatch"})
+            return
+        dispatched_candles[symbol] = candidate["candle_time"]
+        pk_time = clock.now_datetime(pytz.timezone("Asia/Karachi")).strftime("%Y-%m-%d %H:%M")
+        message = (
+            f"⚡ Trade Pair: {symbol}\n"
+            f"📉 Trade Type: {trade_type}\n"
+            f"🎯 Direction: {direction}\n"
+            f"🚀 Entry: {result.entry:.2f}\n"
+            f"🎯 TP1: {result.tp1:.2f} ({result.tp1_possibility*100:.2f}%)\n"
+            f"💰 TP2: {result.tp2:.2f} ({result.tp2_possibility*100:.2f}%)\n"
+            f"📈 TP3: {result.tp3:.2f} ({result.tp3_possibility*100:.2f}%)\n"
+            f"🛡️ SL: {result.sl:.2f}\n"
+            f"📊 Confidence: {confidence:.2f}%\n"
+            f"⏰ Time: {pk_time}"
+        )
+        await send_telegram_message(message)
+        result.trade_type, result.leverage, result.atr, result.support, result.resistance = trade_type, leverage, atr, support, resistance
+        await cpu_pool.run(log_signal_to_csv, result)
+        last_signal_time[symbol] = clock.now_datetime(pytz.timezone("Asia/Karachi"))
+        logger.info("✅ Signal SENT ✅", extra={"symbol": symbol, "stage": "dispatch"})
+        return True
+    elif confidence < CONFIDENCE_THRESHOLD:
+        logger.debug("⚠️ Skipped - Low confidence", extra={"symbol": symbol, "stage": "dispatch"})
+    elif tp1_possibility < TP1_POSSIBILITY_THRESHOLD:
+        logger.debug("⚠️ Skipped - Low TP1 possibility", extra={"symbol": symbol, "stage": "dispatch"})
+
+
+# Everything needed to resume after a restart without a cold first cycle
+def collect_state():
+    return {
+        "universe": dict(universe),
+        "last_signal_time": dict(last_signal_time),
+        "dispatched_candles": dict(dispatched_candles),
+        "predictor_last_signals": dict(analysis.predictor.last_signals) if analysis.predictor else {},
+        "scheduler": scheduler.to_state(),
+        "candles": candle_store.to_state(),
+        "open_trades": dict(open_trades)
+    }
+
+def restore_state(state):
+    try:
+        universe.update(state.get("universe", {}))
+        last_signal_time.update(state.get("last_signal_time", {}))
+        dispatched_candles.update(state.get("dispatched_candles", {}))
+        if analysis.predictor:
+            analysis.predictor.last_signals.update(state.get("predictor_last_signals", {}))
+        scheduler.load_state(state.get("scheduler", {}))
+        candle_store.load_state(state.get("candles", {}))
+        open_trades.update(state.get("open_trades", {}))
+        logger.info(
+            "Restored state: %d symbols, %d cooldowns, %d candle buffers, %d open trades",
+            len(universe['symbols']), len(last_signal_time), len(candle_store.buffers), len(open_trades)
+        )
+        return True
     except Exception as e:
-        logger.error(f"Error logging signal to CSV: {e}")
+        logger.error("Error restoring state: %s", e)
+        return False
+
+# State is copied on the loop; pickling and the fsync happen on the CPU pool
+async def write_snapshot():
+    await cpu_pool.run(save_snapshot, collect_state())
+
+async def snapshot_loop():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL_SECONDS)
+        await write_snapshot()
 
 # Health check route
 @app.get("/")
@@ -100,48 +219,75 @@ async def root():
 # Health check for Koyeb
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "message": "Bot is operational."}
+    return {"status": "healthy", "message": "Bot is operational.", "ready": readiness.ready(), "cpu_pool": cpu_pool.snapshot(), "depth": depth_cache.stats, "exchange_pool": exchange_pool.snapshot(), "pipeline": pipeline_stats, "analysis_cache": analysis_cache.snapshot(), "market": market_context}
+
+# Readiness: 503 until the model is loaded, markets are cached and the first cycle has
+# started; /health only says the process is up
+@app.get("/ready")
+async def ready():
+    snapshot = readiness.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+# Memory debugging: RSS per cycle, leak check and (with MEMORY_TRACE=1) top allocators
+@app.get("/debug/memory")
+async def debug_memory(top: int = 15):
+    return await cpu_pool.run(memory_monitor.report, top)
 
 # Get valid USDT pairs with sufficient volume and filter delisted coins
 async def get_valid_symbols(exchange):
     try:
-        markets = await exchange.load_markets()
+        markets = await market_data.load_markets(exchange)
         usdt_symbols = [
             symbol for symbol in markets
             if symbol.endswith('/USDT') and markets[symbol]['active'] and markets[symbol]['info']['status'] == 'TRADING'
         ]
         valid_symbols = []
-        
+
+        # One all-symbol 24h ticker request (weight 80) instead of one per symbol
+        tickers = await market_data.fetch_tickers(exchange)
         for symbol in usdt_symbols:
             if symbol in BLACKLISTED_SYMBOLS:
                 continue
-            try:
-                ticker = await exchange.fetch_ticker(symbol)
-                volume_usd = ticker.get('quoteVolume', 0)
-                if volume_usd >= MIN_VOLUME_USD:
-                    valid_symbols.append(symbol)
-                await asyncio.sleep(0.07)
-            except Exception as e:
-                logger.error(f"Error fetching ticker for {symbol}: {e}")
+            ticker = tickers.get(symbol)
+            if not ticker:
                 continue
-        
-        logger.info(f"Selected {len(valid_symbols)} USDT pairs with volume >= ${MIN_VOLUME_USD}")
+            volume_usd = ticker.get('quoteVolume') or 0
+            if volume_usd >= MIN_VOLUME_USD:
+                valid_symbols.append(symbol)
+                scheduler.update_from_ticker(symbol, ticker)
+
+        logger.info("Selected %d USDT pairs with volume >= $%s", len(valid_symbols), MIN_VOLUME_USD)
         return valid_symbols
     except Exception as e:
-        logger.error(f"Error fetching symbols: {e}")
+        logger.error("Error fetching symbols: %s", e)
         return []
-    finally:
-        await exchange.close()
+
+async def skip_cooldown(symbol):
+    if in_cooldown(symbol):
+        logger.debug("[%s] Skipped - In cooldown period", symbol, extra={"symbol": symbol, "stage": "scan"})
+        return None
+    return symbol
+
+# Per-symbol stages of a cycle. Dispatch keeps a single worker: cooldowns and
+# already-dispatched candles are read and written there.
+def scan_pipeline(exchange, context=None):
+    async def evaluate(symbol):
+        return await evaluate_symbol(exchange, symbol, scheduler, context)
+
+    return Pipeline("scan", [
+        Stage("cooldown", skip_cooldown, concurrency=1, queue_size=1),
+        Stage("analyze", evaluate, concurrency=SCAN_CONCURRENCY, timeout=ANALYSIS_TIMEOUT_SECONDS),
+        Stage("dispatch", dispatch_candidate, concurrency=1, queue_size=SCAN_CONCURRENCY)
+    ])
 
 # Scan symbols for signals
 async def scan_symbols():
     try:
-        # Create exchange for initial setup
-        exchange = ccxt.binance({
-            'apiKey': os.getenv("BINANCE_API_KEY"),
-            'secret': os.getenv("BINANCE_API_SECRET"),
-            'enableRateLimit': True,
-        })
+        readiness.mark("first_cycle_started")
+        depth_cache.begin_cycle()
+
+        # Shared client; connections and markets carry over between cycles
+        exchange = exchange_pool.get()
 
         api_key = os.getenv("BINANCE_API_KEY")
         api_secret = os.getenv("BINANCE_API_SECRET")
@@ -151,125 +297,129 @@ async def scan_symbols():
 
         # Test connection
         try:
-            await exchange.fetch_ticker('BTC/USDT')
+            await market_data.fetch_ticker(exchange, CONNECTION_TEST_SYMBOL)
             logger.info("Binance API connection successful.")
         except Exception as e:
-            logger.error(f"Binance API connection failed: {e}")
+            logger.error("Binance API connection failed: %s", e)
             return
-        finally:
-            await exchange.close()
-
-        # Get valid USDT symbols
-        exchange = ccxt.binance({
-            'apiKey': os.getenv("BINANCE_API_KEY"),
-            'secret': os.getenv("BINANCE_API_SECRET"),
-            'enableRateLimit': True,
-        })
-        valid_symbols = await get_valid_symbols(exchange)
-        symbols = valid_symbols[:150]  # Limit to 150 symbols to reduce CPU load
+
+        # Get valid USDT symbols, reusing the cached universe while it is fresh
+        if universe["symbols"] and clock.now() - universe["updated"] < UNIVERSE_REFRESH_SECONDS:
+            symbols = universe["symbols"]
+            logger.info("Using cached universe of %d symbols", len(symbols))
+        else:
+            await exchange_pool.load_markets()
+            symbols = await get_valid_symbols(exchange)
+            if symbols:
+                universe.update(symbols=symbols, updated=clock.now())
+                readiness.mark("markets_cached")
         if not symbols:
             logger.error("No valid USDT symbols found!")
             return
 
-        for symbol in symbols:
-            if symbol in last_signal_time:
-                last_time = last_signal_time[symbol]
-                if datetime.now(tz=pytz.timezone("Asia/Karachi")) < last_time + timedelta(minutes=COOLDOWN_MINUTES):
-                    logger.info(f"[{symbol}] Skipped - In cooldown period")
-                    continue
-
-            # Create new exchange instance for each symbol
-            exchange = ccxt.binance({
-                'apiKey': os.getenv("BINANCE_API_KEY"),
-                'secret': os.getenv("BINANCE_API_SECRET"),
-                'enableRateLimit': True,
-            })
-            df = None
-            try:
-                result = await analyze_symbol(exchange, symbol)
-                if not result:
-                    logger.info(f"⚠️ {symbol} - No valid signal")
-                    continue
-
-                confidence = result.get("confidence", 0)
-                tp1_possibility = result.get("tp1_possibility", 0)
-                direction = result.get("direction", "none")
-                trade_type = "Scalp" if confidence < SCALPING_CONFIDENCE_THRESHOLD else "Normal"
-
-                logger.info(
-                    f"🔍 {symbol} | Confidence: {confidence:.2f} | "
-                    f"Direction: {direction} | TP1 Chance: {tp1_possibility:.2f}"
-                )
-
-                # Fetch OHLCV for support/resistance
-                ohlcv = await exchange.fetch_ohlcv(symbol, result["timeframe"], limit=50)
-                df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"], dtype="float32")
-                df = find_support_resistance(df)
-                support = df["support"].iloc[-1] if "support" in df else 0.0
-                resistance = df["resistance"].iloc[-1] if "resistance" in df else 0.0
-                atr = (df["high"] - df["low"]).rolling(window=14).mean().iloc[-1]
-                leverage = 10 if trade_type == "Scalp" else 5
-
-                if confidence >= CONFIDENCE_THRESHOLD and tp1_possibility >= TP1_POSSIBILITY_THRESHOLD:
-                    pk_time = datetime.now(tz=pytz.timezone("Asia/Karachi")).strftime("%Y-%m-%d %H:%M")
-                    message = (
-                        f"⚡ Trade Pair: {symbol}\n"
-                        f"📉 Trade Type: {trade_type}\n"
-                        f"🎯 Direction: {direction}\n"
-                        f"🚀 Entry: {result['entry']:.2f}\n"
-                        f"🎯 TP1: {result['tp1']:.2f} ({result['tp1_possibility']*100:.2f}%)\n"
-                        f"💰 TP2: {result['tp2']:.2f} ({result['tp2_possibility']*100:.2f}%)\n"
-                        f"📈 TP3: {result['tp3']:.2f} ({result['tp3_possibility']*100:.2f}%)\n"
-                        f"🛡️ SL: {result['sl']:.2f}\n"
-                        f"📊 Confidence: {confidence:.2f}%\n"
-                        f"⏰ Time: {pk_time}"
-                    )
-                    await send_telegram_message(message)
-                    log_signal_to_csv(result, trade_type, atr, leverage, support, resistance, (support + resistance) / 2, direction)
-                    last_signal_time[symbol] = datetime.now(tz=pytz.timezone("Asia/Karachi"))
-                    logger.info("✅ Signal SENT ✅")
-                elif confidence < CONFIDENCE_THRESHOLD:
-                    logger.info("⚠️ Skipped - Low confidence")
-                elif tp1_possibility < TP1_POSSIBILITY_THRESHOLD:
-                    logger.info("⚠️ Skipped - Low TP1 possibility")
-
-                logger.info("---")
-                await asyncio.sleep(1.0)  # Increased to 1.0 to reduce CPU load
-
-            except Exception as e:
-                logger.error(f"Error processing {symbol}: {e}")
-                if "rate limit" in str(e).lower():
-                    await asyncio.sleep(5)
-                logger.info(f"⚠️ Skipped {symbol} due to error, continuing to next symbol")
-                continue
-            finally:
-                if df is not None:
-                    del df
-                await exchange.close()
-                gc.collect()
+        # Sharded mode: workers prefilter and evaluate, this process dispatches
+        if coordinator is not None:
+            candidates = [symbol for symbol in scheduler.order(symbols) if not in_cooldown(symbol)]
+            stats = await coordinator.run_cycle(candidates, scheduler.cycle_deadline())
+            # Each shard's context covers its own symbols; the benchmarks' trends agree
+            if stats["contexts"]:
+                market_context.update(stats["contexts"][min(stats["contexts"])])
+            return
+
+        # Cheap vectorized screens over the top-priority symbols; only survivors get the full analysis
+        ordered = scheduler.order(symbols)
+        with timed("prefilter", symbols=len(symbols)):
+            survivors, _ = await prefilter_symbols(exchange, ordered, SCAN_TIMEFRAME)
+        # The shortlist's order books load while its features and the market context are computed
+        with timed("cycle_features", symbols=len(survivors)):
+            _, _, context = await asyncio.gather(
+                prepare_cycle_features(survivors, SCAN_TIMEFRAME),
+                depth_cache.refresh(exchange, survivors),
+                build_market_context(exchange, ordered, SCAN_TIMEFRAME)
+            )
+        market_context.update(context.to_dict())
+
+        # Highest priority first; stops at the next candle close. Analysis of the next
+        # symbols overlaps with dispatching the previous ones.
+        stats = await scan_pipeline(exchange, context).run(scheduler.iter_cycle(survivors))
+        pipeline_stats.update(stats)
 
     except Exception as e:
-        logger.error(f"Error in scan_symbols: {e}")
+        logger.error("Error in scan_symbols: %s", e)
     finally:
-        gc.collect()
+        # RSS for the memory report; a full collection only under memory pressure
+        memory_monitor.end_cycle()
 
 # Continuous scanner
 async def run_bot():
     while True:
         try:
             await scan_symbols()
-            logger.info(f"Completed one scan cycle, waiting {SCAN_INTERVAL_SECONDS/60} minutes for next scan")
-            await asyncio.sleep(SCAN_INTERVAL_SECONDS)
+            logger.info("Exchange request stats: %s", market_data.request_stats())
+            logger.info("Analysis cache stats: %s", analysis_cache.snapshot())
+            logger.info("CPU pool stats: %s", cpu_pool.snapshot())
+            await write_snapshot()
+            wait_seconds = seconds_until_next_close(SCAN_TIMEFRAME)
+            logger.info("Completed one scan cycle, waiting %.0fs for next %s candle close", wait_seconds, SCAN_TIMEFRAME)
+            await asyncio.sleep(wait_seconds)
         except Exception as e:
-            logger.error(f"Error in run_bot: {e}")
+            logger.error("Error in run_bot: %s", e)
             await asyncio.sleep(10)
 
+async def load_model():
+    try:
+        await initialize_predictor()
+        readiness.mark("model_loaded")
+        return True
+    except Exception as e:
+        readiness.fail("model_loaded", e)
+        return False
+
+async def load_markets():
+    try:
+        await exchange_pool.start()
+        readiness.mark("markets_cached")
+    except Exception as e:
+        readiness.fail("markets_cached", e)
+        logger.error("Error loading markets at startup, retrying in the first cycle: %s", e)
+
+# Everything the first scan needs, behind a server that is already answering /health
+# and /ready. The model loads on a worker thread while markets load over the network.
+async def warm_up():
+    global coordinator
+    model_ok, _ = await asyncio.gather(load_model(), load_markets())
+    if not model_ok:
+        logger.error("Signal model failed to load; not starting the scanner")
+        return
+    memory_monitor.freeze_startup_objects()
+    if SCANNER_SHARDS > 1:
+        coordinator = ShardCoordinator(
+            SCANNER_SHARDS, dispatch_candidate, timeframe=SCAN_TIMEFRAME, scheduler=scheduler, depth_cache=depth_cache
+        )
+        coordinator.start()
+    state = load_snapshot()
+    if state and restore_state(state):
+        for symbol, signal in list(open_trades.items()):
+            asyncio.create_task(track_trade(symbol, signal))
+    asyncio.create_task(run_bot())
+    asyncio.create_task(snapshot_loop())
+    news_source = create_news_source()
+    if news_source is not None:
+        asyncio.create_task(SentimentService(news_source).run(lambda: universe["symbols"]))
+
 # Start scanner on app startup
 @app.on_event("startup")
 async def start_bot():
-    await initialize_predictor()
-    await asyncio.sleep(10)
-    asyncio.create_task(run_bot())
+    asyncio.create_task(warm_up())
+
+# Persist state so the next deploy resumes where this one stopped
+@app.on_event("shutdown")
+async def stop_bot():
+    save_snapshot(collect_state())
+    if coordinator is not None:
+        coordinator.stop()
+    cpu_pool.shutdown()
+    await exchange_pool.close()
 
 # Run app
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import pickle
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+from utils.logger import log
+from model.feature_matrix import MODEL_FEATURES, feature_spec_hash
+from model.trainer import DATASET_CACHE_DIR, TRAIN_TIMEFRAME, cached_datasets, dataset_spec_hash, fit_model, load_split, save_model
+from model import zoo
+
+# Side-by-side comparison of the zoo models on the same cached training datasets
+# (build them first with model/trainer.py): holdout metrics, inference latency and
+# memory. --save writes each model to models/ so the scanner can pick one by
+# SIGNAL_MODEL / MODEL_LATENCY_BUDGET_MS.
+
+
+# Pickled size, and peak allocation while scoring one cycle
+def measure_memory(model, X, cycle_rows=zoo.CYCLE_ROWS):
+    size_mb = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1e6
+    sample = np.asarray(X, dtype=np.float32)[:cycle_rows]
+    tracemalloc.start()
+    try:
+        zoo.predict_proba(model, sample)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"size_mb": round(size_mb, 3), "cycle_peak_mb": round(peak / 1e6, 3)}
+
+
+def benchmark(paths, names, n_jobs, model_dir=None):
+    X_train, y_train, X_test, y_test = load_split(paths)
+    log(f"Benchmarking {names} on {len(X_train)} train / {len(X_test)} test rows from {len(paths)} datasets")
+    version = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    results = {}
+    for name in names:
+        model, metrics, latency = fit_model(X_train, y_train, X_test, y_test, name=name, n_jobs=n_jobs)
+        memory = measure_memory(model, X_test if len(X_test) else X_train)
+        results[name] = {"metrics": metrics, "latency": latency, "memory": memory}
+        if model_dir:
+            metadata = {
+                "model": name,
+                "version": version,
+                "features": list(MODEL_FEATURES),
+                "feature_spec": feature_spec_hash(MODEL_FEATURES),
+                "dataset_spec": dataset_spec_hash(),
+                "datasets": [os.path.basename(path) for path in paths],
+                "metrics": metrics,
+                "latency": latency,
+                "memory": memory
+            }
+            results[name]["path"] = save_model(model, metadata, model_dir)
+    return results
+
+
+def print_report(results):
+    header = f"{'model':<16}{'auc':>7}{'acc':>7}{'prec':>7}{'recall':>8}{'fit s':>8}{'row p50':>9}{'row p99':>9}{'cyc p50':>9}{'cyc p99':>9}{'MB':>8}{'peak MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, result in sorted(results.items(), key=lambda item: -item[1]["metrics"].get(zoo.SELECTION_METRIC, 0.0)):
+        m, l, mem = result["metrics"], result["latency"], result["memory"]
+        print(
+            f"{name:<16}{m.get('roc_auc', float('nan')):>7.3f}{m.get('accuracy', float('nan')):>7.3f}"
+            f"{m.get('precision', float('nan')):>7.3f}{m.get('recall', float('nan')):>8.3f}{m['fit_seconds']:>8.1f}"
+            f"{l['row_p50_ms']:>9.3f}{l['row_p99_ms']:>9.3f}{l['cycle_p50_ms']:>9.3f}{l['cycle_p99_ms']:>9.3f}"
+            f"{mem['size_mb']:>8.2f}{mem['cycle_peak_mb']:>9.3f}"
+        )
+    print(f"Latency in ms; cycle = {zoo.CYCLE_ROWS} symbols scored together")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare signal models on the cached training datasets")
+    parser.add_argument("--models", nargs="*", default=sorted(zoo.MODEL_ZOO), choices=sorted(zoo.MODEL_ZOO))
+    parser.add_argument("--cache-dir", default=DATASET_CACHE_DIR)
+    parser.add_argument("--timeframe", default=TRAIN_TIMEFRAME)
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--save", action="store_true", help="Write each model to --model-dir for live selection")
+    parser.add_argument("--model-dir", default=zoo.MODEL_DIR)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    paths = cached_datasets(args.cache_dir, args.timeframe)
+    if not paths:
+        log(f"No cached datasets in {args.cache_dir} for the current feature spec; run model/trainer.py first", level='ERROR')
+        return
+    started = time.perf_counter()
+    results = benchmark(paths, args.models, args.n_jobs, args.model_dir if args.save else None)
+    print_report(results)
+    log(f"Benchmark finished in {time.perf_counter() - started:.0f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
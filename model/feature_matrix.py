@@ -0,0 +1,176 @@
+import hashlib
+import json
+from functools import cached_property
+import numpy as np
+
+# Model features for many symbols at once, straight from stacked candle buffers
+# (symbols x time x [timestamp, open, high, low, close, volume]) into one float32
+# matrix. Values match calculate_indicators / the candle pattern checks on the
+# last candle; bb_upper, bb_lower and volume_sma_20 are the columns of the original
+# rf_model.joblib.
+
+FEATURE_WINDOW = 50  # Candles per symbol, as analyze_symbol fetches
+MIN_FEATURE_CANDLES = 26  # Minimum for MACD, as calculate_indicators requires
+RSI_PERIOD = 14
+ATR_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+VOLUME_SMA_PERIOD = 20
+# Features the predictor is built for; model/trainer.py trains on exactly these
+MODEL_FEATURES = [
+    "rsi", "macd", "macd_signal", "atr", "volume",
+    "bullish_engulfing", "bearish_engulfing", "doji",
+    "hammer", "shooting_star", "three_white_soldiers", "three_black_crows"
+]
+FEATURE_SPEC_VERSION = 1  # Bump when a feature formula changes; invalidates cached training datasets
+
+
+# EMA along time, pandas ewm(span, adjust=False) starting at each row's first candle
+def _ema(values, span):
+    alpha = 2.0 / (span + 1)
+    out = np.empty_like(values)
+    state = values[:, 0].copy()
+    out[:, 0] = state
+    for t in range(1, values.shape[1]):
+        x = values[:, t]
+        state = np.where(np.isnan(state), x, state + alpha * (x - state))
+        out[:, t] = state
+    return out
+
+
+# Shared intermediates for one build; each is computed once, on first use
+class _Inputs:
+    def __init__(self, candles):
+        self.candles = candles
+
+    def last(self, column, back=1):
+        return self.candles[:, -back, column]
+
+    @cached_property
+    def macd(self):
+        close = self.candles[:, :, 4]
+        line = _ema(close, MACD_FAST) - _ema(close, MACD_SLOW)
+        return line[:, -1], _ema(line, MACD_SIGNAL)[:, -1]
+
+    @cached_property
+    def body(self):
+        return np.abs(self.last(4) - self.last(1))
+
+    @cached_property
+    def shadows(self):
+        o, h, l, c = self.last(1), self.last(2), self.last(3), self.last(4)
+        up = c > o
+        lower = np.where(up, o - l, c - l)
+        upper = np.where(up, h - c, h - o)
+        return lower, upper
+
+
+def _rsi(x):
+    delta = np.diff(x.candles[:, -(RSI_PERIOD + 1):, 4], axis=1)
+    gain = np.where(delta > 0, delta, 0.0).mean(axis=1)
+    loss = np.where(delta < 0, -delta, 0.0).mean(axis=1)
+    rsi = 100 - 100 / (1 + gain / loss)
+    return np.where(np.isfinite(rsi), rsi, 50.0)
+
+
+def _atr(x):
+    window = x.candles[:, -(ATR_PERIOD + 1):]
+    high, low, prev_close = window[:, 1:, 2], window[:, 1:, 3], window[:, :-1, 4]
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return tr.mean(axis=1)
+
+
+def _bullish_engulfing(x):
+    o1, c1, o2, c2 = x.last(1), x.last(4), x.last(1, 2), x.last(4, 2)
+    return (c2 < o2) & (c1 > o1) & (o1 <= c2) & (c1 >= o2)
+
+
+def _bearish_engulfing(x):
+    o1, c1, o2, c2 = x.last(1), x.last(4), x.last(1, 2), x.last(4, 2)
+    return (c2 > o2) & (c1 < o1) & (o1 >= c2) & (c1 <= o2)
+
+
+def _doji(x):
+    candle_range = x.last(2) - x.last(3)
+    return (candle_range > 0) & (x.body <= 0.1 * candle_range)
+
+
+def _hammer(x):
+    lower, upper = x.shadows
+    return (lower >= 2 * x.body) & (upper <= 0.3 * x.body) & (x.body > 0)
+
+
+def _shooting_star(x):
+    lower, upper = x.shadows
+    return (upper >= 2 * x.body) & (lower <= 0.3 * x.body) & (x.body > 0)
+
+
+# Three rising candles, each closing above the previous one's open
+def _three_white_soldiers(x):
+    o1, c1, o2, c2, o3, c3 = x.last(1), x.last(4), x.last(1, 2), x.last(4, 2), x.last(1, 3), x.last(4, 3)
+    return (c1 > o1) & (c2 > o2) & (c3 > o3) & (c1 > o2) & (c2 > o3)
+
+
+def _three_black_crows(x):
+    o1, c1, o2, c2, o3, c3 = x.last(1), x.last(4), x.last(1, 2), x.last(4, 2), x.last(1, 3), x.last(4, 3)
+    return (c1 < o1) & (c2 < o2) & (c3 < o3) & (c1 < o2) & (c2 < o3)
+
+
+FEATURE_BUILDERS = {
+    "rsi": _rsi,
+    "macd": lambda x: x.macd[0],
+    "macd_signal": lambda x: x.macd[1],
+    "atr": _atr,
+    "volume": lambda x: x.last(5),
+    "bb_upper": lambda x: x.last(4) * 1.02,
+    "bb_lower": lambda x: x.last(4) * 0.98,
+    "volume_sma_20": lambda x: x.candles[:, -VOLUME_SMA_PERIOD:, 5].mean(axis=1),
+    "bullish_engulfing": _bullish_engulfing,
+    "bearish_engulfing": _bearish_engulfing,
+    "doji": _doji,
+    "hammer": _hammer,
+    "shooting_star": _shooting_star,
+    "three_white_soldiers": _three_white_soldiers,
+    "three_black_crows": _three_black_crows
+}
+
+
+class FeatureMatrixBuilder:
+    def __init__(self, features, window=FEATURE_WINDOW):
+        unknown = [name for name in features if name not in FEATURE_BUILDERS]
+        if unknown:
+            raise ValueError(f"Unsupported features: {unknown}")
+        self.features = list(features)
+        self.window = window
+        self.matrix = np.zeros((0, len(self.features)), dtype=np.float32)
+
+    def _reserve(self, rows):
+        if self.matrix.shape[0] < rows:
+            self.matrix = np.zeros((max(rows, 2 * self.matrix.shape[0]), len(self.features)), dtype=np.float32)
+        return self.matrix[:rows]
+
+    # Returns the (symbols x features) matrix, columns in self.features order, and a
+    # mask of rows with enough candles. Without `out` the matrix is a view of a buffer
+    # reused by the next build.
+    def build(self, candles, out=None):
+        candles = np.asarray(candles, dtype=np.float64)[:, -self.window:]
+        out = self._reserve(len(candles)) if out is None else out
+        valid = np.count_nonzero(~np.isnan(candles[:, :, 4]), axis=1) >= MIN_FEATURE_CANDLES
+        inputs = _Inputs(candles)
+        with np.errstate(all="ignore"):
+            for j, name in enumerate(self.features):
+                out[:, j] = FEATURE_BUILDERS[name](inputs)
+        np.nan_to_num(out, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+        return out, valid
+
+
+# Identifies what a feature matrix means: cached datasets and saved models built
+# under another spec must not be mixed with this one
+def feature_spec_hash(features, window=FEATURE_WINDOW):
+    spec = {
+        "version": FEATURE_SPEC_VERSION,
+        "features": list(features),
+        "window": window,
+        "min_candles": MIN_FEATURE_CANDLES,
+        "periods": [RSI_PERIOD, ATR_PERIOD, MACD_FAST, MACD_SLOW, MACD_SIGNAL, VOLUME_SMA_PERIOD]
+    }
+    return hashlib.md5(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
@@ -1,78 +1,95 @@
-import pandas as pd
+from typing import TYPE_CHECKING
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
 import joblib
 import os
-from core.candle_patterns import (
-    is_bullish_engulfing, is_bearish_engulfing, is_doji, is_hammer, is_shooting_star,
-    is_three_white_soldiers, is_three_black_crows
-)
+from model.feature_matrix import FeatureMatrixBuilder, FEATURE_WINDOW, MODEL_FEATURES
+from model import zoo
+from utils import clock
+from utils.cpu_pool import cpu_pool
 from utils.logger import log
-import pytz
-import gc
+from core.signal import Signal, now_ms
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 class SignalPredictor:
     def __init__(self, model_path="models/rf_model.joblib"):
         self.model = None
-        self.features = [
-            "rsi", "macd", "macd_signal", "atr", "volume",
-            "bullish_engulfing", "bearish_engulfing", "doji",
-            "hammer", "shooting_star", "three_white_soldiers", "three_black_crows"
-        ]
+        self.features = list(MODEL_FEATURES)
         self.min_confidence_threshold = 0.65  # 65% confidence
         self.last_signals = {}
         
         try:
             if os.path.exists(model_path):
                 self.model = joblib.load(model_path)
-                log("Random Forest model loaded successfully")
+                self.model_version = f"{os.path.basename(model_path)}@{int(os.path.getmtime(model_path))}"
+                log("Model loaded from %s", model_path)
             else:
-                log(f"Model file not found at {model_path}", level="ERROR")
+                log("Model file not found at %s", model_path, level="ERROR")
                 raise FileNotFoundError(f"Model file {model_path} not found")
         except Exception as e:
-            log(f"Error loading model: {str(e)}", level="ERROR")
+            log("Error loading model: %s", e, level="ERROR")
             raise
 
-    def prepare_features(self, df: pd.DataFrame):
+        # The model's own column order wins so features always line up with what it was fitted on
+        fitted_features = getattr(self.model, "feature_names_in_", None)
+        if fitted_features is not None and list(fitted_features) != self.features:
+            log("Model at %s was fitted on different features; using its %d columns", model_path, len(fitted_features), level="WARNING")
+            self.features = list(fitted_features)
+        self.model = zoo.prepare_for_inference(self.model)
+        self.feature_index = {name: i for i, name in enumerate(self.features)}
+        self.feature_builder = FeatureMatrixBuilder(self.features)
+        self.cycle_features = {}  # timeframe -> features and probabilities for this cycle's symbols
+
+    # Single-symbol features as a (1 x features) float32 matrix
+    def prepare_features(self, df: "pd.DataFrame"):
         try:
-            feature_df = pd.DataFrame(index=df.index, dtype="float32")
-            
-            for feature in ["rsi", "macd", "macd_signal", "atr", "volume"]:
-                if feature in df.columns:
-                    feature_df[feature] = df[feature]
-                else:
-                    log(f"Feature {feature} not found in DataFrame", level="WARNING")
-                    feature_df[feature] = 0.0
-            
-            # Calculate candlestick patterns
-            feature_df["bullish_engulfing"] = is_bullish_engulfing(df).astype(float)
-            feature_df["bearish_engulfing"] = is_bearish_engulfing(df).astype(float)
-            feature_df["doji"] = is_doji(df).astype(float)
-            feature_df["hammer"] = is_hammer(df).astype(float)
-            feature_df["shooting_star"] = is_shooting_star(df).astype(float)
-            feature_df["three_white_soldiers"] = is_three_white_soldiers(df).astype(float)
-            feature_df["three_black_crows"] = is_three_black_crows(df).astype(float)
-            
-            for feature in self.features:
-                if feature not in feature_df.columns:
-                    log(f"Adding missing feature {feature} with zeros", level="WARNING")
-                    feature_df[feature] = 0.0
-            
-            feature_df = feature_df[self.features]
-            feature_df = feature_df.fillna(0.0)
-            
-            if feature_df.isna().any().any():
-                log("NaN values detected after filling in features", level="WARNING")
-                return None
-                
-            return feature_df
+            candles = df[["timestamp", "open", "high", "low", "close", "volume"]].to_numpy(dtype="float64")
+            out = np.empty((1, len(self.features)), dtype=np.float32)
+            matrix, valid = self.feature_builder.build(candles[None, -FEATURE_WINDOW:], out=out)
+            return matrix if valid[0] else None
         except Exception as e:
-            log(f"Error preparing features: {str(e)}", level="ERROR")
+            log("Error preparing features: %s", e, level="ERROR", stage="features")
             return None
-        finally:
-            gc.collect()
 
-    async def calculate_take_profits(self, df: pd.DataFrame, direction: str, current_price: float):
+    def predict_proba(self, matrix):
+        return zoo.predict_proba(self.model, matrix)
+
+    # Feature row and class probabilities for one symbol, or (None, None)
+    def score(self, df: "pd.DataFrame"):
+        matrix = self.prepare_features(df)
+        if matrix is None:
+            return None, None
+        return matrix[0], self.predict_proba(matrix)[0]
+
+    # Features and class probabilities for every symbol of a cycle in one pass.
+    # `candles` is candle_store.stack(symbols, timeframe, FEATURE_WINDOW).
+    def prepare_cycle(self, symbols, candles, timeframe="15m"):
+        try:
+            matrix, valid = self.feature_builder.build(candles)
+            proba = self.predict_proba(matrix) if len(symbols) else np.empty((0, len(self.model.classes_)))
+            self.cycle_features[timeframe] = {
+                "rows": {symbol: i for i, symbol in enumerate(symbols)},
+                "last_candles": candles[:, -1].copy(),
+                "matrix": matrix,
+                "valid": valid,
+                "proba": proba
+            }
+        except Exception as e:
+            log("Error preparing cycle features: %s", e, level="ERROR", stage="features")
+            self.cycle_features.pop(timeframe, None)
+
+    # The cycle's row for a symbol, if it was built from the same last candle
+    def cycle_row(self, symbol, timeframe, candle):
+        cycle = self.cycle_features.get(timeframe)
+        if cycle is None or candle is None:
+            return None, None
+        i = cycle["rows"].get(symbol)
+        if i is None or not cycle["valid"][i] or not np.array_equal(cycle["last_candles"][i], candle):
+            return None, None
+        return cycle["matrix"][i], cycle["proba"][i]
+
+    async def calculate_take_profits(self, df: "pd.DataFrame", direction: str, current_price: float):
         try:
             atr = df["atr"].iloc[-1]
             
@@ -93,12 +110,12 @@ class SignalPredictor:
             
             return tp1, tp2, tp3, sl
         except Exception as e:
-            log(f"Error calculating TP/SL: {str(e)}", level="ERROR")
+            log("Error calculating TP/SL: %s", e, level="ERROR", stage="predict")
             return None, None, None, None
-        finally:
-            gc.collect()
 
-    async def predict_signal(self, symbol: str, df: pd.DataFrame, timeframe: str = "15m"):
+    async def predict_signal(self, symbol: str, df: "pd.DataFrame", timeframe: str = "15m", candle=None):
+        import pandas as pd  # Deferred: not needed to boot
+
         try:
             if self.model is None:
                 log("Model not loaded", level="ERROR")
@@ -106,31 +123,31 @@ class SignalPredictor:
                 
             signal_key = f"{symbol}_{timeframe}"
             last_signal_time = self.last_signals.get(signal_key)
-            if last_signal_time and (pd.Timestamp.now() - last_signal_time).total_seconds() < 3600:
-                log(f"[{symbol}] Skipping duplicate signal within 1 hour", level="INFO")
-                return None
-                
-            features = self.prepare_features(df)
-            if features is None or len(features) == 0:
-                log(f"[{symbol}] No valid features for prediction", level="WARNING")
+            if last_signal_time and (pd.Timestamp(clock.now_datetime()) - last_signal_time).total_seconds() < 3600:
+                log("[%s] Skipping duplicate signal within 1 hour", symbol, level="DEBUG", symbol=symbol, stage="predict")
                 return None
                 
-            current_features = features.iloc[-1:].reindex(columns=self.features)
-            prediction_proba = self.model.predict_proba(current_features)[0]
-            prediction = self.model.predict(current_features)[0]
+            features, prediction_proba = self.cycle_row(symbol, timeframe, candle)
+            if features is None:
+                features, prediction_proba = await cpu_pool.run(self.score, df)
+                if features is None:
+                    log("[%s] No valid features for prediction", symbol, level="WARNING", symbol=symbol, stage="predict")
+                    return None
+            prediction = self.model.classes_[prediction_proba.argmax()]
+            pattern = lambda name: name in self.feature_index and features[self.feature_index[name]] > 0
             
             # Strict bullish/bearish conditions
             is_bullish = (
-                features["bullish_engulfing"].iloc[-1] > 0 and
-                features["hammer"].iloc[-1] > 0 and
-                features["three_white_soldiers"].iloc[-1] > 0 and
+                pattern("bullish_engulfing") and
+                pattern("hammer") and
+                pattern("three_white_soldiers") and
                 df["rsi"].iloc[-1] < 45 and
                 df["macd"].iloc[-1] > df["macd_signal"].iloc[-1]
             )
             is_bearish = (
-                features["bearish_engulfing"].iloc[-1] > 0 and
-                features["shooting_star"].iloc[-1] > 0 and
-                features["three_black_crows"].iloc[-1] > 0 and
+                pattern("bearish_engulfing") and
+                pattern("shooting_star") and
+                pattern("three_black_crows") and
                 df["rsi"].iloc[-1] > 55 and
                 df["macd"].iloc[-1] < df["macd_signal"].iloc[-1]
             )
@@ -146,44 +163,40 @@ class SignalPredictor:
                 confidence = max(confidence - 25, 0)
                 
             if confidence < self.min_confidence_threshold * 100:
-                log(f"[{symbol}] Low confidence: {confidence:.2f}%", level="INFO")
+                log("[%s] Low confidence: %.2f%%", symbol, confidence, level="DEBUG", symbol=symbol, stage="predict")
                 return None
                 
             current_price = df["close"].iloc[-1]
             
             tp1, tp2, tp3, sl = await self.calculate_take_profits(df, direction, current_price)
             if any(x is None for x in [tp1, tp2, tp3, sl]):
-                log(f"[{symbol}] Invalid TP/SL values", level="WARNING")
+                log("[%s] Invalid TP/SL values", symbol, level="WARNING", symbol=symbol, stage="predict")
                 return None
                 
             # Default TP hit rates (backtest removed)
             tp1_hit_rate, tp2_hit_rate, tp3_hit_rate = 0.75, 0.50, 0.25
             
-            signal = {
-                "symbol": symbol,
-                "direction": direction,
-                "entry": current_price,
-                "tp1": round(tp1, 4),
-                "tp2": round(tp2, 4),
-                "tp3": round(tp3, 4),
-                "sl": round(sl, 4),
-                "confidence": confidence,
-                "tp1_possibility": tp1_hit_rate,
-                "tp2_possibility": tp2_hit_rate,
-                "tp3_possibility": tp3_hit_rate,
-                "timeframe": timeframe,
-                "timestamp": pd.Timestamp.now(tz=pytz.timezone("Asia/Karachi")).isoformat()
-            }
+            signal = Signal(
+                symbol=symbol,
+                timeframe=timeframe,
+                direction=direction,
+                entry=float(current_price),
+                tp1=round(float(tp1), 4),
+                tp2=round(float(tp2), 4),
+                tp3=round(float(tp3), 4),
+                sl=round(float(sl), 4),
+                confidence=float(confidence),
+                tp1_possibility=tp1_hit_rate,
+                tp2_possibility=tp2_hit_rate,
+                tp3_possibility=tp3_hit_rate,
+                timestamp=now_ms()
+            )
             
-            self.last_signals[signal_key] = pd.Timestamp.now()
+            self.last_signals[signal_key] = pd.Timestamp(clock.now_datetime())
             
-            log(f"[{symbol}] Signal generated - Direction: {direction}, Confidence: {confidence:.2f}%")
+            log("[%s] Signal generated - Direction: %s, Confidence: %.2f%%", symbol, direction, confidence, symbol=symbol, stage="predict")
             return signal
             
         except Exception as e:
-            log(f"[{symbol}] Error predicting signal: {str(e)}", level="ERROR")
+            log("[%s] Error predicting signal: %s", symbol, e, level="ERROR", symbol=symbol, stage="predict")
             return None
-        finally:
-            if 'features' in locals():
-                del features
-            gc.collect()
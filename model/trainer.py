@@ -1,70 +1,304 @@
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+import polars as pl
+from numpy.lib.stride_tricks import sliding_window_view
 from joblib import dump
 from utils.logger import log
-from core.candle_patterns import is_bullish_engulfing, is_bearish_engulfing, is_doji, is_hammer, is_shooting_star, is_three_white_soldiers, is_three_black_crows
-import ccxt
+from model.feature_matrix import FeatureMatrixBuilder, FEATURE_WINDOW, MODEL_FEATURES, feature_spec_hash
+from model.predictor import SignalPredictor
+from model import zoo
 
-def prepare_training_data(symbol, ohlcv):
+# Label: 1 if the high of one of the next LABEL_HORIZON candles reaches
+# close + LABEL_ATR_MULTIPLIER * ATR, where ATR is the 14-candle mean high-low range
+LABEL_HORIZON = 10
+LABEL_ATR_MULTIPLIER = 1.2
+LABEL_ATR_PERIOD = 14
+
+TRAIN_TIMEFRAME = "15m"
+TRAIN_CANDLES = 2880  # ~30 days of 15m candles per symbol
+TRAIN_SYMBOLS = 100
+TEST_FRACTION = 0.2  # Most recent share of candles held out for scoring
+DATASET_CACHE_DIR = "data/cache/datasets"
+FETCH_CONCURRENCY = 8
+OHLCV_PAGE_LIMIT = 1000
+
+
+def dataset_spec_hash(features=MODEL_FEATURES):
+    label = f"{LABEL_HORIZON}:{LABEL_ATR_MULTIPLIER}:{LABEL_ATR_PERIOD}"
+    return hashlib.md5(f"{feature_spec_hash(features)}:{label}".encode()).hexdigest()[:12]
+
+
+def label_tp1_hits(ohlcv):
+    high, low, close = ohlcv[:, 2], ohlcv[:, 3], ohlcv[:, 4]
+    atr = pd.Series(high - low).rolling(window=LABEL_ATR_PERIOD).mean().to_numpy()
+    tp1 = close + atr * LABEL_ATR_MULTIPLIER
+    future_high = np.full(len(ohlcv), np.nan)
+    if len(ohlcv) > LABEL_HORIZON:
+        future_high[:-LABEL_HORIZON] = sliding_window_view(high[1:], LABEL_HORIZON).max(axis=1)
+    labels = ((close < tp1) & (tp1 <= future_high)).astype(np.int8)
+    known = ~np.isnan(future_high) & ~np.isnan(atr)
+    return labels, known
+
+
+# One row per candle with a full feature window and a known label, built the same
+# way the predictor builds its features at scan time
+def prepare_training_data(symbol, ohlcv, features=MODEL_FEATURES):
     try:
-        df = pd.DataFrame(ohlcv, columns=["timestamp", "open", "high", "low", "close", "volume"])
-        if len(df) < 50:
+        ohlcv = np.asarray(ohlcv, dtype=np.float64)
+        if len(ohlcv) < FEATURE_WINDOW + LABEL_HORIZON:
             log(f"[{symbol}] Insufficient data for training", level='WARNING')
             return None, None
 
-        df["rsi"] = pd.Series(np.full(len(df), 50.0))  # Placeholder
-        df["macd"] = pd.Series(np.full(len(df), 0.0))
-        df["macd_signal"] = pd.Series(np.full(len(df), 0.0))
-        df["bb_upper"] = df["close"] * 1.02
-        df["bb_lower"] = df["close"] * 0.98
-        df["atr"] = (df["high"] - df["low"]).rolling(window=14).mean()
-        df["volume_sma_20"] = df["volume"].rolling(window=20).mean()
-        df["bullish_engulfing"] = df.apply(lambda x: is_bullish_engulfing(df.loc[:x.name]), axis=1).astype(int)
-        df["bearish_engulfing"] = df.apply(lambda x: is_bearish_engulfing(df.loc[:x.name]), axis=1).astype(int)
-        df["doji"] = df.apply(lambda x: is_doji(df.loc[:x.name]), axis=1).astype(int)
-        df["hammer"] = df.apply(lambda x: is_hammer(df.loc[:x.name]), axis=1).astype(int)
-        df["shooting_star"] = df.apply(lambda x: is_shooting_star(df.loc[:x.name]), axis=1).astype(int)
-        df["three_white_soldiers"] = df.apply(lambda x: is_three_white_soldiers(df.loc[:x.name]), axis=1).astype(int)
-        df["three_black_crows"] = df.apply(lambda x: is_three_black_crows(df.loc[:x.name]), axis=1).astype(int)
-
-        # Label: 1 if TP1 hit, 0 otherwise
-        df["label"] = 0
-        for i in range(len(df) - 10):
-            future_highs = df["high"].iloc[i+1:i+11]
-            future_lows = df["low"].iloc[i+1:i+11]
-            tp1 = df["close"].iloc[i] + df["atr"].iloc[i] * 1.2  # Example TP1
-            if df["close"].iloc[i] < tp1 <= future_highs.max():
-                df.loc[df.index[i], "label"] = 1
-
-        features = [
-            "rsi", "macd", "macd_signal", "bb_upper", "bb_lower", "atr",
-            "volume", "volume_sma_20", "bullish_engulfing", "bearish_engulfing",
-            "doji", "hammer", "shooting_star", "three_white_soldiers", "three_black_crows"
-        ]
-        X = df[features]
-        y = df["label"]
+        windows = sliding_window_view(ohlcv, (FEATURE_WINDOW, ohlcv.shape[1]))[:, 0]
+        builder = FeatureMatrixBuilder(features)
+        matrix, valid = builder.build(windows, out=np.empty((len(windows), len(features)), dtype=np.float32))
+        labels, known = label_tp1_hits(ohlcv)
+        labels, known = labels[FEATURE_WINDOW - 1:], known[FEATURE_WINDOW - 1:]
+        keep = valid & known
+
+        X = pd.DataFrame(matrix[keep], columns=list(features))
+        X.insert(0, "timestamp", ohlcv[FEATURE_WINDOW - 1:, 0][keep])
+        y = pd.Series(labels[keep], name="label")
         return X, y
     except Exception as e:
         log(f"[{symbol}] Error preparing training data: {e}", level='ERROR')
         return None, None
 
-def train_model(symbol, ohlcv, model_path="models/rf_model.joblib"):
+
+def dataset_path(cache_dir, symbol, timeframe, ohlcv, spec_hash):
+    start, end = int(ohlcv[0, 0]), int(ohlcv[-1, 0])
+    return os.path.join(cache_dir, f"{symbol.replace('/', '')}_{timeframe}_{start}_{end}_{spec_hash}.parquet")
+
+
+# Latest cached dataset per market under the current spec
+def cached_datasets(cache_dir=DATASET_CACHE_DIR, timeframe=TRAIN_TIMEFRAME):
+    latest = {}
+    for path in glob.glob(os.path.join(cache_dir, f"*_{timeframe}_*_{dataset_spec_hash()}.parquet")):
+        market, _, _, end, _ = os.path.basename(path).rsplit("_", 4)
+        if market not in latest or int(end) > latest[market][0]:
+            latest[market] = (int(end), path)
+    return [path for _, path in latest.values()]
+
+
+# Runs in a worker process: build one symbol's dataset unless it is already cached
+def build_dataset(symbol, ohlcv, timeframe, cache_dir, spec_hash):
+    path = dataset_path(cache_dir, symbol, timeframe, ohlcv, spec_hash)
+    if os.path.exists(path):
+        return symbol, path, True
+    X, y = prepare_training_data(symbol, ohlcv)
+    if X is None or not len(X):
+        return symbol, None, False
+    frame = pl.DataFrame({column: X[column].to_numpy() for column in X.columns}).with_columns(label=pl.Series(y.to_numpy()))
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    os.close(fd)
+    frame.write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return symbol, path, False
+
+
+async def fetch_training_candles(exchange, symbol, timeframe=TRAIN_TIMEFRAME, candles=TRAIN_CANDLES):
+    from core.scheduler import timeframe_to_seconds
+    from data import market_data
+    period_ms = timeframe_to_seconds(timeframe) * 1000
+    now_ms = int(time.time() * 1000)
+    since = now_ms - now_ms % period_ms - candles * period_ms
+    rows = []
+    while len(rows) < candles:
+        page = await market_data.fetch_ohlcv(exchange, symbol, timeframe, since=since, limit=OHLCV_PAGE_LIMIT)
+        if not page:
+            break
+        rows.extend(page)
+        since = int(page[-1][0]) + period_ms
+        if len(page) < OHLCV_PAGE_LIMIT:
+            break
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+    closed = rows[rows[:, 0] + period_ms <= now_ms]  # The forming candle has no label yet
+    return closed[-candles:]
+
+
+async def load_candles(symbols, timeframe, candles, data_dir=None):
+    if data_dir:
+        from data.history import find_history_file, read_candles
+        loaded = {}
+        for symbol in symbols:
+            path = find_history_file(data_dir, symbol, timeframe)
+            if path:
+                loaded[symbol] = read_candles(path)[-candles:]
+        return loaded
+
+    from data.exchange_factory import create_exchange
+    exchange = create_exchange(authenticated=False)
+    semaphore = asyncio.Semaphore(FETCH_CONCURRENCY)
+
+    async def fetch(symbol):
+        async with semaphore:
+            try:
+                return symbol, await fetch_training_candles(exchange, symbol, timeframe, candles)
+            except Exception as e:
+                log(f"[{symbol}] Error fetching training candles: {e}", level='ERROR')
+                return symbol, None
+
+    try:
+        results = await asyncio.gather(*(fetch(symbol) for symbol in symbols))
+    finally:
+        await exchange.close()
+    return {symbol: rows for symbol, rows in results if rows is not None and len(rows)}
+
+
+# Per-symbol datasets in a process pool, cached as Parquet keyed by data range and spec
+def build_datasets(candles_by_symbol, timeframe, n_jobs, cache_dir=DATASET_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    spec_hash = dataset_spec_hash()
+    paths, missing = [], {}
+    for symbol, rows in candles_by_symbol.items():
+        path = dataset_path(cache_dir, symbol, timeframe, rows, spec_hash)
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            missing[symbol] = rows
+    cached = len(paths)
+    if missing:
+        # Spawned, not forked: polars' thread pool does not survive a fork
+        with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(build_dataset, symbol, rows, timeframe, cache_dir, spec_hash)
+                for symbol, rows in missing.items()
+            ]
+            for future in futures:
+                try:
+                    symbol, path, _ = future.result()
+                except Exception as e:
+                    log(f"Error building dataset: {e}", level='ERROR')
+                    continue
+                if path:
+                    paths.append(path)
+    log(f"Datasets ready for {len(paths)} symbols ({cached} from cache)")
+    return paths
+
+
+# Oldest (1 - TEST_FRACTION) of candles across all markets for training, the rest for scoring
+def load_split(paths):
+    frame = pl.concat([pl.read_parquet(path) for path in paths]).sort("timestamp")
+    cutoff = frame["timestamp"].quantile(1 - TEST_FRACTION)
+    train, test = frame.filter(pl.col("timestamp") <= cutoff), frame.filter(pl.col("timestamp") > cutoff)
+    X_train = pd.DataFrame(train.select(MODEL_FEATURES).to_numpy(), columns=MODEL_FEATURES)
+    X_test = pd.DataFrame(test.select(MODEL_FEATURES).to_numpy(), columns=MODEL_FEATURES)
+    return X_train, train["label"].to_numpy(), X_test, test["label"].to_numpy()
+
+
+def fit_model(X_train, y_train, X_test, y_test, name=zoo.DEFAULT_MODEL, n_jobs=-1):
+    model = zoo.create_model(name, n_jobs)
+    started = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = round(time.perf_counter() - started, 1)
+    model = zoo.prepare_for_inference(model)
+    metrics = dict(
+        zoo.evaluate(model, X_test, y_test),
+        train_rows=len(X_train),
+        test_rows=len(X_test),
+        positive_rate=float(y_train.mean()) if len(y_train) else 0.0,
+        fit_seconds=fit_seconds
+    )
+    latency = zoo.measure_latency(model, X_test if len(X_test) else X_train)
+    log(f"[{name}] Trained on {metrics['train_rows']} rows in {fit_seconds}s, holdout {metrics}, latency {latency}")
+    return model, metrics, latency
+
+
+# Write models/<name>_<version>.joblib plus its metadata, check that the predictor
+# loads it with its own feature list, then optionally make it the live model
+def save_model(model, metadata, model_dir=zoo.MODEL_DIR, promote=False):
+    if list(model.feature_names_in_) != list(MODEL_FEATURES):
+        raise ValueError(f"Model features {list(model.feature_names_in_)} do not match SignalPredictor features")
+    os.makedirs(model_dir, exist_ok=True)
+    version = metadata["version"]
+    path = os.path.join(model_dir, f"{metadata['model']}_{version}.joblib")
+    dump(model, path)
+    with open(os.path.join(model_dir, f"{metadata['model']}_{version}.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    predictor = SignalPredictor(model_path=path)
+    if predictor.features != list(MODEL_FEATURES):
+        raise ValueError(f"SignalPredictor loaded {path} with features {predictor.features}")
+    log(f"Model saved to {path}")
+
+    if promote:
+        fd, tmp_path = tempfile.mkstemp(dir=model_dir, suffix=".tmp")
+        os.close(fd)
+        dump(model, tmp_path)
+        os.replace(tmp_path, zoo.LIVE_MODEL_PATH)
+        log(f"Model {path} promoted to {zoo.LIVE_MODEL_PATH}")
+    return path
+
+
+async def train(args):
+    started = time.perf_counter()
+    if args.symbols:
+        symbols = args.symbols
+    elif args.data_dir:
+        from data.history import list_history
+        symbols = list_history(args.data_dir, args.timeframe)[:args.top]
+    else:
+        from data.exchange_factory import create_exchange
+        from data.downloader import top_symbols
+        exchange = create_exchange(authenticated=False)
+        try:
+            symbols = await top_symbols(exchange, args.top)
+        finally:
+            await exchange.close()
+
+    candles = await load_candles(symbols, args.timeframe, args.candles, args.data_dir)
+    log(f"Loaded candles for {len(candles)}/{len(symbols)} symbols in {time.perf_counter() - started:.0f}s")
+    paths = build_datasets(candles, args.timeframe, args.n_jobs, args.cache_dir)
+    if not paths:
+        log("No training data", level='ERROR')
+        return None
+
+    model, metrics, latency = fit_model(*load_split(paths), name=args.model, n_jobs=args.n_jobs)
+    metadata = {
+        "model": args.model,
+        "version": datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S"),
+        "features": list(MODEL_FEATURES),
+        "feature_spec": feature_spec_hash(MODEL_FEATURES),
+        "dataset_spec": dataset_spec_hash(),
+        "timeframe": args.timeframe,
+        "symbols": sorted(candles),
+        "data_range": [
+            int(min(rows[0, 0] for rows in candles.values())),
+            int(max(rows[-1, 0] for rows in candles.values()))
+        ],
+        "params": {key: value for key, value in model.get_params(deep=False).items() if isinstance(value, (int, float, str, bool, type(None)))},
+        "metrics": metrics,
+        "latency": latency,
+        "total_seconds": round(time.perf_counter() - started, 1)
+    }
+    return save_model(model, metadata, args.model_dir, args.promote)
+
+
+def train_model(symbol, ohlcv, model_path=zoo.LIVE_MODEL_PATH):
     try:
         X, y = prepare_training_data(symbol, ohlcv)
         if X is None or y is None:
             return False
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        model = RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42)
-        model.fit(X_train, y_train)
+        cutoff = int(len(X) * (1 - TEST_FRACTION))
+        model = zoo.create_model(zoo.DEFAULT_MODEL)
+        model.fit(X[MODEL_FEATURES].iloc[:cutoff], y.iloc[:cutoff])
 
-        accuracy = model.score(X_test, y_test)
+        accuracy = model.score(X[MODEL_FEATURES].iloc[cutoff:], y.iloc[cutoff:])
         log(f"[{symbol}] Model trained with accuracy: {accuracy:.2f}")
 
-        import os
-        os.makedirs("models", exist_ok=True)
+        os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
         dump(model, model_path)
         log(f"[{symbol}] Model saved to {model_path}")
         return True
@@ -72,8 +306,22 @@ def train_model(symbol, ohlcv, model_path="models/rf_model.joblib"):
         log(f"[{symbol}] Error training model: {e}", level='ERROR')
         return False
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the signal model over many symbols")
+    parser.add_argument("--symbols", nargs="*", help="Symbols to train on; default is the top --top by volume")
+    parser.add_argument("--top", type=int, default=TRAIN_SYMBOLS)
+    parser.add_argument("--timeframe", default=TRAIN_TIMEFRAME)
+    parser.add_argument("--candles", type=int, default=TRAIN_CANDLES, help="Candles per symbol")
+    parser.add_argument("--data-dir", help="Read stored candles (data/history.py layout, see data/downloader.py) instead of fetching")
+    parser.add_argument("--cache-dir", default=DATASET_CACHE_DIR)
+    parser.add_argument("--model-dir", default=zoo.MODEL_DIR)
+    parser.add_argument("--model", default=zoo.DEFAULT_MODEL, choices=sorted(zoo.MODEL_ZOO))
+    parser.add_argument("--n-jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--promote", action="store_true", help=f"Also replace {zoo.LIVE_MODEL_PATH}")
+    args = parser.parse_args()
+    asyncio.run(train(args))
+
+
 if __name__ == "__main__":
-    exchange = ccxt.binance()
-    symbol = "BTC/USDT"
-    ohlcv = exchange.fetch_ohlcv(symbol, timeframe="15m", limit=2880)  # ~30 days
-    train_model(symbol, ohlcv)
+    main()
@@ -0,0 +1,146 @@
+import glob
+import json
+import os
+import time
+import warnings
+import numpy as np
+from model.feature_matrix import feature_spec_hash, MODEL_FEATURES
+from utils.logger import log
+
+# Candidate signal models. Each is a scikit-learn classifier fitted on a DataFrame of
+# MODEL_FEATURES; SignalPredictor only relies on predict_proba, classes_ and
+# feature_names_in_, so anything with those plugs in. Factories take the training n_jobs.
+# scikit-learn is imported inside the functions that need it: the scanner only needs it
+# once the model is unpickled, not at import time (it is ~1s of the cold start).
+
+MODEL_DIR = "models"
+LIVE_MODEL_PATH = "models/rf_model.joblib"
+DEFAULT_MODEL = "forest"
+SELECTION_METRIC = "roc_auc"
+CYCLE_ROWS = 150  # Symbols scored together once per scan cycle
+LATENCY_RUNS = 200
+
+# Live model choice: a zoo name and/or a p99 budget for scoring one cycle; the best-scoring saved model wins
+SIGNAL_MODEL = os.getenv("SIGNAL_MODEL")
+MODEL_LATENCY_BUDGET_MS = float(os.getenv("MODEL_LATENCY_BUDGET_MS", "0")) or None
+
+
+def _forest(n_jobs):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=200, max_depth=10, random_state=42, n_jobs=n_jobs)
+
+
+# Fewer, shallower trees with a leaf-size floor: most of the forest's accuracy at a fraction of the nodes
+def _shallow_forest(n_jobs):
+    from sklearn.ensemble import RandomForestClassifier
+    return RandomForestClassifier(n_estimators=60, max_depth=6, min_samples_leaf=20, random_state=42, n_jobs=n_jobs)
+
+
+def _hist_gb(n_jobs):
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    return HistGradientBoostingClassifier(max_iter=200, max_depth=6, learning_rate=0.1, random_state=42)
+
+
+def _logistic(n_jobs):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+    return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+
+
+MODEL_ZOO = {
+    "forest": _forest,
+    "shallow_forest": _shallow_forest,
+    "hist_gb": _hist_gb,
+    "logistic": _logistic
+}
+
+
+def create_model(name=DEFAULT_MODEL, n_jobs=-1):
+    if name not in MODEL_ZOO:
+        raise ValueError(f"Unknown model {name}; choose from {sorted(MODEL_ZOO)}")
+    return MODEL_ZOO[name](n_jobs)
+
+
+# Columns are in MODEL_FEATURES order; sklearn only warns because the array is unnamed
+def predict_proba(model, matrix):
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return model.predict_proba(matrix)
+
+
+def evaluate(model, X, y):
+    from sklearn.metrics import accuracy_score, log_loss, precision_score, recall_score, roc_auc_score
+    if not len(X):
+        return {}
+    proba = predict_proba(model, np.asarray(X, dtype=np.float32))
+    positive = proba[:, list(model.classes_).index(1)] if 1 in model.classes_ else np.zeros(len(X))
+    predicted = model.classes_[proba.argmax(axis=1)]
+    metrics = {
+        "accuracy": float(accuracy_score(y, predicted)),
+        "precision": float(precision_score(y, predicted, zero_division=0)),
+        "recall": float(recall_score(y, predicted, zero_division=0))
+    }
+    if len(np.unique(y)) > 1:
+        metrics["roc_auc"] = float(roc_auc_score(y, positive))
+        metrics["log_loss"] = float(log_loss(y, proba, labels=model.classes_))
+    return metrics
+
+
+# Scoring one cycle is too small a job to amortise a thread pool
+def prepare_for_inference(model):
+    if "n_jobs" in model.get_params(deep=False):
+        model.set_params(n_jobs=1)
+    return model
+
+
+# p50/p99 milliseconds to score one symbol and one cycle's worth of symbols
+def measure_latency(model, X, runs=LATENCY_RUNS, cycle_rows=CYCLE_ROWS):
+    X = np.asarray(X, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    latency = {}
+    for label, rows in (("row", 1), ("cycle", cycle_rows)):
+        timings = []
+        for _ in range(runs):
+            sample = X[rng.integers(0, len(X), rows)]
+            started = time.perf_counter()
+            predict_proba(model, sample)
+            timings.append((time.perf_counter() - started) * 1000)
+        latency[f"{label}_p50_ms"] = round(float(np.percentile(timings, 50)), 3)
+        latency[f"{label}_p99_ms"] = round(float(np.percentile(timings, 99)), 3)
+    return latency
+
+
+# Saved models (with their metadata) that match the current features, best first
+def list_models(model_dir=MODEL_DIR, name=None, budget_ms=None):
+    spec = feature_spec_hash(MODEL_FEATURES)
+    candidates = []
+    for meta_path in glob.glob(os.path.join(model_dir, "*.json")):
+        try:
+            with open(meta_path) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        model_path = meta_path[:-len(".json")] + ".joblib"
+        if metadata.get("feature_spec") != spec or not os.path.exists(model_path):
+            continue
+        if name and metadata.get("model") != name:
+            continue
+        latency = metadata.get("latency", {}).get("cycle_p99_ms")
+        if budget_ms and (latency is None or latency > budget_ms):
+            continue
+        candidates.append((metadata.get("metrics", {}).get(SELECTION_METRIC, 0.0), metadata.get("version", ""), model_path))
+    candidates.sort(reverse=True)
+    return [path for _, _, path in candidates]
+
+
+# Model for the live scanner: the best saved model matching SIGNAL_MODEL within the
+# latency budget, else the live model file
+def select_model(model_dir=MODEL_DIR, name=SIGNAL_MODEL, budget_ms=MODEL_LATENCY_BUDGET_MS):
+    if name or budget_ms:
+        candidates = list_models(model_dir, name, budget_ms)
+        if candidates:
+            log("Selected model %s (model=%s, budget=%s ms)", candidates[0], name or 'any', budget_ms or 'none')
+            return candidates[0]
+        log("No saved model matches model=%s, budget=%s ms; using %s", name, budget_ms, LIVE_MODEL_PATH, level="WARNING")
+    return LIVE_MODEL_PATH
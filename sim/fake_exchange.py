@@ -0,0 +1,339 @@
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import time
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from data.history import find_history_file, read_candles
+from utils.logger import log
+
+# Stand-in for the subset of the Binance spot REST API the bot uses (exchangeInfo,
+# 24h tickers, klines, depth), serving synthetic or recorded candles with injected
+# latency, errors and weight-based 429/418 responses. Point clients at it with
+# EXCHANGE_API_URL=http://127.0.0.1:8900 (see data/exchange_factory.py).
+
+DEFAULT_CONFIG = {
+    "symbols": 300,
+    "seed": 42,
+    "latency_ms": 20.0,  # Median added latency
+    "latency_sigma": 0.5,  # Lognormal shape; 0 means fixed latency
+    "error_rate": 0.0,  # Fraction of requests answered with HTTP 500
+    "weight_limit": 6000,  # Per minute, as on Binance
+    "ban_after_429s": 5,  # Further requests while over the limit before a 418
+    "ban_seconds": 120,
+    "record_dir": None  # {SYMBOL}_{interval}.csv or .parquet files served instead of synthetic data
+}
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "1d": 86_400_000
+}
+
+WEIGHTS = {"exchangeInfo": 20, "klines": 2, "ticker_one": 2, "ticker_all": 80, "ping": 1, "time": 1}
+
+
+def depth_weight(limit):
+    return 5 if limit <= 100 else 25 if limit <= 500 else 50 if limit <= 1000 else 250
+
+
+def _seed(*parts):
+    return int.from_bytes(hashlib.md5(":".join(map(str, parts)).encode()).digest()[:4], "big")
+
+
+# Deterministic price path: a few slow waves plus hashed noise, so any candle can
+# be generated on its own and repeated requests always agree
+class SyntheticMarket:
+    def __init__(self, num_symbols, seed=42):
+        rng = random.Random(seed)
+        names = ["BTC", "ETH", "BNB", "SOL", "XRP"] + [f"SYN{i:04d}" for i in range(max(num_symbols - 5, 0))]
+        self.symbols = {}
+        for name in names[:num_symbols]:
+            self.symbols[f"{name}USDT"] = {
+                "base": name,
+                "price": 10 ** rng.uniform(-2, 4.5),
+                "volatility": rng.uniform(0.002, 0.02),  # Per-minute noise
+                "waves": [(rng.uniform(0.02, 0.15), rng.uniform(3, 72) * 3_600_000, rng.uniform(0, 2 * math.pi)) for _ in range(3)],
+                "volume": 10 ** rng.uniform(5.5, 8.5)  # 24h quote volume
+            }
+
+    def price_at(self, symbol, ms):
+        spec = self.symbols[symbol]
+        wave = sum(amplitude * math.sin(2 * math.pi * ms / period + phase) for amplitude, period, phase in spec["waves"])
+        noise = (_seed(symbol, ms // 60_000) / 2 ** 32 - 0.5) * spec["volatility"]
+        return spec["price"] * math.exp(wave + noise)
+
+    def candle(self, symbol, interval, open_ms):
+        step = INTERVAL_MS[interval]
+        spec = self.symbols[symbol]
+        samples = [self.price_at(symbol, open_ms + step * k // 8) for k in range(9)]
+        o, c = samples[0], samples[-1]
+        h, l = max(samples), min(samples)
+        spike = 6.0 if _seed(symbol, interval, open_ms) % 50 == 0 else 1.0
+        quote_volume = spec["volume"] * step / 86_400_000 * (0.5 + _seed(symbol, "v", open_ms) / 2 ** 32) * spike
+        return [open_ms, o, h, l, c, quote_volume / c]
+
+    def klines(self, symbol, interval, limit, start_ms=None, end_ms=None, now_ms=None):
+        step = INTERVAL_MS[interval]
+        now_ms = now_ms or int(time.time() * 1000)
+        current = now_ms - now_ms % step
+        if start_ms is not None:
+            first = start_ms + (-start_ms) % step
+        elif end_ms is not None:
+            first = min(end_ms - end_ms % step, current) - (limit - 1) * step
+        else:
+            first = current - (limit - 1) * step
+        last = min(current, end_ms if end_ms is not None else current)
+        return [self.candle(symbol, interval, t) for t in range(first, last + 1, step)][:limit]
+
+
+class RecordedMarket:
+    def __init__(self, record_dir, fallback):
+        self.record_dir = record_dir
+        self.fallback = fallback
+        self.frames = {}
+
+    def _frame(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self.frames:
+            path = find_history_file(self.record_dir, symbol, interval)
+            self.frames[key] = read_candles(path) if path else None
+        return self.frames[key]
+
+    def klines(self, symbol, interval, limit, start_ms=None, end_ms=None, now_ms=None):
+        frame = self._frame(symbol, interval)
+        if frame is None:
+            return self.fallback.klines(symbol, interval, limit, start_ms, end_ms, now_ms)
+        rows = frame
+        if start_ms is not None:
+            rows = rows[rows[:, 0] >= start_ms][:limit]
+        else:
+            if end_ms is not None:
+                rows = rows[rows[:, 0] <= end_ms]
+            rows = rows[-limit:]
+        return rows.tolist()
+
+
+# Binance counts weight per IP in fixed one-minute windows
+class WeightTracker:
+    def __init__(self, limit, ban_after, ban_seconds):
+        self.limit = limit
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+        self.window = None
+        self.used = 0
+        self.over_limit_hits = 0
+        self.banned_until = 0.0
+
+    def charge(self, weight, now):
+        window = int(now // 60)
+        if window != self.window:
+            self.window, self.used, self.over_limit_hits = window, 0, 0
+        if now < self.banned_until:
+            return 418, self.banned_until - now
+        self.used += weight
+        if self.used > self.limit:
+            self.over_limit_hits += 1
+            if self.over_limit_hits > self.ban_after:
+                self.banned_until = now + self.ban_seconds
+                return 418, self.ban_seconds
+            return 429, 60 - now % 60
+        return 200, 0
+
+
+def create_app(config=None):
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    rng = random.Random(config["seed"])
+    market = SyntheticMarket(config["symbols"], config["seed"])
+    source = RecordedMarket(config["record_dir"], market) if config["record_dir"] else market
+    weights = WeightTracker(config["weight_limit"], config["ban_after_429s"], config["ban_seconds"])
+    stats = {"requests": 0, "by_endpoint": {}, "status": {}, "weight": 0}
+    app = FastAPI()
+    app.state.config = config
+    app.state.stats = stats
+    app.state.market = market
+
+    async def gate(endpoint, weight):
+        stats["requests"] += 1
+        stats["by_endpoint"][endpoint] = stats["by_endpoint"].get(endpoint, 0) + 1
+        latency = config["latency_ms"] / 1000
+        if config["latency_sigma"] > 0:
+            latency = rng.lognormvariate(math.log(max(latency, 1e-6)), config["latency_sigma"])
+        if latency > 0:
+            await asyncio.sleep(latency)
+        status, retry_after = weights.charge(weight, time.time())
+        headers = {"x-mbx-used-weight-1m": str(weights.used), "x-mbx-used-weight": str(weights.used)}
+        if status != 200:
+            headers["Retry-After"] = str(int(math.ceil(retry_after)))
+            body = {"code": -1003, "msg": "Too many requests; current limit is %d request weight per 1 MINUTE." % config["weight_limit"]}
+        elif rng.random() < config["error_rate"]:
+            status, body = 500, {"code": -1000, "msg": "An unknown error occured while processing the request."}
+        else:
+            stats["weight"] += weight
+            return None, headers
+        stats["status"][status] = stats["status"].get(status, 0) + 1
+        return JSONResponse(body, status_code=status, headers=headers), headers
+
+    def respond(payload, headers):
+        stats["status"][200] = stats["status"].get(200, 0) + 1
+        return JSONResponse(payload, headers=headers)
+
+    def ticker(symbol, now_ms):
+        spec = market.symbols[symbol]
+        last = market.price_at(symbol, now_ms)
+        open_price = market.price_at(symbol, now_ms - 86_400_000)
+        day = market.klines(symbol, "1h", 24, now_ms=now_ms)
+        high = max(row[2] for row in day)
+        low = min(row[3] for row in day)
+        return {
+            "symbol": symbol,
+            "priceChange": f"{last - open_price:.8f}",
+            "priceChangePercent": f"{(last / open_price - 1) * 100:.3f}",
+            "weightedAvgPrice": f"{(high + low) / 2:.8f}",
+            "prevClosePrice": f"{open_price:.8f}",
+            "lastPrice": f"{last:.8f}",
+            "lastQty": "1.00000000",
+            "bidPrice": f"{last * 0.9999:.8f}",
+            "bidQty": "10.00000000",
+            "askPrice": f"{last * 1.0001:.8f}",
+            "askQty": "10.00000000",
+            "openPrice": f"{open_price:.8f}",
+            "highPrice": f"{high:.8f}",
+            "lowPrice": f"{low:.8f}",
+            "volume": f"{spec['volume'] / last:.8f}",
+            "quoteVolume": f"{spec['volume']:.8f}",
+            "openTime": now_ms - 86_400_000,
+            "closeTime": now_ms,
+            "firstId": 1,
+            "lastId": 1000,
+            "count": 1000
+        }
+
+    def unknown_symbol():
+        return JSONResponse({"code": -1121, "msg": "Invalid symbol."}, status_code=400)
+
+    @app.get("/api/v3/ping")
+    async def ping():
+        error, headers = await gate("ping", WEIGHTS["ping"])
+        return error or respond({}, headers)
+
+    @app.get("/api/v3/time")
+    async def server_time():
+        error, headers = await gate("time", WEIGHTS["time"])
+        return error or respond({"serverTime": int(time.time() * 1000)}, headers)
+
+    @app.get("/api/v3/exchangeInfo")
+    async def exchange_info():
+        error, headers = await gate("exchangeInfo", WEIGHTS["exchangeInfo"])
+        if error:
+            return error
+        symbols = [{
+            "symbol": symbol,
+            "status": "TRADING",
+            "baseAsset": spec["base"],
+            "baseAssetPrecision": 8,
+            "quoteAsset": "USDT",
+            "quotePrecision": 8,
+            "quoteAssetPrecision": 8,
+            "orderTypes": ["LIMIT", "MARKET"],
+            "icebergAllowed": True,
+            "ocoAllowed": True,
+            "isSpotTradingAllowed": True,
+            "isMarginTradingAllowed": False,
+            "permissions": ["SPOT"],
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": "0.00000001", "maxPrice": "1000000.00000000", "tickSize": "0.00000001"},
+                {"filterType": "LOT_SIZE", "minQty": "0.00000001", "maxQty": "9000000.00000000", "stepSize": "0.00000001"},
+                {"filterType": "NOTIONAL", "minNotional": "5.00000000"}
+            ]
+        } for symbol, spec in market.symbols.items()]
+        return respond({"timezone": "UTC", "serverTime": int(time.time() * 1000), "rateLimits": [], "symbols": symbols}, headers)
+
+    @app.get("/api/v3/ticker/24hr")
+    async def ticker_24hr(symbol: str = None, symbols: str = None):
+        if symbol:
+            error, headers = await gate("ticker", WEIGHTS["ticker_one"])
+            if error:
+                return error
+            if symbol not in market.symbols:
+                return unknown_symbol()
+            return respond(ticker(symbol, int(time.time() * 1000)), headers)
+        error, headers = await gate("ticker", WEIGHTS["ticker_all"])
+        if error:
+            return error
+        now_ms = int(time.time() * 1000)
+        return respond([ticker(s, now_ms) for s in market.symbols], headers)
+
+    @app.get("/api/v3/klines")
+    async def klines(symbol: str, interval: str, limit: int = 500, startTime: int = None, endTime: int = None):
+        error, headers = await gate("klines", WEIGHTS["klines"])
+        if error:
+            return error
+        if symbol not in market.symbols or interval not in INTERVAL_MS:
+            return unknown_symbol()
+        limit = max(1, min(limit, 1000))
+        step = INTERVAL_MS[interval]
+        rows = source.klines(symbol, interval, limit, startTime, endTime)
+        payload = [[
+            int(t), f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}",
+            int(t) + step - 1, f"{v * c:.8f}", 100, f"{v / 2:.8f}", f"{v * c / 2:.8f}", "0"
+        ] for t, o, h, l, c, v in rows]
+        return respond(payload, headers)
+
+    @app.get("/api/v3/depth")
+    async def depth(symbol: str, limit: int = 100):
+        error, headers = await gate("depth", depth_weight(limit))
+        if error:
+            return error
+        if symbol not in market.symbols:
+            return unknown_symbol()
+        mid = market.price_at(symbol, int(time.time() * 1000))
+        book_rng = np.random.default_rng(_seed(symbol, int(time.time())))
+        ticks = np.arange(1, limit + 1) * mid * 0.0002
+        sizes = book_rng.lognormal(0, 1, size=(2, limit)) * market.symbols[symbol]["volume"] / mid / 20_000
+        bids = [[f"{mid - t:.8f}", f"{s:.8f}"] for t, s in zip(ticks, sizes[0])]
+        asks = [[f"{mid + t:.8f}", f"{s:.8f}"] for t, s in zip(ticks, sizes[1])]
+        return respond({"lastUpdateId": int(time.time() * 1000), "bids": bids, "asks": asks}, headers)
+
+    @app.get("/_fake/stats")
+    async def fake_stats():
+        return {**stats, "used_weight": weights.used, "banned_until": weights.banned_until}
+
+    @app.post("/_fake/config")
+    async def update_config(request: Request):
+        updates = await request.json()
+        config.update({k: v for k, v in updates.items() if k in ("latency_ms", "latency_sigma", "error_rate")})
+        if "weight_limit" in updates:
+            weights.limit = config["weight_limit"] = updates["weight_limit"]
+        return config
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Binance spot REST API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--symbols", type=int, default=DEFAULT_CONFIG["symbols"])
+    parser.add_argument("--seed", type=int, default=DEFAULT_CONFIG["seed"])
+    parser.add_argument("--latency-ms", type=float, default=DEFAULT_CONFIG["latency_ms"])
+    parser.add_argument("--latency-sigma", type=float, default=DEFAULT_CONFIG["latency_sigma"])
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"])
+    parser.add_argument("--weight-limit", type=int, default=DEFAULT_CONFIG["weight_limit"])
+    parser.add_argument("--record-dir", default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app({
+        "symbols": args.symbols, "seed": args.seed, "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma, "error_rate": args.error_rate,
+        "weight_limit": args.weight_limit, "record_dir": args.record_dir
+    })
+    log(f"[FakeExchange] Serving {args.symbols} symbols on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
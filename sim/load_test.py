@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import uvicorn
+from sim.fake_exchange import create_app
+from data import exchange_factory, market_data
+from data.exchange_factory import exchange_pool
+from utils.cpu_pool import cpu_pool
+from utils.rate_limiter import rate_limiter
+from utils.logger import log
+
+# Measures scanner throughput and backoff behaviour against sim/fake_exchange.py.
+#   python -m sim.load_test --symbols 1000 --latency-ms 40 --weight-limit 1200 --scenarios universe,fetch,scan,track
+
+SCENARIOS = ("universe", "fetch", "scan", "track")
+
+
+async def start_fake_exchange(config, host="127.0.0.1", port=8900):
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task
+
+
+def _delta(before, after):
+    return {key: after[key] - before[key] for key in before if isinstance(before[key], (int, float))}
+
+
+async def run_scenario(name, coro_fn):
+    limiter_before = dict(rate_limiter.stats)
+    started = time.perf_counter()
+    detail = await coro_fn()
+    elapsed = time.perf_counter() - started
+    report = {"scenario": name, "seconds": round(elapsed, 3), "limiter": _delta(limiter_before, rate_limiter.stats)}
+    report.update(detail or {})
+    log(f"[LoadTest] {json.dumps(report)}")
+    return report
+
+
+async def universe_scenario():
+    import main
+    await exchange_pool.load_markets()
+    symbols = await main.get_valid_symbols(exchange_pool.get())
+    return {"symbols": len(symbols)}
+
+
+async def fetch_scenario(symbols, timeframe="15m"):
+    from core.prefilter import refresh_candles
+    from data.candle_store import candle_store
+    started = time.perf_counter()
+    await refresh_candles(exchange_pool.get(), symbols, timeframe, limit=50)
+    elapsed = time.perf_counter() - started
+    candles = sum(len(candle_store.get(s, timeframe)) for s in symbols if candle_store.get(s, timeframe) is not None)
+    return {"symbols": len(symbols), "symbols_per_second": round(len(symbols) / elapsed, 1), "candles": candles}
+
+
+# How late a short sleep wakes up while the loop is busy: what a /health request would wait
+async def probe_loop_lag(lags, interval=0.01):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - started - interval) * 1000)
+
+
+async def scan_scenario():
+    import main
+    from core.analysis import initialize_predictor
+    await initialize_predictor()
+    # Synthetic signals go to a scratch log and are counted instead of sent
+    messages = []
+
+    async def record_message(message):
+        messages.append(message)
+
+    main.send_telegram_message = record_message
+    main.SIGNAL_LOG_FILE = os.path.join(tempfile.mkdtemp(prefix="load_test_"), "signals_log.csv")
+    lags = []
+    probe = asyncio.create_task(probe_loop_lag(lags))
+    started = time.perf_counter()
+    try:
+        await main.scan_symbols()
+    finally:
+        probe.cancel()
+    elapsed = time.perf_counter() - started
+    cycle = main.scheduler.last_cycle
+    lags = np.asarray(lags or [0.0])
+    return {
+        "processed": cycle.get("processed", 0),
+        "shed": cycle.get("shed", 0),
+        "signals": len(messages),
+        "symbols_per_second": round(cycle.get("processed", 0) / elapsed, 2) if elapsed else 0.0,
+        "loop_lag_ms": {
+            "p50": round(float(np.percentile(lags, 50)), 2),
+            "p99": round(float(np.percentile(lags, 99)), 2),
+            "max": round(float(lags.max()), 2)
+        },
+        "cpu_pool": cpu_pool.snapshot()
+    }
+
+
+async def track_scenario(symbols, checks=20):
+    from data import tracker
+    tracker.TRACK_CHECKS = checks
+    tracker.TRACK_POLL_SECONDS = 0.05
+    tracker.update_signal_log = lambda symbol, signal, status: None  # Leave the real signal log alone
+    signals = [{"direction": "LONG", "price": 1.0, "tp1": 1e12, "tp2": 1e12, "tp3": 1e12, "sl": 0.0} for _ in symbols]
+    statuses = await asyncio.gather(*(tracker.track_trade(s, sig) for s, sig in zip(symbols, signals)))
+    return {"trades": len(symbols), "ticker_polls": len(symbols) * checks, "errors": statuses.count("error")}
+
+
+async def run_load_test(args):
+    config = {
+        "symbols": args.symbols, "latency_ms": args.latency_ms, "latency_sigma": args.latency_sigma,
+        "error_rate": args.error_rate, "weight_limit": args.weight_limit
+    }
+    server, task = await start_fake_exchange(config, port=args.port)
+    exchange_factory.EXCHANGE_API_URL = f"http://127.0.0.1:{args.port}"
+    os.environ.setdefault("BINANCE_API_KEY", "load-test")
+    os.environ.setdefault("BINANCE_API_SECRET", "load-test")
+    # Budget the client against the fake server's limit, as it would against Binance
+    rate_limiter.limit_per_minute = args.weight_limit
+    rate_limiter.set_share(1.0)
+
+    reports = []
+    try:
+        symbols = [f"{spec['base']}/USDT" for spec in server.config.app.state.market.symbols.values()]
+        for name in args.scenarios:
+            if name == "universe":
+                reports.append(await run_scenario(name, universe_scenario))
+            elif name == "fetch":
+                reports.append(await run_scenario(name, lambda: fetch_scenario(symbols)))
+            elif name == "scan":
+                reports.append(await run_scenario(name, scan_scenario))
+            elif name == "track":
+                reports.append(await run_scenario(name, lambda: track_scenario(symbols[:args.track_trades])))
+        server_stats = server.config.app.state.stats
+        summary = {
+            "server_requests": server_stats["requests"],
+            "server_status": server_stats["status"],
+            "client_requests": market_data.request_stats(),
+            "exchange_pool": exchange_pool.snapshot()
+        }
+        log(f"[LoadTest] Summary: {json.dumps(summary, default=str)}")
+        reports.append(summary)
+    finally:
+        await exchange_pool.close()
+        server.should_exit = True
+        await task
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the scanner against the local fake exchange")
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--weight-limit", type=int, default=6000)
+    parser.add_argument("--track-trades", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--scenarios", default="universe,fetch,track",
+                        type=lambda value: [s for s in value.split(",") if s in SCENARIOS])
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+    reports = asyncio.run(run_load_test(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
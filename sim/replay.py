@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import polars as pl
+import ccxt.async_support as ccxt
+from core.scheduler import timeframe_to_seconds, CANDLE_CLOSE_GRACE_SECONDS
+from data import exchange_factory, market_data, tracker
+from data.history import find_history_file, list_history, read_candles
+from sim.fake_exchange import SyntheticMarket
+from utils import clock
+from utils.logger import ROOT_LOGGER, get_logger
+from utils.memory import memory_monitor
+from utils.rate_limiter import rate_limiter
+
+# Runs the production scan (main.scan_symbols: prefilter, analyze_symbol, thresholds,
+# cooldowns, log_signal_to_csv) over stored candles on a simulated clock. The clock
+# jumps from one candle close to the next instead of sleeping, exchange calls are
+# answered from the history as of that moment, and Telegram sends are only counted.
+# Outcomes are resolved afterwards with the tracker's own TP/SL rule.
+#   python -m sim.replay --symbols 150 --days 30
+#   python -m sim.replay --data-dir data/history --days 30
+
+logger = get_logger("replay")
+
+WARMUP_CANDLES = 60  # History before the first replayed close; analysis needs 50
+DAY_MS = 86_400_000
+
+
+class ReplayHistory:
+    def __init__(self, candles, timeframe):
+        self.candles = {symbol: rows for symbol, rows in candles.items() if len(rows)}  # symbol -> (n, 6) float64
+        self.timeframe = timeframe
+        self.step_ms = timeframe_to_seconds(timeframe) * 1000
+        self.open_times = {symbol: rows[:, 0] for symbol, rows in self.candles.items()}
+
+    @property
+    def symbols(self):
+        return list(self.candles)
+
+    def span(self):
+        start = min(times[0] for times in self.open_times.values())
+        end = max(times[-1] for times in self.open_times.values()) + self.step_ms
+        return int(start), int(end)
+
+    # Candles as the exchange would return them at now_ms: every closed candle, then
+    # the one that just opened with only its open price known
+    def visible(self, symbol, now_ms):
+        rows = self.candles[symbol]
+        times = self.open_times[symbol]
+        closed = int(np.searchsorted(times, now_ms - self.step_ms, side="right"))
+        if closed < len(rows) and times[closed] <= now_ms:
+            open_price = rows[closed, 1]
+            forming = np.array([[times[closed], open_price, open_price, open_price, open_price, 0.0]])
+            return np.concatenate([rows[:closed], forming])
+        return rows[:closed]
+
+    # A longer timeframe's candles at now_ms, aggregated from the visible ones; the
+    # last is still forming, as on the exchange
+    def resampled(self, symbol, timeframe, now_ms):
+        rows = self.visible(symbol, now_ms)
+        if not len(rows):
+            return rows
+        period = timeframe_to_seconds(timeframe) * 1000
+        buckets = rows[:, 0] // period * period
+        starts = np.flatnonzero(np.r_[True, np.diff(buckets) != 0])
+        ends = np.r_[starts[1:], len(rows)] - 1
+        return np.column_stack([
+            buckets[starts], rows[starts, 1], np.maximum.reduceat(rows[:, 2], starts),
+            np.minimum.reduceat(rows[:, 3], starts), rows[ends, 4], np.add.reduceat(rows[:, 5], starts)
+        ])
+
+    def last_price(self, symbol, now_ms):
+        rows = self.visible(symbol, now_ms)
+        return float(rows[-1, 4]) if len(rows) else None
+
+    # Prices a ticker poll could have seen between two times: each candle walked
+    # open -> low -> high -> close when it closed up, open -> high -> low -> close otherwise
+    def price_path(self, symbol, start_ms, end_ms):
+        rows = self.candles[symbol]
+        times = self.open_times[symbol]
+        first = int(np.searchsorted(times, start_ms - start_ms % self.step_ms, side="left"))
+        last = int(np.searchsorted(times, end_ms, side="right"))
+        path = []
+        for _, o, h, l, c, _ in rows[first:last]:
+            path.extend((o, l, h, c) if c >= o else (o, h, l, c))
+        return path
+
+
+def load_history(data_dir, timeframe):
+    candles = {
+        symbol: read_candles(find_history_file(data_dir, symbol, timeframe))
+        for symbol in list_history(data_dir, timeframe)
+    }
+    return ReplayHistory(candles, timeframe)
+
+
+# The fake exchange's deterministic price paths, for replays without recorded data
+def synthetic_history(num_symbols, days, timeframe, seed=42, end_ms=None):
+    market = SyntheticMarket(num_symbols, seed)
+    step = timeframe_to_seconds(timeframe) * 1000
+    end_ms = end_ms or int(time.time() * 1000) // DAY_MS * DAY_MS
+    start_ms = end_ms - days * DAY_MS - WARMUP_CANDLES * step
+    opens = range(start_ms, end_ms, step)
+    candles = {
+        f"{spec['base']}/USDT": np.array([market.candle(pair, timeframe, t) for t in opens], dtype="float64")
+        for pair, spec in market.symbols.items()
+    }
+    return ReplayHistory(candles, timeframe)
+
+
+# Answers the ccxt calls the scan makes from history, as of the simulated clock
+class ReplayExchange:
+    def __init__(self, history):
+        self.history = history
+        self.markets = {}
+        self.last_response_headers = {}
+
+    def _now_ms(self):
+        return int(clock.now() * 1000)
+
+    def _check(self, symbol):
+        if symbol not in self.history.candles:
+            raise ccxt.BadSymbol(f"replay has no history for {symbol}")
+
+    async def load_markets(self, reload=False):
+        self.markets = {
+            symbol: {"symbol": symbol, "active": True, "info": {"status": "TRADING"}}
+            for symbol in self.history.symbols
+        }
+        return self.markets
+
+    async def fetch_ohlcv(self, symbol, timeframe="15m", since=None, limit=None, params=None):
+        self._check(symbol)
+        if timeframe == self.history.timeframe:
+            rows = self.history.visible(symbol, self._now_ms())
+        elif timeframe_to_seconds(timeframe) * 1000 % self.history.step_ms == 0:
+            rows = self.history.resampled(symbol, timeframe, self._now_ms())
+        else:
+            raise ccxt.BadRequest(f"replay cannot build {timeframe} candles from {self.history.timeframe}")
+        limit = limit or 500
+        if since is not None:
+            rows = rows[rows[:, 0] >= since][:limit]
+        else:
+            rows = rows[-limit:]
+        return rows.tolist()
+
+    async def fetch_ticker(self, symbol, params=None):
+        self._check(symbol)
+        now_ms = self._now_ms()
+        rows = self.history.visible(symbol, now_ms)
+        if not len(rows):
+            raise ccxt.BadSymbol(f"{symbol} has no candles before {now_ms}")
+        day = rows[rows[:, 0] >= now_ms - DAY_MS]
+        last = float(rows[-1, 4])
+        open_price = float(day[0, 1])
+        return {
+            "symbol": symbol,
+            "timestamp": now_ms,
+            "open": open_price,
+            "high": float(day[:, 2].max()),
+            "low": float(day[:, 3].min()),
+            "last": last,
+            "close": last,
+            "percentage": (last / open_price - 1) * 100 if open_price else None,
+            "baseVolume": float(day[:, 5].sum()),
+            "quoteVolume": float((day[:, 5] * day[:, 4]).sum())
+        }
+
+    async def fetch_tickers(self, symbols=None, params=None):
+        symbols = symbols or self.history.symbols
+        tickers = {}
+        for symbol in symbols:
+            try:
+                tickers[symbol] = await self.fetch_ticker(symbol)
+            except ccxt.BadSymbol:
+                continue
+        return tickers
+
+    async def fetch_order_book(self, symbol, limit=None, params=None):
+        raise ccxt.NotSupported("replay has no order book history")
+
+    async def close(self):
+        pass
+
+
+# Resolve every logged signal the way track_trade would have over its tracking window
+def resolve_outcomes(history, signal_log):
+    if not os.path.exists(signal_log):
+        return {}
+    frame = pl.read_csv(signal_log)
+    horizon_ms = tracker.TRACK_CHECKS * tracker.TRACK_POLL_SECONDS * 1000
+    statuses = []
+    for row in frame.iter_rows(named=True):
+        entry_ms = int(datetime.fromisoformat(row["timestamp"]).timestamp() * 1000)
+        signal = {"direction": row["prediction"], "tp1": row["tp1"], "tp2": row["tp2"], "tp3": row["tp3"], "sl": row["sl"]}
+        prices = history.price_path(row["symbol"], entry_ms, entry_ms + horizon_ms)
+        statuses.append(tracker.resolve_trade(signal, prices))
+    frame = frame.with_columns(pl.Series("status", statuses, dtype=pl.Utf8))
+    frame.write_csv(signal_log)
+    outcomes = {}
+    for status in statuses:
+        outcomes[status] = outcomes.get(status, 0) + 1
+    return outcomes
+
+
+async def replay(history, days=None, signal_log=None):
+    import main
+    from core.analysis import initialize_predictor
+
+    # Never next to the live signal log in logs/
+    signal_log = signal_log or os.path.join(tempfile.mkdtemp(prefix="replay_"), "replay_signals.csv")
+
+    step = history.step_ms
+    start_ms, end_ms = history.span()
+    first_close = start_ms + WARMUP_CANDLES * step
+    if days:
+        first_close = max(first_close, end_ms - days * DAY_MS)
+    first_close -= first_close % step
+    closes = range(first_close, end_ms + 1, step)
+    if not closes:
+        raise ValueError("Not enough history to replay")
+
+    # Same pipeline, different surroundings: no network, no Telegram, no request budget
+    sent = []
+
+    async def record_message(message):
+        sent.append(message)
+
+    sim_clock = clock.set_clock(clock.SimulatedClock(first_close / 1000))
+    exchange_factory.exchange_override = lambda authenticated=True: ReplayExchange(history)
+    rate_limiter.enabled = False
+    main.send_telegram_message = record_message
+    main.SIGNAL_LOG_FILE = signal_log
+    if main.CONNECTION_TEST_SYMBOL not in history.candles:
+        main.CONNECTION_TEST_SYMBOL = history.symbols[0]
+    os.environ.setdefault("BINANCE_API_KEY", "replay")
+    os.environ.setdefault("BINANCE_API_SECRET", "replay")
+    if os.path.exists(signal_log):
+        os.remove(signal_log)
+    await initialize_predictor()
+
+    candles = 0
+    analyzed = 0
+    started = time.perf_counter()
+    try:
+        for i, close_ms in enumerate(closes):
+            sim_clock.set(close_ms / 1000 + CANDLE_CLOSE_GRACE_SECONDS)
+            # Coalesced results live for wall-clock seconds; in replay they are a candle old
+            market_data.request_flight.invalidate()
+            await main.scan_symbols()
+            candles += len(main.universe["symbols"])
+            analyzed += main.scheduler.last_cycle.get("processed", 0)
+            if (i + 1) % (DAY_MS // step) == 0:
+                logger.info(
+                    f"[Replay] {datetime.utcfromtimestamp(close_ms / 1000):%Y-%m-%d %H:%M} UTC, "
+                    f"{len(sent)} signals, {time.perf_counter() - started:.0f}s"
+                )
+    finally:
+        wall_seconds = time.perf_counter() - started
+        clock.set_clock(clock.WallClock())
+        exchange_factory.exchange_override = None
+        rate_limiter.enabled = True
+
+    simulated_seconds = (closes[-1] - closes[0] + step) / 1000
+    simulated_days = simulated_seconds / 86400
+    return {
+        "symbols": len(history.symbols),
+        "timeframe": history.timeframe,
+        "from": datetime.utcfromtimestamp(closes[0] / 1000).isoformat(),
+        "to": datetime.utcfromtimestamp(closes[-1] / 1000).isoformat(),
+        "cycles": len(closes),
+        "simulated_days": round(simulated_days, 2),
+        "candles": candles,
+        "analyzed": analyzed,
+        "signals": len(sent),
+        "signals_per_day": round(len(sent) / simulated_days, 2),
+        "outcomes": resolve_outcomes(history, signal_log),
+        "wall_seconds": round(wall_seconds, 1),
+        "candles_per_second": round(candles / wall_seconds, 1) if wall_seconds else 0.0,
+        "speedup": round(simulated_seconds / wall_seconds, 1) if wall_seconds else 0.0,
+        "signal_log": signal_log,
+        "memory": memory_monitor.summary()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored history through the scan pipeline on a simulated clock")
+    parser.add_argument("--data-dir", help="{SYMBOL}_{timeframe}.parquet/.csv files; synthetic candles if omitted")
+    parser.add_argument("--symbols", type=int, default=150, help="Synthetic symbols")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--signal-log", help="Signal CSV to write; a new temp directory if omitted")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--verbose", action="store_true", help="Keep the per-symbol pipeline logs")
+    args = parser.parse_args()
+
+    import main as bot
+    if not args.verbose:
+        logging.getLogger(ROOT_LOGGER).setLevel(logging.WARNING)
+        logger.setLevel(logging.INFO)
+
+    if args.data_dir:
+        history = load_history(args.data_dir, bot.SCAN_TIMEFRAME)
+    else:
+        history = synthetic_history(args.symbols, args.days, bot.SCAN_TIMEFRAME, args.seed)
+    if not history.candles:
+        raise SystemExit(f"No {bot.SCAN_TIMEFRAME} history found")
+    logger.info(f"[Replay] {len(history.symbols)} symbols of {bot.SCAN_TIMEFRAME} history loaded")
+
+    report = asyncio.run(replay(history, args.days, args.signal_log))
+    logger.info(f"[Replay] {json.dumps(report)}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import asyncio
+from utils.single_flight import SingleFlight
+
+
+def test_owner_cancelled_waiter_gets_result():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return "candles"
+
+        owner = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        result = await waiter
+        assert owner.cancelled()
+        return flight, calls, result
+
+    flight, calls, result = asyncio.run(scenario())
+    assert result == "candles"
+    assert len(calls) == 1
+    assert flight.stats["coalesced"] == 1
+    assert not flight.inflight
+    assert flight.results["key"] == "candles"
+
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise TimeoutError("exchange timeout")
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert all(isinstance(r, TimeoutError) for r in results)
+    assert flight.stats["errors"] == 1
+    assert "key" not in flight.results and not flight.inflight
@@ -0,0 +1,13 @@
+import json
+import subprocess
+import sys
+from utils.startup import DEFERRED_PACKAGES
+
+
+def test_import_main_defers_heavy_packages():
+    code = (
+        "import json, sys, main; "
+        f"print(json.dumps([p for p in {DEFERRED_PACKAGES!r} if p in sys.modules]))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
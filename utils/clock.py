@@ -0,0 +1,46 @@
+import time
+from datetime import datetime
+
+# Time source for the scan pipeline. Production reads the wall clock; the replay
+# mode (sim/replay.py) installs a SimulatedClock and moves it candle by candle.
+
+
+class WallClock:
+    def time(self):
+        return time.time()
+
+
+class SimulatedClock:
+    def __init__(self, start=0.0):
+        self.current = float(start)
+
+    def time(self):
+        return self.current
+
+    def set(self, timestamp):
+        self.current = float(timestamp)
+
+    def advance(self, seconds):
+        self.current += seconds
+
+
+_clock = WallClock()
+
+
+def set_clock(new_clock):
+    global _clock
+    _clock = new_clock
+    return new_clock
+
+
+def get_clock():
+    return _clock
+
+
+# Epoch seconds
+def now():
+    return _clock.time()
+
+
+def now_datetime(tz=None):
+    return datetime.fromtimestamp(_clock.time(), tz)
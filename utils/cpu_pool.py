@@ -0,0 +1,90 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from utils.logger import log
+
+# CPU_POOL=thread runs everything on threads (numpy, pandas and sklearn release the GIL
+# for most of their work); CPU_POOL=process sends self-contained stages to worker processes
+CPU_POOL = os.getenv("CPU_POOL", "thread")
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_MAX_INFLIGHT = int(os.getenv("CPU_MAX_INFLIGHT", str(2 * CPU_WORKERS)))
+
+
+# CPU-heavy stages of a scan, run off the event loop so it is free for I/O and the
+# health check. At most max_inflight jobs are submitted at once; further callers wait
+# here, which slows the scan loop down instead of queueing unbounded work.
+#
+# Stages that touch in-process state (the predictor, candle store, S/R trackers) always
+# run on the thread pool. Only calls made with portable=True, whose function and
+# arguments pickle and which return everything they change, may go to the process pool.
+class CpuPool:
+    def __init__(self, kind=CPU_POOL, workers=CPU_WORKERS, max_inflight=CPU_MAX_INFLIGHT):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown CPU_POOL {kind}; use thread or process")
+        self.kind = kind
+        self.workers = workers
+        self.max_inflight = max_inflight
+        self.semaphore = asyncio.Semaphore(max_inflight)
+        self.threads = None
+        self.processes = None
+        self.inflight = 0
+        self.waiting = 0
+        self.stats = {"jobs": 0, "errors": 0, "waited_seconds": 0.0, "max_wait_seconds": 0.0, "busy_seconds": 0.0}
+
+    def _executor(self, portable):
+        if portable and self.kind == "process":
+            if self.processes is None:
+                # Spawned, not forked: polars' and sklearn's thread pools do not survive a fork
+                self.processes = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self.processes
+        if self.threads is None:
+            self.threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="cpu")
+        return self.threads
+
+    async def run(self, fn, *args, portable=False, **kwargs):
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        self.stats["waited_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+        self.inflight += 1
+        try:
+            call = functools.partial(fn, *args, **kwargs)
+            started = time.perf_counter()
+            return await asyncio.get_running_loop().run_in_executor(self._executor(portable), call)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        finally:
+            self.stats["busy_seconds"] += time.perf_counter() - started
+            self.stats["jobs"] += 1
+            self.inflight -= 1
+            self.semaphore.release()
+
+    def snapshot(self):
+        return dict(
+            self.stats,
+            kind=self.kind,
+            workers=self.workers,
+            inflight=self.inflight,
+            waiting=self.waiting,
+            waited_seconds=round(self.stats["waited_seconds"], 3),
+            busy_seconds=round(self.stats["busy_seconds"], 3)
+        )
+
+    def shutdown(self):
+        for executor in (self.threads, self.processes):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.threads = self.processes = None
+        log("CPU pool shut down after %d jobs", self.stats['jobs'])
+
+
+cpu_pool = CpuPool()
@@ -1,106 +1,91 @@
-import pandas as pd
+import warnings
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from utils.logger import log
 
-def calculate_fibonacci_levels(df):
-    try:
-        if len(df) < 2 or df['high'].std() <= 0 or df['low'].std() <= 0:
-            log("Insufficient data for Fibonacci levels, returning dummy DataFrame", level='WARNING')
-            # Return dummy DataFrame to avoid NoneType error
-            dummy_df = df.copy()
-            fib_levels = {
-                'fib_0.0': 0.0, 'fib_0.236': 0.0, 'fib_0.382': 0.0, 'fib_0.5': 0.0,
-                'fib_0.618': 0.0, 'fib_0.786': 0.0, 'fib_1.0': 0.0,
-                'fib_-0.382': 0.0, 'fib_-0.618': 0.0,
-                '0.0': 0.0, '0.236': 0.0, '0.382': 0.0, '0.5': 0.0,
-                '0.618': 0.0, '0.786': 0.0, '1.0': 0.0,
-                '-0.382': 0.0, '-0.618': 0.0
-            }
-            for level, value in fib_levels.items():
-                dummy_df[level] = value
-            log(f"Dummy Fibonacci levels added: {list(fib_levels.keys())}", level='INFO')
-            return dummy_df
+FIB_RATIOS = (0.0, 0.236, 0.382, 0.5, 0.618, 0.786, 1.0, -0.382, -0.618)
+FIB_RATIO_ARRAY = np.array(FIB_RATIOS, dtype="float64")
+FIB_NAMES = tuple(f"fib_{ratio}" for ratio in FIB_RATIOS)
+_RATIO_INDEX = {ratio: i for i, ratio in enumerate(FIB_RATIOS)}
+DEFAULT_WINDOW = 100
+
+
+# Levels are low + ratio * (high - low), so 0.0 is the swing low and 1.0 the swing high
+class FibonacciLevels:
+    __slots__ = ("low", "high", "levels", "valid")
+
+    def __init__(self, low, high):
+        self.valid = bool(np.isfinite(low) and np.isfinite(high) and high > low)
+        if self.valid:
+            self.low = float(low)
+            self.high = float(high)
+            self.levels = tuple((low + FIB_RATIO_ARRAY * (high - low)).tolist())
+        else:
+            self.low = self.high = 0.0
+            self.levels = (0.0,) * len(FIB_RATIOS)
+
+    def __getitem__(self, ratio):
+        return self.levels[_RATIO_INDEX[ratio]]
+
+    def nearest(self, price):
+        if not self.valid:
+            return None
+        return min(self.levels, key=lambda level: abs(level - price))
 
-        df = df.copy()
-        df = df.astype({'high': 'float32', 'low': 'float32', 'close': 'float32'})
-        
-        # Ensure 'timestamp' is in datetime format
-        if 'timestamp' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['timestamp']):
-            df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce')
-        
-        # Get the max high and min low over the last 100 rows (or all if less)
-        window = min(len(df), 100)
-        max_high = df['high'].tail(window).max()
-        min_low = df['low'].tail(window).min()
-        
-        if pd.isna(max_high) or pd.isna(min_low) or max_high <= min_low:
-            log("Invalid high/low for Fibonacci levels, returning dummy DataFrame", level='WARNING')
-            # Return dummy DataFrame
-            dummy_df = df.copy()
-            fib_levels = {
-                'fib_0.0': 0.0, 'fib_0.236': 0.0, 'fib_0.382': 0.0, 'fib_0.5': 0.0,
-                'fib_0.618': 0.0, 'fib_0.786': 0.0, 'fib_1.0': 0.0,
-                'fib_-0.382': 0.0, 'fib_-0.618': 0.0,
-                '0.0': 0.0, '0.236': 0.0, '0.382': 0.0, '0.5': 0.0,
-                '0.618': 0.0, '0.786': 0.0, '1.0': 0.0,
-                '-0.382': 0.0, '-0.618': 0.0
-            }
-            for level, value in fib_levels.items():
-                dummy_df[level] = value
-            log(f"Dummy Fibonacci levels added: {list(fib_levels.keys())}", level='INFO')
-            return dummy_df
+    def to_dict(self):
+        return dict(zip(FIB_NAMES, self.levels))
 
-        # Calculate Fibonacci levels
-        diff = max_high - min_low
-        fib_levels = {
-            'fib_0.0': min_low,
-            'fib_0.236': min_low + 0.236 * diff,
-            'fib_0.382': min_low + 0.382 * diff,
-            'fib_0.5': min_low + 0.5 * diff,
-            'fib_0.618': min_low + 0.618 * diff,
-            'fib_0.786': min_low + 0.786 * diff,
-            'fib_1.0': max_high,
-            'fib_-0.382': min_low - 0.382 * diff,
-            'fib_-0.618': min_low - 0.618 * diff,
-            '0.0': min_low,
-            '0.236': min_low + 0.236 * diff,
-            '0.382': min_low + 0.382 * diff,
-            '0.5': min_low + 0.5 * diff,
-            '0.618': min_low + 0.618 * diff,
-            '0.786': min_low + 0.786 * diff,
-            '1.0': max_high,
-            '-0.382': min_low - 0.382 * diff,
-            '-0.618': min_low - 0.618 * diff
-        }
+    def __repr__(self):
+        return f"FibonacciLevels(low={self.low}, high={self.high}, valid={self.valid})"
 
-        # Add Fibonacci levels to DataFrame
-        for level, value in fib_levels.items():
-            df[level] = value
 
-        if df.isna().any().any() or df.isin([np.inf, -np.inf]).any().any():
-            log("NaN or Inf values in Fibonacci levels, returning dummy DataFrame", level='WARNING')
-            # Return dummy DataFrame
-            dummy_df = df.copy()
-            for level, value in fib_levels.items():
-                dummy_df[level] = 0.0
-            log(f"Dummy Fibonacci levels added: {list(fib_levels.keys())}", level='INFO')
-            return dummy_df
+def calculate_fibonacci_levels(df, window=DEFAULT_WINDOW):
+    try:
+        if len(df) < 2:
+            log("Insufficient data for Fibonacci levels", level='WARNING')
+            return FibonacciLevels(np.nan, np.nan)
+        # Only the swing window is read; the frame is never copied or widened
+        highs = df['high'].to_numpy()[-window:]
+        lows = df['low'].to_numpy()[-window:]
+        levels = FibonacciLevels(np.nanmin(lows), np.nanmax(highs))
+        if not levels.valid:
+            log("Invalid high/low for Fibonacci levels", level='WARNING')
+        return levels
+    except Exception as e:
+        log("Error in calculate_fibonacci_levels: %s", e, level='ERROR')
+        return FibonacciLevels(np.nan, np.nan)
+
 
-        log(f"Fibonacci levels calculated for {len(df)} rows: {list(fib_levels.keys())}", level='INFO')
-        return df
+# Levels for many symbols at once from stacked (symbols x time) high/low matrices.
+# Returns (symbols x windows x levels) plus a validity mask; invalid windows are zero.
+def rolling_fibonacci_levels(highs, lows, window=DEFAULT_WINDOW):
+    try:
+        highs = np.asarray(highs, dtype="float64")
+        lows = np.asarray(lows, dtype="float64")
+        if highs.ndim == 1:
+            highs, lows = highs[None, :], lows[None, :]
+        window = min(window, highs.shape[1])
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN windows become invalid below
+            swing_high = np.nanmax(sliding_window_view(highs, window, axis=1), axis=-1)
+            swing_low = np.nanmin(sliding_window_view(lows, window, axis=1), axis=-1)
+        diff = swing_high - swing_low
+        valid = np.isfinite(diff) & (diff > 0)
+        levels = swing_low[..., None] + diff[..., None] * FIB_RATIO_ARRAY
+        levels[~valid] = 0.0
+        return levels, valid
     except Exception as e:
-        log(f"Error in calculate_fibonacci_levels: {e}", level='ERROR')
-        # Return dummy DataFrame
-        dummy_df = df.copy()
-        fib_levels = {
-            'fib_0.0': 0.0, 'fib_0.236': 0.0, 'fib_0.382': 0.0, 'fib_0.5': 0.0,
-            'fib_0.618': 0.0, 'fib_0.786': 0.0, 'fib_1.0': 0.0,
-            'fib_-0.382': 0.0, 'fib_-0.618': 0.0,
-            '0.0': 0.0, '0.236': 0.0, '0.382': 0.0, '0.5': 0.0,
-            '0.618': 0.0, '0.786': 0.0, '1.0': 0.0,
-            '-0.382': 0.0, '-0.618': 0.0
-        }
-        for level, value in fib_levels.items():
-            dummy_df[level] = value
-        log(f"Dummy Fibonacci levels added due to error: {list(fib_levels.keys())}", level='INFO')
-        return dummy_df
+        log("Error in rolling_fibonacci_levels: %s", e, level='ERROR')
+        return None, None
+
+
+# Only the latest window per symbol: (symbols x levels)
+def latest_fibonacci_levels(highs, lows, window=DEFAULT_WINDOW):
+    highs = np.asarray(highs, dtype="float64")
+    lows = np.asarray(lows, dtype="float64")
+    if highs.ndim == 1:
+        highs, lows = highs[None, :], lows[None, :]
+    levels, valid = rolling_fibonacci_levels(highs[:, -window:], lows[:, -window:], window)
+    if levels is None:
+        return None, None
+    return levels[:, -1], valid[:, -1]
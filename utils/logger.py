@@ -1,102 +1,253 @@
-import os
-import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
-import pandas as pd
-import pytz
-import shutil
-
-LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
-log_formatter = logging.Formatter(
-    fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
-
-log_file = os.path.join(LOG_DIR, "bot.log")
-file_handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3)
-file_handler.setFormatter(log_formatter)
-file_handler.setLevel(logging.INFO)
-
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(log_formatter)
-console_handler.setLevel(logging.INFO)
-
-logger = logging.getLogger("crypto-signal-bot")
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
-logger.propagate = False
-
-def log(message, level='INFO'):
-    if level == 'INFO':
-        logger.info(message)
-    elif level == 'ERROR':
-        logger.error(message)
-    elif level == 'WARNING':
-        logger.warning(message)
-
-def log_signal_to_csv(signal):
-    try:
-        csv_path = "logs/signals_log.csv"
-        timestamp = datetime.fromtimestamp(signal.get("timestamp", 0) / 1000).strftime('%Y-%m-%d %H:%M:%S')
-        data = pd.DataFrame({
-            "symbol": [signal.get("symbol", "")],
-            "price": [signal.get("price", 0)],
-            "direction": [signal.get("direction", "")],
-            "tp1": [signal.get("tp1", 0)],
-            "tp2": [signal.get("tp2", 0)],
-            "tp3": [signal.get("tp3", 0)],
-            "sl": [signal.get("sl", 0)],
-            "confidence": [signal.get("confidence", 0)],
-            "trade_type": [signal.get("trade_type", "")],
-            "timestamp": [timestamp],
-            "tp1_possibility": [signal.get("tp1_possibility", 0)],
-            "tp2_possibility": [signal.get("tp2_possibility", 0)],
-            "tp3_possibility": [signal.get("tp3_possibility", 0)],
-            "indicators_used": [signal.get("indicators_used", "")],
-            "backtest_result": [signal.get("backtest_result", 0)],
-            "volume": [signal.get("volume", 0)],
-            "status": ["pending"]
-        })
-
-        if os.path.exists(csv_path):
-            old_df = pd.read_csv(csv_path)
-            if not data.empty:
-                data = pd.concat([old_df, data], ignore_index=True)
-
-        if not data.empty:
-            data.to_csv(csv_path, index=False)
-            log(f"Signal logged to CSV for {signal.get('symbol', '')}")
-        else:
-            log("No valid data to log to CSV", level='ERROR')
-
-        # Archive old logs weekly
-        archive_old_logs(csv_path)
-
-    except Exception as e:
-        log(f"Error logging signal to CSV: {e}", level='ERROR')
-
-def archive_old_logs(csv_path):
-    try:
-        if not os.path.exists(csv_path):
-            return
-        df = pd.read_csv(csv_path)
-        if df.empty:
-            return
-        
-        current_date = datetime.now(pytz.timezone('Asia/Karachi'))
-        week_ago = current_date - pd.Timedelta(days=7)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        old_data = df[df['timestamp'].dt.date < week_ago.date()]
-        
-        if not old_data.empty:
-            archive_path = f"logs/archive/signals_log_{week_ago.strftime('%Y%m%d')}.csv"
-            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
-            old_data.to_csv(archive_path, index=False)
-            new_data = df[df['timestamp'].dt.date >= week_ago.date()]
-            new_data.to_csv(csv_path, index=False)
-            log(f"Archived {len(old_data)} old signals to {archive_path}", level='INFO')
-    except Exception as e:
-        log(f"Error archiving logs: {e}", level='ERROR')
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from datetime import datetime
+import pytz
+import shutil
+
+LOG_DIR = "logs"
+os.makedirs(LOG_DIR, exist_ok=True)
+
+ROOT_LOGGER = "crypto-signal-bot"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-module overrides, e.g. LOG_LEVELS="core.analysis=WARNING,data.market_data=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_JSON = os.getenv("LOG_JSON", "0") == "1"  # One JSON object per line instead of text
+# The same message (per logger, level and symbol) at most this often per window;
+# the rest are counted and the count is reported with the next one let through
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "10"))
+LOG_RATE_WINDOW_SECONDS = 60
+STRUCTURED_FIELDS = ("symbol", "stage", "duration_ms")
+LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING, "ERROR": logging.ERROR}
+
+
+# Text lines with the structured fields appended as key=value
+class FieldFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = " ".join(f"{name}={getattr(record, name)}" for name in STRUCTURED_FIELDS if getattr(record, name, None) is not None)
+        return f"{line} | {fields}" if fields else line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for name in STRUCTURED_FIELDS + ("suppressed",):
+            if getattr(record, name, None) is not None:
+                entry[name] = getattr(record, name)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+# Per-key token window for repetitive per-symbol messages. Keys are the unformatted
+# message plus the symbol, so lazily formatted calls (log("... %s", value, symbol=s))
+# collapse into one key per symbol. Errors and messages without a symbol always pass.
+class RateLimitFilter(logging.Filter):
+    def __init__(self, limit=LOG_RATE_LIMIT, window=LOG_RATE_WINDOW_SECONDS):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self.counts = {}  # key -> [window start, emitted, suppressed]
+
+    def filter(self, record):
+        symbol = getattr(record, "symbol", None)
+        if not self.limit or record.levelno >= logging.ERROR or symbol is None:
+            return True
+        key = (record.name, record.levelno, str(record.msg), symbol)
+        now = time.monotonic()
+        entry = self.counts.get(key)
+        if entry is None or now - entry[0] >= self.window:
+            if len(self.counts) > 10_000:
+                self.counts.clear()
+            suppressed = entry[2] if entry else 0
+            self.counts[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+                record.msg = f"{record.msg} (+{suppressed} similar suppressed)"
+            return True
+        if entry[1] < self.limit:
+            entry[1] += 1
+            return True
+        entry[2] += 1
+        return False
+
+
+# Records are enqueued as they are; the listener thread formats and writes them
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+log_formatter = (JsonFormatter if LOG_JSON else FieldFormatter)(
+    fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S"
+)
+
+log_file = os.path.join(LOG_DIR, "bot.log")
+file_handler = RotatingFileHandler(log_file, maxBytes=5 * 1024 * 1024, backupCount=3)
+file_handler.setFormatter(log_formatter)
+
+console_handler = logging.StreamHandler()
+console_handler.setFormatter(log_formatter)
+
+log_queue = queue.SimpleQueue()
+queue_handler = _DeferredQueueHandler(log_queue)
+queue_handler.addFilter(RateLimitFilter())
+listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+logger = logging.getLogger(ROOT_LOGGER)
+logger.setLevel(LEVELS.get(LOG_LEVEL.upper(), logging.INFO))
+logger.addHandler(queue_handler)
+logger.propagate = False
+
+
+# Worker processes (scanner shards) must not write or rotate bot.log themselves. A worker
+# calls forward_logs with a multiprocessing queue; the parent writes what arrives on it
+# with its own handlers, started with receive_logs.
+def forward_logs(mp_queue):
+    atexit.unregister(listener.stop)
+    listener.stop()
+    file_handler.close()
+    handler = QueueHandler(mp_queue)  # Formats the message so the record pickles
+    handler.addFilter(RateLimitFilter())
+    logger.removeHandler(queue_handler)
+    logger.addHandler(handler)
+
+
+def receive_logs(mp_queue):
+    remote = QueueListener(mp_queue, file_handler, console_handler, respect_handler_level=True)
+    remote.start()
+    return remote
+
+
+_loggers = {}
+
+
+# Child of the bot logger for a module, e.g. crypto-signal-bot.core.analysis
+def get_logger(name):
+    child = _loggers.get(name)
+    if child is None:
+        child = _loggers[name] = logger.getChild(name) if name and name != "__main__" else logger
+    return child
+
+
+# Per-module levels from a "module=LEVEL,..." spec
+def set_levels(spec):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        get_logger(name.strip()).setLevel(LEVELS.get(level.strip().upper(), logging.INFO))
+
+
+set_levels(LOG_LEVELS)
+
+
+# log("[%s] Fetched %d rows", symbol, len(rows), level="DEBUG", symbol=symbol, stage="fetch")
+# Arguments are only formatted, on the listener thread, if the calling module's level
+# lets the record through. Keyword fields become structured fields.
+def log(message, *args, level='INFO', exc_info=None, **fields):
+    child = get_logger(sys._getframe(1).f_globals.get("__name__", ""))
+    levelno = LEVELS.get(level, logging.INFO)
+    if child.isEnabledFor(levelno):
+        child._log(levelno, message, args, exc_info=exc_info, extra=fields or None)
+
+
+# Logs how long a block took, e.g. `with timed("prefilter", symbols=150): ...`
+class timed:
+    def __init__(self, stage, level='INFO', symbol=None, **fields):
+        self.stage = stage
+        self.level = level
+        self.symbol = symbol
+        self.fields = fields
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        details = " ".join(f"{key}={value}" for key, value in self.fields.items())
+        child = get_logger(sys._getframe(1).f_globals.get("__name__", ""))
+        levelno = LEVELS.get(self.level, logging.INFO)
+        if child.isEnabledFor(levelno):
+            child._log(levelno, "%s finished in %.1f ms %s", (self.stage, duration_ms, details),
+                       extra={"stage": self.stage, "duration_ms": duration_ms, "symbol": self.symbol})
+        return False
+
+# Column layout of logs/signals_log.csv, as the daily report and dashboard read it
+SIGNALS_CSV_COLUMNS = (
+    "timestamp", "symbol", "direction", "price", "tp1", "tp2", "tp3", "sl", "volume", "confidence",
+    "tp1_possibility", "tp2_possibility", "tp3_possibility", "timeframe", "status", "indicators_used",
+    "backtest_result", "trade_type"
+)
+
+def log_signal_to_csv(signal, volume=0, indicators_used="", backtest_result=0):
+    from core.signal import append_rows, as_signal
+    try:
+        csv_path = "logs/signals_log.csv"
+        signal = as_signal(signal)
+        row = {
+            "timestamp": signal.time().strftime('%Y-%m-%d %H:%M:%S'),
+            "symbol": signal.symbol,
+            "direction": signal.direction,
+            "price": signal.entry,
+            "tp1": signal.tp1,
+            "tp2": signal.tp2,
+            "tp3": signal.tp3,
+            "sl": signal.sl,
+            "volume": volume,
+            "confidence": signal.confidence,
+            "tp1_possibility": signal.tp1_possibility,
+            "tp2_possibility": signal.tp2_possibility,
+            "tp3_possibility": signal.tp3_possibility,
+            "timeframe": signal.timeframe,
+            "status": "pending",
+            "indicators_used": indicators_used,
+            "backtest_result": backtest_result,
+            "trade_type": signal.trade_type
+        }
+        append_rows(csv_path, SIGNALS_CSV_COLUMNS, [row])
+        log("Signal logged to CSV for %s", signal.symbol)
+
+        # Archive old logs weekly
+        archive_old_logs(csv_path)
+
+    except Exception as e:
+        log("Error logging signal to CSV: %s", e, level='ERROR')
+
+def archive_old_logs(csv_path):
+    import pandas as pd  # Deferred: every process imports the logger
+
+    try:
+        if not os.path.exists(csv_path):
+            return
+        df = pd.read_csv(csv_path)
+        if df.empty:
+            return
+        
+        current_date = datetime.now(pytz.timezone('Asia/Karachi'))
+        week_ago = current_date - pd.Timedelta(days=7)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        old_data = df[df['timestamp'].dt.date < week_ago.date()]
+        
+        if not old_data.empty:
+            archive_path = f"logs/archive/signals_log_{week_ago.strftime('%Y%m%d')}.csv"
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            old_data.to_csv(archive_path, index=False)
+            new_data = df[df['timestamp'].dt.date >= week_ago.date()]
+            new_data.to_csv(csv_path, index=False)
+            log("Archived %d old signals to %s", len(old_data), archive_path, level='INFO')
+    except Exception as e:
+        log("Error archiving logs: %s", e, level='ERROR')
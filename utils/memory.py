@@ -0,0 +1,194 @@
+import gc
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import psutil
+from utils.logger import log
+
+MEMORY_LIMIT_MB = float(os.getenv("MEMORY_LIMIT_MB", "512"))  # Instance size
+MEMORY_PRESSURE_FRACTION = 0.8  # Full collection only above this share of the limit
+MEMORY_TRACE = os.getenv("MEMORY_TRACE", "0") == "1"  # tracemalloc costs ~2x on allocations; off by default
+TRACE_FRAMES = 5
+HISTORY_CYCLES = 96  # One day of 15m cycles
+LEAK_BASELINE_CYCLE = 3  # Cycles to warm up caches and buffers before the leak baseline
+LEAK_MIN_CYCLES = 8
+LEAK_MIN_GROWTH_MB = 20.0
+LEAK_MIN_SLOPE_MB = 0.5  # RSS growth per cycle
+
+
+# Reusable numpy arrays for the per-cycle working set. Arrays are pooled by dtype and
+# trailing shape with the leading (symbols) dimension rounded up, so a cycle with a few
+# more or fewer survivors reuses last cycle's array. Borrowed arrays are not cleared.
+class BufferPool:
+    def __init__(self, row_block=64, max_per_key=4):
+        self.row_block = row_block
+        self.max_per_key = max_per_key
+        self.free = {}  # (rows, trailing shape, dtype) -> [arrays]
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _key(self, shape, dtype):
+        rows = -(-max(shape[0], 1) // self.row_block) * self.row_block
+        return rows, tuple(shape[1:]), np.dtype(dtype).str
+
+    def acquire(self, shape, dtype=np.float64):
+        key = self._key(shape, dtype)
+        with self.lock:
+            arrays = self.free.get(key)
+            if arrays:
+                self.stats["hits"] += 1
+                return arrays.pop()
+            self.stats["misses"] += 1
+        return np.empty((key[0],) + key[1], dtype=dtype)
+
+    def release(self, array):
+        key = (array.shape[0], array.shape[1:], array.dtype.str)
+        with self.lock:
+            arrays = self.free.setdefault(key, [])
+            if len(arrays) < self.max_per_key:
+                arrays.append(array)
+
+    # Yields a view of exactly `shape`; do not keep references to it past the block
+    @contextmanager
+    def borrow(self, shape, dtype=np.float64):
+        array = self.acquire(shape, dtype)
+        try:
+            yield array[:shape[0]]
+        finally:
+            self.release(array)
+
+    def nbytes(self):
+        with self.lock:
+            return sum(array.nbytes for arrays in self.free.values() for array in arrays)
+
+    def clear(self):
+        with self.lock:
+            self.free.clear()
+
+
+buffer_pool = BufferPool()
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 1e6
+
+
+# Per-cycle memory accounting. At the end of each scan cycle it records RSS and
+# collector counts, runs a full collection only under memory pressure, and (with
+# MEMORY_TRACE=1) keeps a tracemalloc baseline to diff later cycles against.
+class MemoryMonitor:
+    def __init__(self, limit_mb=MEMORY_LIMIT_MB, trace=MEMORY_TRACE):
+        self.limit_mb = limit_mb
+        self.pressure_mb = limit_mb * MEMORY_PRESSURE_FRACTION
+        self.cycles = deque(maxlen=HISTORY_CYCLES)
+        self.cycle = 0
+        self.baseline = None  # tracemalloc snapshot after warm-up
+        self.stats = {"collections": 0, "freed_objects": 0, "collect_seconds": 0.0}
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+
+    # Long-lived startup objects (model, modules) leave the collector's generations,
+    # so the automatic collections that still happen have less to walk
+    def freeze_startup_objects(self):
+        gc.collect()
+        gc.freeze()
+        log("[Memory] Froze %d startup objects, RSS %.0f MB", gc.get_freeze_count(), rss_mb())
+
+    def end_cycle(self):
+        self.cycle += 1
+        rss = rss_mb()
+        collected = None
+        if rss > self.pressure_mb:
+            started = time.perf_counter()
+            collected = gc.collect()
+            elapsed = time.perf_counter() - started
+            self.stats["collections"] += 1
+            self.stats["freed_objects"] += collected
+            self.stats["collect_seconds"] += elapsed
+            rss_after = rss_mb()
+            log(
+                "[Memory] RSS %.0f MB over %.0f MB pressure mark, collected %d objects in %.0f ms, now %.0f MB",
+                rss, self.pressure_mb, collected, elapsed * 1000, rss_after, level='WARNING', stage="memory"
+            )
+            rss = rss_after
+        entry = {"cycle": self.cycle, "time": time.time(), "rss_mb": round(rss, 1), "gc_counts": gc.get_count(), "collected": collected}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            entry.update(traced_mb=round(current / 1e6, 1), traced_peak_mb=round(peak / 1e6, 1))
+            tracemalloc.reset_peak()
+            if self.cycle == LEAK_BASELINE_CYCLE:
+                self.baseline = self._snapshot()
+        self.cycles.append(entry)
+        return entry
+
+    # RSS slope over the recorded cycles (after warm-up); a steady climb is reported as a suspected leak
+    def leak_check(self):
+        points = [entry for entry in self.cycles if entry["cycle"] >= LEAK_BASELINE_CYCLE]
+        if len(points) < LEAK_MIN_CYCLES:
+            return {"suspected": False, "cycles": len(points), "reason": "not enough cycles"}
+        x = np.array([entry["cycle"] for entry in points], dtype=float)
+        y = np.array([entry["rss_mb"] for entry in points], dtype=float)
+        slope = float(np.polyfit(x, y, 1)[0])
+        growth = float(y[-1] - y[0])
+        return {
+            "suspected": slope > LEAK_MIN_SLOPE_MB and growth > LEAK_MIN_GROWTH_MB,
+            "cycles": len(points),
+            "slope_mb_per_cycle": round(slope, 3),
+            "growth_mb": round(growth, 1)
+        }
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>")
+        ))
+
+    # tracemalloc's biggest allocation sites now, and the biggest growth since the baseline
+    def allocators(self, top=15):
+        if not tracemalloc.is_tracing():
+            return {"tracing": False, "hint": "start with MEMORY_TRACE=1"}
+        snapshot = self._snapshot()
+        report = {
+            "tracing": True,
+            "top": [
+                {"where": str(stat.traceback[0]), "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ]
+        }
+        if self.baseline is not None:
+            report["growth_since_cycle"] = LEAK_BASELINE_CYCLE
+            report["growth"] = [
+                {"where": str(stat.traceback[0]), "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+                for stat in snapshot.compare_to(self.baseline, "lineno")[:top]
+                if stat.size_diff > 0
+            ]
+        return report
+
+    def report(self, top=15):
+        return {
+            "rss_mb": round(rss_mb(), 1),
+            "limit_mb": self.limit_mb,
+            "pressure_mb": self.pressure_mb,
+            "gc": dict(self.stats, counts=gc.get_count(), thresholds=gc.get_threshold(), frozen=gc.get_freeze_count()),
+            "buffer_pool": dict(buffer_pool.stats, pooled_mb=round(buffer_pool.nbytes() / 1e6, 2)),
+            "cycles": list(self.cycles),
+            "leak": self.leak_check(),
+            "allocators": self.allocators(top)
+        }
+
+    def summary(self):
+        rss = [entry["rss_mb"] for entry in self.cycles]
+        return {
+            "rss_start_mb": rss[0] if rss else None,
+            "rss_end_mb": rss[-1] if rss else None,
+            "rss_max_mb": max(rss) if rss else None,
+            "collections": self.stats["collections"],
+            "leak": self.leak_check()
+        }
+
+
+memory_monitor = MemoryMonitor()
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from utils.logger import log
+
+# Binance spot REST allows this much request weight per IP per minute
+WEIGHT_LIMIT_PER_MINUTE = int(os.getenv("BINANCE_WEIGHT_LIMIT", "6000"))
+WEIGHT_BUDGET_FRACTION = 0.9  # Headroom for requests we cannot see (other processes, retries)
+USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+DEFAULT_BAN_SECONDS = 60  # When a 429/418 carries no Retry-After
+
+# Request weight per ccxt method (Binance spot)
+ENDPOINT_WEIGHTS = {
+    "fetch_ohlcv": 2,
+    "fetch_ticker": 2,
+    "fetch_tickers": 80,  # All symbols
+    "load_markets": 20,
+    "fetch_time": 1
+}
+
+
+def order_book_weight(limit):
+    if limit is None or limit <= 100:
+        return 5
+    if limit <= 500:
+        return 25
+    if limit <= 1000:
+        return 50
+    return 250
+
+
+def request_weight(method, args=(), kwargs=None):
+    kwargs = kwargs or {}
+    if method == "fetch_order_book":
+        limit = kwargs.get("limit", args[1] if len(args) > 1 else None)
+        return order_book_weight(limit)
+    if method == "fetch_tickers" and (kwargs.get("symbols") or (args and args[0])):
+        symbols = kwargs.get("symbols") or args[0]
+        return min(2 * len(symbols), 80)
+    return ENDPOINT_WEIGHTS.get(method, 1)
+
+
+# Token bucket over request weight, shared by every exchange client in the process.
+# It refills continuously at the per-minute budget and is pulled down to what the
+# exchange reports as used, so it never runs ahead of the server's own count.
+class WeightRateLimiter:
+    def __init__(self, limit_per_minute=WEIGHT_LIMIT_PER_MINUTE, budget_fraction=WEIGHT_BUDGET_FRACTION):
+        self.limit_per_minute = limit_per_minute
+        self.budget_fraction = budget_fraction
+        self.share = 1.0  # Fraction of the IP budget this process may use
+        self.enabled = True  # Off when replaying history, which has no request budget
+        self.capacity = limit_per_minute * budget_fraction
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+        self.stats = {"requests": 0, "weight": 0, "waited_seconds": 0.0, "bans": 0, "server_used_weight": 0}
+
+    # Split the IP budget when several processes call the exchange (sharded mode)
+    def set_share(self, share):
+        self.share = max(min(share, 1.0), 0.01)
+        self.capacity = self.limit_per_minute * self.budget_fraction * self.share
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.capacity / 60.0)
+
+    async def acquire(self, weight=1):
+        weight = min(weight, self.capacity)
+        if not self.enabled:
+            self.stats["requests"] += 1
+            self.stats["weight"] += weight
+            return
+        async with self.lock:
+            waited = 0.0
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    delay = self.blocked_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        break
+                    delay = (weight - self.tokens) * 60.0 / self.capacity
+                waited += delay
+                await asyncio.sleep(delay)
+            self.stats["requests"] += 1
+            self.stats["weight"] += weight
+            self.stats["waited_seconds"] += waited
+
+    def update_from_headers(self, headers):
+        if not headers:
+            return
+        used = None
+        for key, value in headers.items():
+            if key.lower() == USED_WEIGHT_HEADER:
+                used = value
+                break
+        if used is None:
+            return
+        try:
+            used = int(used)
+        except (TypeError, ValueError):
+            return
+        self.stats["server_used_weight"] = used
+        # The server's count covers every process on this IP; only ever correct downwards
+        remaining = self.limit_per_minute * self.budget_fraction - used
+        self._refill(time.monotonic())
+        if remaining < self.tokens:
+            self.tokens = remaining
+
+    # 429 means back off now, 418 means we are already banned; both stop every caller
+    def penalize(self, headers=None):
+        retry_after = DEFAULT_BAN_SECONDS
+        for key, value in (headers or {}).items():
+            if key.lower() == "retry-after":
+                try:
+                    retry_after = float(value)
+                except (TypeError, ValueError):
+                    pass
+                break
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.tokens = 0.0
+        self.stats["bans"] += 1
+        log("[RateLimiter] Exchange rate limit hit, pausing all requests for %.0fs", retry_after, level='WARNING')
+
+
+# Process-wide limiter every fetch site goes through
+rate_limiter = WeightRateLimiter()
@@ -0,0 +1,55 @@
+import asyncio
+import cachetools
+
+RESULT_TTL_SECONDS = 2.0
+RESULT_CACHE_SIZE = 2048
+
+
+# Concurrent calls with the same key share one in-flight request, and its result is
+# served to later callers for a short TTL. Results are shared objects: do not mutate them.
+class SingleFlight:
+    def __init__(self, ttl=RESULT_TTL_SECONDS, maxsize=RESULT_CACHE_SIZE):
+        self.inflight = {}  # key -> Task of the running call
+        self.results = cachetools.TTLCache(maxsize=maxsize, ttl=ttl)
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key, fn):
+        if key in self.results:
+            self.stats["hits"] += 1
+            return self.results[key]
+        task = self.inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["misses"] += 1
+            # The call runs in its own task: a caller cancelled while waiting (a scan timeout)
+            # leaves it running for everyone else coalesced onto it
+            task = asyncio.create_task(self._run(key, fn))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task)
+
+    async def _run(self, key, fn):
+        try:
+            result = await fn()
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        self.results[key] = result
+        return result
+
+    def _finished(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # Nobody may be waiting; don't warn about an unretrieved exception
+        task.cancelled() or task.exception()
+
+    def invalidate(self, key=None):
+        if key is None:
+            self.results.clear()
+        else:
+            self.results.pop(key, None)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return (self.stats["hits"] + self.stats["coalesced"]) / total if total else 0.0
@@ -0,0 +1,102 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import psutil
+from utils.logger import log
+
+# Cold start accounting. Times are seconds since the process was created, so they
+# include interpreter startup and imports, which is what a container restart costs.
+#   python -m utils.startup --module main --budget 3.0   # import-time report, fails on eager heavy imports
+
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "3.0"))
+PROCESS_STARTED = psutil.Process().create_time()
+STAGES = ("imports", "model_loaded", "markets_cached", "first_cycle_started")
+# Imported inside the functions that use them; `import main` must not load any of these
+DEFERRED_PACKAGES = ("pandas", "polars", "ccxt", "ta", "sklearn", "telegram", "httpx")
+
+
+# Warm-up stages as they complete; the service is ready once all of them have
+class Readiness:
+    def __init__(self, stages=STAGES):
+        self.stages = stages
+        self.marks = {}  # stage -> seconds since process start
+        self.errors = {}  # stage -> last error, while it has not completed
+
+    def mark(self, stage):
+        if stage in self.marks:
+            return
+        self.marks[stage] = round(time.time() - PROCESS_STARTED, 3)
+        self.errors.pop(stage, None)
+        log("[Startup] %s at %.2fs", stage, self.marks[stage])
+        if stage == "imports" and self.marks[stage] > IMPORT_BUDGET_SECONDS:
+            log(
+                "[Startup] Imports took %.2fs, over the %.1fs budget; see python -m utils.startup",
+                self.marks[stage], IMPORT_BUDGET_SECONDS, level='WARNING'
+            )
+
+    def fail(self, stage, error):
+        self.errors[stage] = str(error)
+
+    def ready(self):
+        return all(stage in self.marks for stage in self.stages)
+
+    def snapshot(self):
+        return {
+            "ready": self.ready(),
+            "uptime_seconds": round(time.time() - PROCESS_STARTED, 1),
+            "stages": {stage: self.marks.get(stage) for stage in self.stages},
+            "errors": dict(self.errors)
+        }
+
+
+readiness = Readiness()
+
+
+# python -X importtime output as (indented module, self us, cumulative us), in import order
+def import_times(module):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=dict(os.environ, LOG_LEVEL="WARNING")
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(module="main", top=20, budget=IMPORT_BUDGET_SECONDS):
+    rows = import_times(module)
+    total = next((cumulative for name, _, cumulative in reversed(rows) if name.strip() == module), 0) / 1e6
+    # Own import time summed per top-level package: the unit lazy imports are decided at
+    packages = {}
+    for name, self_us, _ in rows:
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    eager = [package for package in DEFERRED_PACKAGES if package in packages]
+    print(f"import {module}: {total:.2f}s (budget {budget:.2f}s)")
+    print(f"{'package':<30}{'ms':>10}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<30}{self_us / 1000:>10.1f}")
+    if eager:
+        print(f"imported eagerly, should be deferred: {', '.join(eager)}")
+    return total <= budget and not eager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time of a module against a budget")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS)
+    args = parser.parse_args()
+    sys.exit(0 if report(args.module, args.top, args.budget) else 1)
+
+
+if __name__ == "__main__":
+    main()
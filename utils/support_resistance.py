@@ -1,5 +1,7 @@
-import pandas as pd
+import bisect
+from collections import deque
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from utils.logger import log
 
 def find_support_resistance(df):
@@ -22,10 +24,12 @@ def find_support_resistance(df):
         
         return df
     except Exception as e:
-        log(f"Error in support/resistance calculation: {e}", level="ERROR")
+        log("Error in support/resistance calculation: %s", e, level="ERROR")
         return df
 
 def detect_breakout(symbol, df):
+    import pandas as pd  # Deferred: only the frame-based helpers need it
+
     try:
         if len(df) < 3:
             return {"is_breakout": False, "direction": "none"}
@@ -36,7 +40,7 @@ def detect_breakout(symbol, df):
         resistance = df['resistance'].iloc[-1]
         
         if pd.isna(support) or pd.isna(resistance):
-            log(f"[{symbol}] Invalid support/resistance values", level="WARNING")
+            log("[%s] Invalid support/resistance values", symbol, level="WARNING", symbol=symbol)
             return {"is_breakout": False, "direction": "none"}
         
         if prev_price <= resistance and current_price > resistance:
@@ -46,5 +50,170 @@ def detect_breakout(symbol, df):
         else:
             return {"is_breakout": False, "direction": "none"}
     except Exception as e:
-        log(f"Error detecting breakout for {symbol}: {e}", level="ERROR")
+        log("Error detecting breakout for %s: %s", symbol, e, level="ERROR", symbol=symbol)
+        return {"is_breakout": False, "direction": "none"}
+
+
+# Incremental 5-bar support/resistance over closed candles. Support and resistance are
+# the low/high of the `window` candles before the latest one, kept in monotonic deques
+# (O(1) amortized per candle), so the latest close can break out of them. Analysis
+# feeds closed candles only; a repeat of the latest timestamp replaces it.
+class RollingSupportResistance:
+    def __init__(self, window=5):
+        self.window = window
+        self.closed = 0
+        self.lows = deque()  # (seq, low), lows increasing
+        self.highs = deque()  # (seq, high), highs decreasing
+        self.last_ts = None
+        self.last_candle = None  # (high, low, close)
+        self.prev_close = None
+
+    def _push(self, high, low):
+        seq = self.closed
+        self.closed += 1
+        while self.lows and self.lows[-1][1] >= low:
+            self.lows.pop()
+        self.lows.append((seq, low))
+        while self.highs and self.highs[-1][1] <= high:
+            self.highs.pop()
+        self.highs.append((seq, high))
+        oldest = seq - self.window
+        while self.lows[0][0] <= oldest:
+            self.lows.popleft()
+        while self.highs[0][0] <= oldest:
+            self.highs.popleft()
+
+    def update(self, timestamp, high, low, close):
+        if self.last_ts is not None and timestamp < self.last_ts:
+            return
+        if self.last_ts is not None and timestamp > self.last_ts:
+            last_high, last_low, last_close = self.last_candle
+            self._push(last_high, last_low)
+            self.prev_close = last_close
+        self.last_ts = timestamp
+        self.last_candle = (float(high), float(low), float(close))
+
+    # Rows are [timestamp, open, high, low, close, volume]; rows older than the latest candle are skipped
+    def update_many(self, ohlcv):
+        rows = np.asarray(ohlcv, dtype="float64")
+        if not len(rows):
+            return
+        start = 0 if self.last_ts is None else int(np.searchsorted(rows[:, 0], self.last_ts))
+        for timestamp, _, high, low, close, _ in rows[start:]:
+            self.update(timestamp, high, low, close)
+
+    @property
+    def support(self):
+        return self.lows[0][1] if self.lows else None
+
+    @property
+    def resistance(self):
+        return self.highs[0][1] if self.highs else None
+
+    # detect_breakout's rule against levels that exclude the latest candle
+    def breakout(self):
+        if self.closed < 2 or self.prev_close is None:
+            return {"is_breakout": False, "direction": "none"}
+        current_price = self.last_candle[2]
+        if self.prev_close <= self.resistance and current_price > self.resistance:
+            return {"is_breakout": True, "direction": "up"}
+        elif self.prev_close >= self.support and current_price < self.support:
+            return {"is_breakout": True, "direction": "down"}
         return {"is_breakout": False, "direction": "none"}
+
+
+# Bar i is a pivot high/low when it is the extreme of the 2 * span + 1 bars around it
+def find_pivots(highs, lows, span=2):
+    highs = np.asarray(highs, dtype="float64")
+    lows = np.asarray(lows, dtype="float64")
+    if len(highs) < 2 * span + 1:
+        return np.empty(0), np.empty(0)
+    is_high = sliding_window_view(highs, 2 * span + 1).argmax(axis=1) == span
+    is_low = sliding_window_view(lows, 2 * span + 1).argmin(axis=1) == span
+    return highs[span:len(highs) - span][is_high], lows[span:len(lows) - span][is_low]
+
+
+# Merge sorted levels closer than tolerance_pct into one level (mean) with a touch count
+def cluster_levels(levels, tolerance_pct=0.3):
+    levels = np.sort(np.asarray(levels, dtype="float64"))
+    levels = levels[np.isfinite(levels) & (levels > 0)]
+    centers, touches = [], []
+    start = 0
+    for i in range(1, len(levels) + 1):
+        if i == len(levels) or (levels[i] - levels[start]) / levels[start] * 100 > tolerance_pct:
+            centers.append(float(levels[start:i].mean()))
+            touches.append(i - start)
+            start = i
+    return centers, touches
+
+
+# Clustered pivot levels across timeframes in a sorted list, so nearest
+# support/resistance lookups are a bisect instead of a scan or refetch.
+# Fed the scan timeframe by analysis and 4h/1d by multi_timeframe_boost. Diagnostic for
+# now: the scanner logs the nearest levels, signals do not use them.
+class PivotLevelIndex:
+    def __init__(self, tolerance_pct=0.3, span=2):
+        self.tolerance_pct = tolerance_pct
+        self.span = span
+        self.pivots = {}  # timeframe -> pivot prices
+        self.levels = []
+        self.touches = []
+
+    # Closed candles only: a forming candle's high/low can still move
+    def set_candles(self, timeframe, ohlcv):
+        rows = np.asarray(ohlcv, dtype="float64")
+        if len(rows) < 2 * self.span + 1:
+            return
+        pivot_highs, pivot_lows = find_pivots(rows[:, 2], rows[:, 3], self.span)
+        self.pivots[timeframe] = np.concatenate([pivot_highs, pivot_lows])
+        self.rebuild()
+
+    def rebuild(self):
+        if not self.pivots:
+            self.levels, self.touches = [], []
+            return
+        self.levels, self.touches = cluster_levels(np.concatenate(list(self.pivots.values())), self.tolerance_pct)
+
+    def nearest_support(self, price):
+        i = bisect.bisect_right(self.levels, price)
+        return self.levels[i - 1] if i > 0 else None
+
+    def nearest_resistance(self, price):
+        i = bisect.bisect_right(self.levels, price)
+        return self.levels[i] if i < len(self.levels) else None
+
+    def nearest(self, price):
+        support = self.nearest_support(price)
+        resistance = self.nearest_resistance(price)
+        return {
+            "support": support,
+            "resistance": resistance,
+            "support_distance_pct": (price - support) / price * 100 if support and price else None,
+            "resistance_distance_pct": (resistance - price) / price * 100 if resistance and price else None
+        }
+
+
+# Per-symbol state shared by analysis and the scanner
+sr_trackers = {}
+level_indexes = {}
+
+def get_sr_tracker(symbol, timeframe):
+    key = (symbol, timeframe)
+    if key not in sr_trackers:
+        sr_trackers[key] = RollingSupportResistance()
+    return sr_trackers[key]
+
+def get_level_index(symbol):
+    if symbol not in level_indexes:
+        level_indexes[symbol] = PivotLevelIndex()
+    return level_indexes[symbol]
+
+def update_levels(symbol, timeframe, ohlcv):
+    try:
+        tracker = get_sr_tracker(symbol, timeframe)
+        tracker.update_many(ohlcv)
+        get_level_index(symbol).set_candles(timeframe, ohlcv)
+        return tracker
+    except Exception as e:
+        log("[%s] Error updating support/resistance levels: %s", symbol, e, level="ERROR", symbol=symbol)
+        return None